@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+import pandas as pd
+
+from app_constants import ASSET_COLS, ASSET_TYPE_TO_CODE, DEBT_COLS
+
+_NORMALIZED_CACHE_SIZE = 64
+
+# Fingerprints of frames normalize_asset_codes produced (normalization is idempotent).
+_normalized: "OrderedDict[str, None]" = OrderedDict()
+_normalized_lock = threading.Lock()
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a frame: values, index, column names and dtypes."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _remember_normalized(fp: str) -> None:
+    with _normalized_lock:
+        _normalized[fp] = None
+        _normalized.move_to_end(fp)
+        while len(_normalized) > _NORMALIZED_CACHE_SIZE:
+            _normalized.popitem(last=False)
+
+
+def normalize_asset_codes(assets_df: pd.DataFrame) -> pd.DataFrame:
+    """Derive ``Kod`` from ``Varlık Türü`` and rename legacy "Banka (TL)" rows.
+
+    Frames this function already produced are recognised by fingerprint and
+    returned as-is.
+    """
+    fp = frame_fingerprint(assets_df)
+    if fp in _normalized:
+        return assets_df
+
+    df = assets_df.copy()
+    if "Varlık Türü" in df.columns and len(df):
+        types = df["Varlık Türü"].astype(str).str.strip().str.lower()
+        legacy_bank = types.eq("banka (tl)")
+        if legacy_bank.any():
+            df.loc[legacy_bank, "Varlık Türü"] = "Mevduat Hesabı"
+        codes = types.map(ASSET_TYPE_TO_CODE)
+        known = codes.notna()
+        if known.any():
+            df.loc[known, "Kod"] = codes[known]
+
+    _remember_normalized(frame_fingerprint(df))
+    return df
+
+
+def _ensure_columns(df: pd.DataFrame, columns: Iterable[str], text_cols: Iterable[str], defaults: dict) -> pd.DataFrame:
+    text_cols = set(text_cols)
+    for c in columns:
+        if c not in df.columns:
+            df[c] = defaults.get(c, "" if c in text_cols else 0.0)
+    return df[list(columns)]
+
+
+def prepare_assets_frame(assets: pd.DataFrame) -> pd.DataFrame:
+    """Loaded asset rows -> ASSET_COLS in order, with codes normalized."""
+    assets = _ensure_columns(assets.copy(), ASSET_COLS, ("Varlık Türü", "Not"), {"Kod": "TRY"})
+    return normalize_asset_codes(assets)
+
+
+def prepare_debts_frame(debts: pd.DataFrame) -> pd.DataFrame:
+    return _ensure_columns(debts.copy(), DEBT_COLS, ("Borç Adı", "Not"), {})
@@ -1,42 +1,158 @@
 from __future__ import annotations
 
 import base64
-import hashlib
+import hmac
 import json
+import math
 import os
 import re
-from typing import Any, Dict, Optional, Tuple
+import threading
+import time
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
 
-from app_mongo import get_db, mongo_enabled
+from app_mongo import get_db, iter_documents, mongo_enabled, projection
+from app_passwords import (
+    KDF_ROUNDS,
+    LEGACY_KDF_ROUNDS,
+    HashingBusy,
+    check_password,
+    derive,
+    get_login_throttle,
+    make_password_record,
+    needs_rehash,
+    throttle_keys,
+)
 
 
-def _pbkdf2_hash(password: str, salt: bytes, rounds: int = 120_000) -> bytes:
-    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, rounds)
+def _pbkdf2_hash(password: str, salt: bytes, rounds: int = LEGACY_KDF_ROUNDS) -> bytes:
+    return derive(password, salt, rounds)
 
 
-def hash_password(password: str, salt_b64: Optional[str] = None) -> Tuple[str, str]:
+def hash_password(password: str, salt_b64: Optional[str] = None, rounds: int = LEGACY_KDF_ROUNDS) -> Tuple[str, str]:
+    """Legacy (salt, hash) pair; new records come from ``app_passwords.make_password_record``."""
     if salt_b64 is None:
         salt = os.urandom(16)
     else:
         salt = base64.b64decode(salt_b64.encode("utf-8"))
-    digest = _pbkdf2_hash(password, salt)
+    digest = _pbkdf2_hash(password, salt, rounds)
     return base64.b64encode(salt).decode("utf-8"), base64.b64encode(digest).decode("utf-8")
 
 
+USER_CACHE_TTL_S = 60.0
+# Misses are cached briefly so repeated failed logins do not hit Mongo, but a
+# user created by another process shows up quickly.
+USER_MISS_TTL_S = 5.0
+USER_FIELDS = ("salt", "hash", "algo", "rounds", "role")
+# Shown when the password hashing pool is saturated (see HashingBusy).
+BUSY_MESSAGE = "Sunucu meşgul, lütfen biraz sonra tekrar deneyin."
+
+
+def _fetch_mongo_user(username: str) -> Optional[Dict[str, Any]]:
+    doc = get_db()["users"].find_one({"username": username}, projection(*USER_FIELDS))
+    if not doc:
+        return None
+    record = {f: doc.get(f) for f in USER_FIELDS if doc.get(f) is not None}
+    record.setdefault("role", "user")
+    return record
+
+
+def _scan_mongo_usernames() -> Iterator[str]:
+    for doc in iter_documents(get_db()["users"], fields=("username",)):
+        if doc.get("username"):
+            yield doc["username"]
+
+
+class UserDirectory(MutableMapping):
+    """``users_data["users"]`` for Mongo mode: users are fetched one by one and cached.
+
+    Lookups query by the indexed ``username`` and are cached for ``ttl_s``
+    (misses for ``miss_ttl_s``). Writes go through ``create_user`` /
+    ``update_password`` / ``delete_user``, which invalidate the entry.
+    Iterating or ``len`` scans the collection and is meant for admin tooling
+    only.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[Dict[str, Any]]] = _fetch_mongo_user,
+        scan: Callable[[], Iterator[str]] = _scan_mongo_usernames,
+        ttl_s: float = USER_CACHE_TTL_S,
+        miss_ttl_s: float = USER_MISS_TTL_S,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._fetch = fetch
+        self._scan = scan
+        self.ttl_s = ttl_s
+        self.miss_ttl_s = miss_ttl_s
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, username: str) -> Optional[Dict[str, Any]]:
+        now = self._clock()
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        record = self._fetch(username)
+        ttl = self.ttl_s if record is not None else self.miss_ttl_s
+        with self._lock:
+            self._cache[username] = (now + ttl, record)
+        return record
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        with self._lock:
+            if username is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(username, None)
+
+    def __getitem__(self, username: str) -> Dict[str, Any]:
+        record = self.lookup(username)
+        if record is None:
+            raise KeyError(username)
+        return record
+
+    def __contains__(self, username: object) -> bool:
+        return isinstance(username, str) and self.lookup(username) is not None
+
+    def __setitem__(self, username: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._cache[username] = (self._clock() + self.ttl_s, record)
+
+    def __delitem__(self, username: str) -> None:
+        self.invalidate(username)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._scan()))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._scan())
+
+
+_directory: Optional[UserDirectory] = None
+_directory_lock = threading.Lock()
+
+
+def get_user_directory() -> UserDirectory:
+    global _directory
+    if _directory is None:
+        with _directory_lock:
+            if _directory is None:
+                _directory = UserDirectory()
+    return _directory
+
+
 def load_users(path: str = "users.json") -> Dict[str, Any]:
     if mongo_enabled():
-        data: Dict[str, Any] = {"users": {}}
-        db = get_db()
-        for doc in db["users"].find({}, {"_id": 0}):
-            username = doc.get("username")
-            if not username:
-                continue
-            data["users"][username] = {
-                "salt": doc.get("salt"),
-                "hash": doc.get("hash"),
-                "role": doc.get("role", "user"),
-            }
-        return data
+        # No query here: users are looked up lazily by name.
+        return {"users": get_user_directory()}
     if not os.path.exists(path):
         return {"users": {}}
     try:
@@ -61,19 +177,74 @@ def verify_user(users_data: Dict[str, Any], username: str, password: str) -> boo
     user = users_data.get("users", {}).get(username)
     if not user:
         return False
-    salt_b64 = user.get("salt")
-    hash_b64 = user.get("hash")
-    if not salt_b64 or not hash_b64:
+    try:
+        return check_password(user, password)
+    except HashingBusy:
         return False
-    _, computed_hash = hash_password(password, salt_b64=salt_b64)
-    return _constant_time_equals(computed_hash, hash_b64)
 
 
-def get_user_role(users_data: Dict[str, Any], username: str) -> str:
+# Checked for unknown usernames so they take as long as a wrong password.
+_DUMMY_RECORD = {
+    "salt": base64.b64encode(b"\0" * 16).decode("utf-8"),
+    "hash": base64.b64encode(b"\0" * 32).decode("utf-8"),
+    "rounds": KDF_ROUNDS,
+}
+
+
+@dataclass
+class LoginResult:
+    ok: bool
+    message: str
+    # The stored hash was upgraded to the current KDF parameters; file mode
+    # callers should save ``users_data``.
+    upgraded: bool = False
+
+
+def authenticate(users_data: Dict[str, Any], username: str, password: str, ip: Optional[str] = None) -> LoginResult:
+    """Throttled login check that upgrades outdated password hashes on success."""
+    throttle = get_login_throttle()
+    keys = throttle_keys(username, ip)
+    wait_s = throttle.retry_after(keys)
+    if wait_s > 0:
+        return LoginResult(False, f"Çok fazla hatalı deneme. {math.ceil(wait_s)} sn sonra tekrar deneyin.")
+
+    user = users_data.get("users", {}).get(username)
+    try:
+        if user:
+            ok = check_password(user, password)
+        else:
+            check_password(_DUMMY_RECORD, password)
+            ok = False
+    except HashingBusy:
+        return LoginResult(False, BUSY_MESSAGE)
+    if not ok:
+        throttle.record_failure(keys)
+        return LoginResult(False, "Kullanıcı adı veya şifre hatalı.")
+
+    throttle.record_success(keys)
+    upgraded = False
+    if needs_rehash(user):
+        try:
+            _store_password_record(users_data, username, make_password_record(password))
+            upgraded = True
+        except HashingBusy:
+            pass  # keep the old hash; the upgrade is retried on the next login
+    return LoginResult(True, "Giriş başarılı.", upgraded=upgraded)
+
+
+def _store_password_record(users_data: Dict[str, Any], username: str, record: Dict[str, Any]) -> None:
+    user = users_data["users"][username]
+    user.update(record)
     if mongo_enabled():
         db = get_db()
-        doc = db["users"].find_one({"username": username}, {"role": 1})
-        role = (doc or {}).get("role", "user")
+        db["users"].update_one({"username": username}, {"$set": record}, upsert=False)
+        get_user_directory().invalidate(username)
+
+
+def get_user_role(users_data: Dict[str, Any], username: str) -> str:
+    if mongo_enabled():
+        user = get_user_directory().lookup(username) or {}
+        role = user.get("role", "user")
         return role if role in ("admin", "user") else "user"
     user = users_data.get("users", {}).get(username, {})
     role = user.get("role", "user")
@@ -93,19 +264,19 @@ def create_user(users_data: Dict[str, Any], username: str, password: str, role:
     if len(password) < 6:
         return False, "Şifre en az 6 karakter olmalı."
     role = "admin" if role == "admin" else "user"
-    salt_b64, hash_b64 = hash_password(password)
-    users_data.setdefault("users", {})[username] = {
-        "salt": salt_b64,
-        "hash": hash_b64,
-        "role": role,
-    }
+    try:
+        record = {**make_password_record(password), "role": role}
+    except HashingBusy:
+        return False, BUSY_MESSAGE
+    users_data.setdefault("users", {})[username] = record
     if mongo_enabled():
         db = get_db()
         db["users"].update_one(
             {"username": username},
-            {"$set": {"username": username, "salt": salt_b64, "hash": hash_b64, "role": role}},
+            {"$set": {"username": username, **record}},
             upsert=True,
         )
+        get_user_directory().invalidate(username)
     return True, "Kullanıcı oluşturuldu."
 
 
@@ -114,16 +285,11 @@ def update_password(users_data: Dict[str, Any], username: str, new_password: str
         return False, "Kullanıcı bulunamadı."
     if len(new_password) < 6:
         return False, "Şifre en az 6 karakter olmalı."
-    salt_b64, hash_b64 = hash_password(new_password)
-    users_data["users"][username]["salt"] = salt_b64
-    users_data["users"][username]["hash"] = hash_b64
-    if mongo_enabled():
-        db = get_db()
-        db["users"].update_one(
-            {"username": username},
-            {"$set": {"salt": salt_b64, "hash": hash_b64}},
-            upsert=False,
-        )
+    try:
+        record = make_password_record(new_password)
+    except HashingBusy:
+        return False, BUSY_MESSAGE
+    _store_password_record(users_data, username, record)
     return True, "Şifre güncellendi."
 
 
@@ -135,13 +301,9 @@ def delete_user(users_data: Dict[str, Any], username: str) -> Tuple[bool, str]:
         db = get_db()
         db["users"].delete_one({"username": username})
         db["user_state"].delete_one({"username": username})
+        get_user_directory().invalidate(username)
     return True, "Kullanıcı silindi."
 
 
 def _constant_time_equals(a: str, b: str) -> bool:
-    if len(a) != len(b):
-        return False
-    result = 0
-    for x, y in zip(a.encode("utf-8"), b.encode("utf-8")):
-        result |= x ^ y
-    return result == 0
+    return hmac.compare_digest(a.encode("utf-8"), b.encode("utf-8"))
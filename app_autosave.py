@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+from app_assets import frame_fingerprint
+from app_codec import sanitize
+
+AUTOSAVE_KEY = "_autosaver"
+
+# A change is written once edits have been quiet for DEBOUNCE_S, or at the
+# latest MAX_DELAY_S after the first unsaved change.
+AUTOSAVE_DEBOUNCE_S = 2.0
+AUTOSAVE_MAX_DELAY_S = 30.0
+
+
+def payload_fingerprint(payload: Dict[str, Any], exclude: Iterable[str] = ("saved_at",)) -> str:
+    """Content hash of a state payload, ignoring ``exclude`` keys such as the save timestamp."""
+    skip = set(exclude)
+    h = hashlib.blake2b(digest_size=16)
+    for key in sorted(k for k in payload if k not in skip):
+        value = payload[key]
+        h.update(key.encode("utf-8"))
+        if isinstance(value, pd.DataFrame):
+            h.update(frame_fingerprint(value).encode("ascii"))
+        else:
+            h.update(json.dumps(sanitize(value), sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class AutoSaver:
+    """Writes a payload only when its content changed, coalescing bursts of edits.
+
+    ``update`` is called with the current payload on every rerun; ``flush``
+    hands the latest pending payload to ``save`` once the debounce window has
+    passed (or immediately with ``force``). Payloads equal to the last saved
+    one are never written.
+    """
+
+    def __init__(
+        self,
+        debounce_s: float = AUTOSAVE_DEBOUNCE_S,
+        max_delay_s: float = AUTOSAVE_MAX_DELAY_S,
+        exclude: Iterable[str] = ("saved_at",),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s
+        self.exclude = tuple(exclude)
+        self._clock = clock
+        self.saved_fingerprint: Optional[str] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._pending_fingerprint: Optional[str] = None
+        self._first_change_at = 0.0
+        self._last_change_at = 0.0
+        self.writes = 0
+        self.skipped = 0
+        self.coalesced = 0
+
+    @property
+    def pending(self) -> bool:
+        return self._pending is not None
+
+    def mark_saved(self, payload: Dict[str, Any]) -> None:
+        """Record ``payload`` as what the store holds (after a load or an external save)."""
+        self.saved_fingerprint = payload_fingerprint(payload, self.exclude)
+        self._pending = None
+        self._pending_fingerprint = None
+
+    def update(self, payload: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Register the current payload; returns True if it differs from the saved one."""
+        now = self._clock() if now is None else now
+        fp = payload_fingerprint(payload, self.exclude)
+        if fp == self.saved_fingerprint:
+            if self._pending is not None:
+                self.coalesced += 1  # edited and then reverted before it was written
+            self._pending = None
+            self._pending_fingerprint = None
+            self.skipped += 1
+            return False
+        if self._pending is None:
+            self._first_change_at = now
+        if fp != self._pending_fingerprint:
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending_fingerprint = fp
+            self._last_change_at = now
+        self._pending = payload
+        return True
+
+    def due(self, now: Optional[float] = None) -> bool:
+        if self._pending is None:
+            return False
+        now = self._clock() if now is None else now
+        return (now - self._last_change_at >= self.debounce_s) or (now - self._first_change_at >= self.max_delay_s)
+
+    def flush(self, save: Callable[[Dict[str, Any]], None], force: bool = False, now: Optional[float] = None) -> bool:
+        """Save the pending payload if it is due (or ``force``); returns True if ``save`` ran."""
+        if self._pending is None or not (force or self.due(now)):
+            return False
+        save(self._pending)
+        self.saved_fingerprint = self._pending_fingerprint
+        self._pending = None
+        self._pending_fingerprint = None
+        self.writes += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"writes": self.writes, "skipped": self.skipped, "coalesced": self.coalesced, "pending": self.pending}
+
+
+def get_autosaver(session_state: Dict, **kwargs: Any) -> AutoSaver:
+    saver = session_state.get(AUTOSAVE_KEY)
+    if saver is None:
+        saver = AutoSaver(**kwargs)
+        session_state[AUTOSAVE_KEY] = saver
+    return saver
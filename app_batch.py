@@ -0,0 +1,465 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app_assets import normalize_asset_codes, prepare_assets_frame, prepare_debts_frame
+from app_codec import plain_payload, sanitize
+from app_compute import compute_display_assets, compute_totals, value_assets
+from app_interest import accrue_since
+from app_mongo import batched, bulk_update, get_db, iter_documents, projection
+from app_net_history import upsert_net_snapshot
+from app_price_history import PriceHistory, TimeLike
+from app_revalue import backfill_from_history
+from app_storage import (
+    append_net_snapshot,
+    build_payload_update,
+    StateLoadError,
+    find_state_path,
+    iter_state_paths,
+    read_state_file,
+    write_state,
+)
+
+SNAPSHOT_CHUNK_SIZE = 200
+SNAPSHOT_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+
+# Revaluation chunks are valued as one frame per chunk; large chunks keep the
+# per-chunk pandas overhead small next to the rows.
+VALUE_CHUNK_SIZE = 2_000
+USER_COL = "__user__"
+REPORT_COLUMNS = ["username", "assets", "debts", "net", "rows", "error"]
+
+
+@dataclass
+class SnapshotResult:
+    username: str
+    net: Optional[float] = None
+    interest_applied: bool = False
+    snapshot_changed: bool = False
+    error: Optional[str] = None
+
+    @property
+    def written(self) -> bool:
+        return self.interest_applied or self.snapshot_changed
+
+
+@dataclass
+class BackfillResult:
+    username: str
+    days: int = 0
+    error: Optional[str] = None
+
+
+def _frame(value: Any) -> pd.DataFrame:
+    return value if isinstance(value, pd.DataFrame) else pd.DataFrame(value or [])
+
+
+def snapshot_payload(
+    data: Dict[str, Any],
+    prices: Dict[str, float],
+    now: dt.datetime,
+    use_side: str = "BUY",
+) -> Tuple[Dict[str, Any], SnapshotResult]:
+    """What a page visit at ``now`` would do to a stored state: accrue interest, value it, upsert today's net.
+
+    Returns the updated payload (frames as DataFrames) and a result without
+    ``username``.
+    """
+    assets = prepare_assets_frame(_frame(data.get("assets")))
+    debts = prepare_debts_frame(_frame(data.get("debts")))
+    last_date = data.get("interest_last_date")
+    accrued, new_last_date = accrue_since(assets, last_date, now)
+    # Without a stored date accrue_since only starts the clock; that alone is
+    # not worth a full rewrite (it is saved with the next one).
+    interest_applied = last_date is not None and new_last_date != last_date
+    accrued = normalize_asset_codes(accrued)
+
+    valuation = value_assets(accrued, prices, use_side)
+    _, _, net = compute_totals(valuation.display, debts)
+    state = {"net_history": list(data.get("net_history") or [])}
+    changed = upsert_net_snapshot(state, now.date().isoformat(), net)
+
+    payload = dict(data)
+    payload.update(
+        assets=accrued,
+        debts=debts,
+        net_history=state["net_history"],
+        interest_last_date=new_last_date,
+    )
+    if interest_applied:
+        payload["saved_at"] = now.replace(microsecond=0).isoformat()
+    return payload, SnapshotResult("", net=net, interest_applied=interest_applied, snapshot_changed=changed)
+
+
+def backfill_payload(
+    data: Dict[str, Any],
+    history: PriceHistory,
+    start: TimeLike,
+    end: TimeLike,
+    use_side: str = "BUY",
+    overwrite: bool = False,
+) -> Tuple[Dict[str, Any], int]:
+    """``data`` with ``net_history`` backfilled from ``history`` over ``[start, end]``; returns it and the days written.
+
+    ``data`` itself is left untouched.
+    """
+    payload = dict(data)
+    payload["net_history"] = [dict(r) for r in data.get("net_history") or []]
+    return payload, backfill_from_history(payload, history, start, end, use_side, overwrite=overwrite)
+
+
+def _failed(username: str, e: Exception, result: Callable[..., Any] = SnapshotResult) -> Any:
+    return result(username, error=f"{type(e).__name__}: {e}")
+
+
+class FileStateStore:
+    """User states under ``root/<username>/state(.columnar).json``.
+
+    Files have no revision to guard writes with. A page session saving after
+    a snapshot keeps its own frames but merges back the net_history days it
+    lacks (``merge_stored_history``); the page accrues the same interest on
+    its own. A page save landing between this store's read and write of the
+    same user is lost, so run the daemon when sessions are idle.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def state_path(self, username: str) -> Optional[str]:
+        return find_state_path(os.path.join(self.root, username))
+
+    def usernames(self) -> Iterator[str]:
+        return (username for username, _ in iter_state_paths(self.root))
+
+    def load_states(self, usernames: Sequence[str]) -> Iterator[Tuple[str, Any]]:
+        """``(username, payload)``; ``None`` if the user has no state file, the ``StateLoadError`` if it is unreadable."""
+        for username in usernames:
+            path = self.state_path(username)
+            try:
+                yield username, read_state_file(path) if path else None
+            except StateLoadError as e:
+                yield username, e
+
+    def snapshot_chunk(self, usernames: Sequence[str], prices: Dict[str, float], now: dt.datetime, use_side: str = "BUY") -> List[SnapshotResult]:
+        results = []
+        for username in usernames:
+            try:
+                path = self.state_path(username)
+                # An unreadable file raises StateLoadError and is reported as an error.
+                data = read_state_file(path) if path else None
+                if data is None:
+                    results.append(SnapshotResult(username, error="no state"))
+                    continue
+                payload, result = snapshot_payload(data, prices, now, use_side)
+                result.username = username
+                if result.interest_applied:
+                    write_state(path, payload)
+                elif result.snapshot_changed:
+                    # Same as the page: a snapshot alone is a journal append, not a rewrite.
+                    append_net_snapshot(path, now.date().isoformat(), result.net)
+                results.append(result)
+            except Exception as e:
+                results.append(_failed(username, e))
+        return results
+
+    def backfill_chunk(
+        self,
+        usernames: Sequence[str],
+        history: PriceHistory,
+        start: TimeLike,
+        end: TimeLike,
+        use_side: str = "BUY",
+        overwrite: bool = False,
+    ) -> List[BackfillResult]:
+        results = []
+        for username in usernames:
+            try:
+                path = self.state_path(username)
+                data = read_state_file(path) if path else None
+                if data is None:
+                    results.append(BackfillResult(username, error="no state"))
+                    continue
+                payload, days = backfill_payload(data, history, start, end, use_side, overwrite)
+                if days:
+                    write_state(path, payload)
+                results.append(BackfillResult(username, days=days))
+            except Exception as e:
+                results.append(_failed(username, e, BackfillResult))
+        return results
+
+
+class MongoStateStore:
+    """User states in the ``user_state`` collection.
+
+    A chunk is read with one ``$in`` query and written with one unordered bulk
+    write of field-level diffs, each guarded by the revision it was computed
+    from; if another writer got in first the chunk is redone once.
+    """
+
+    def __init__(self, coll: Any) -> None:
+        self.coll = coll
+
+    def usernames(self) -> Iterator[str]:
+        return (d["username"] for d in iter_documents(self.coll, fields=("username",)) if d.get("username"))
+
+    def load_states(
+        self,
+        usernames: Sequence[str],
+        fields: Sequence[str] = ("payload.assets", "payload.debts"),
+    ) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+        """``(username, payload)`` for ``usernames`` with one query, fetching only ``fields`` of each payload."""
+        docs = {d["username"]: d for d in self.coll.find({"username": {"$in": list(usernames)}}, projection("username", *fields))}
+        for username in usernames:
+            payload = (docs.get(username) or {}).get("payload")
+            yield username, payload if isinstance(payload, dict) else None
+
+    def snapshot_chunk(
+        self,
+        usernames: Sequence[str],
+        prices: Dict[str, float],
+        now: dt.datetime,
+        use_side: str = "BUY",
+        retries: int = 1,
+    ) -> List[SnapshotResult]:
+        docs = {d["username"]: d for d in self.coll.find({"username": {"$in": list(usernames)}}, projection("username", "payload", "revision"))}
+        results: Dict[str, SnapshotResult] = {}
+        updates: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        for username in usernames:
+            doc = docs.get(username)
+            if not doc or not isinstance(doc.get("payload"), dict):
+                results[username] = SnapshotResult(username, error="no state")
+                continue
+            try:
+                old = sanitize(doc["payload"])
+                payload, result = snapshot_payload(doc["payload"], prices, now, use_side)
+                result.username = username
+                results[username] = result
+                update = build_payload_update(old, plain_payload(payload))
+                if update is None:
+                    continue
+                update.setdefault("$set", {})["updated_at"] = dt.datetime.utcnow()
+                update["$inc"] = {"revision": 1}
+                updates.append(({"username": username, "revision": doc.get("revision")}, update))
+            except Exception as e:
+                results[username] = _failed(username, e)
+
+        if updates:
+            totals = bulk_update(self.coll, updates)
+            if totals["matched"] < len(updates):
+                # The bulk result does not say which filters missed. Redoing the
+                # whole chunk is safe: users already written now diff to nothing.
+                lost = [f["username"] for f, _ in updates]
+                if retries > 0:
+                    for result in self.snapshot_chunk(lost, prices, now, use_side, retries - 1):
+                        results[result.username] = result
+                else:
+                    for u in lost:
+                        results[u] = SnapshotResult(u, error="revision conflict")
+        return [results[u] for u in usernames]
+
+    def backfill_chunk(
+        self,
+        usernames: Sequence[str],
+        history: PriceHistory,
+        start: TimeLike,
+        end: TimeLike,
+        use_side: str = "BUY",
+        overwrite: bool = False,
+        retries: int = 1,
+    ) -> List[BackfillResult]:
+        """Like ``snapshot_chunk``: one read, one revision-guarded bulk write of the ``net_history`` diffs."""
+        fields = ("username", "payload.assets", "payload.debts", "payload.net_history", "revision")
+        docs = {d["username"]: d for d in self.coll.find({"username": {"$in": list(usernames)}}, projection(*fields))}
+        results: Dict[str, BackfillResult] = {}
+        updates: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        for username in usernames:
+            doc = docs.get(username)
+            if not doc or not isinstance(doc.get("payload"), dict):
+                results[username] = BackfillResult(username, error="no state")
+                continue
+            try:
+                payload, days = backfill_payload(doc["payload"], history, start, end, use_side, overwrite)
+                results[username] = BackfillResult(username, days=days)
+                update = build_payload_update(sanitize(doc["payload"]), plain_payload(payload)) if days else None
+                if update is None:
+                    continue
+                update.setdefault("$set", {})["updated_at"] = dt.datetime.utcnow()
+                update["$inc"] = {"revision": 1}
+                updates.append(({"username": username, "revision": doc.get("revision")}, update))
+            except Exception as e:
+                results[username] = _failed(username, e, BackfillResult)
+
+        if updates and bulk_update(self.coll, updates)["matched"] < len(updates):
+            lost = [f["username"] for f, _ in updates]
+            if retries > 0:
+                for result in self.backfill_chunk(lost, history, start, end, use_side, overwrite, retries - 1):
+                    results[result.username] = result
+            else:
+                for u in lost:
+                    results[u] = BackfillResult(u, error="revision conflict")
+        return [results[u] for u in usernames]
+
+
+def run_snapshots(
+    store: Any,
+    prices: Dict[str, float],
+    now: Optional[dt.datetime] = None,
+    use_side: str = "BUY",
+    usernames: Optional[Iterable[str]] = None,
+    workers: int = SNAPSHOT_WORKERS,
+    chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+    on_chunk: Optional[Callable[[List[SnapshotResult]], None]] = None,
+) -> List[SnapshotResult]:
+    """Snapshot every user of ``store`` against one price dict, ``chunk_size`` users per task."""
+    now = now or dt.datetime.now()
+    names = store.usernames() if usernames is None else usernames
+    return _run_chunks(lambda chunk: store.snapshot_chunk(chunk, prices, now, use_side), names, workers, chunk_size, on_chunk)
+
+
+def run_backfill(
+    store: Any,
+    history: PriceHistory,
+    start: TimeLike,
+    end: TimeLike,
+    use_side: str = "BUY",
+    overwrite: bool = False,
+    usernames: Optional[Iterable[str]] = None,
+    workers: int = SNAPSHOT_WORKERS,
+    chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+) -> List[BackfillResult]:
+    """Backfill every user's ``net_history`` over ``[start, end]`` from the price history and store it.
+
+    Only days on which every held price is known are written; existing days
+    are kept unless ``overwrite`` is set.
+    """
+    names = store.usernames() if usernames is None else usernames
+    return _run_chunks(
+        lambda chunk: store.backfill_chunk(chunk, history, start, end, use_side, overwrite), names, workers, chunk_size
+    )
+
+
+def _run_chunks(
+    task: Callable[[List[str]], List[Any]],
+    names: Iterable[str],
+    workers: int,
+    chunk_size: int,
+    on_chunk: Optional[Callable[[List[Any]], None]] = None,
+) -> List[Any]:
+    results: List[Any] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="snapshot") as pool:
+        futures = [pool.submit(task, chunk) for chunk in batched(names, chunk_size)]
+        for future in futures:
+            chunk_results = future.result()
+            if on_chunk is not None:
+                on_chunk(chunk_results)
+            results.extend(chunk_results)
+    return results
+
+
+def summarize(results: Sequence[SnapshotResult], elapsed_s: Optional[float] = None) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {
+        "users": len(results),
+        "written": sum(r.written for r in results),
+        "interest_applied": sum(r.interest_applied for r in results),
+        "snapshots": sum(r.snapshot_changed for r in results),
+        "errors": sum(r.error is not None for r in results),
+    }
+    if elapsed_s is not None:
+        summary["elapsed_s"] = round(elapsed_s, 3)
+        summary["users_per_s"] = round(len(results) / elapsed_s, 1) if elapsed_s > 0 else None
+    return summary
+
+
+
+def open_store(kind: str, root: Optional[str] = None) -> Any:
+    """Store by name, for worker processes that cannot be handed an open connection."""
+    if kind == "mongo":
+        return MongoStateStore(get_db()["user_state"])
+    if kind == "file":
+        return FileStateStore(root or "user_data")
+    raise ValueError(f"Unknown state store: {kind}")
+
+
+def _rows_of(value: Any) -> List[dict]:
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict(orient="records")
+    if isinstance(value, dict):
+        # Columnar layout: column -> values.
+        return pd.DataFrame(value).to_dict(orient="records")
+    return list(value or [])
+
+
+def _stack(states: Sequence[Tuple[str, Dict[str, Any]]], key: str) -> pd.DataFrame:
+    rows: List[dict] = []
+    owners: List[str] = []
+    for username, payload in states:
+        records = _rows_of(payload.get(key))
+        rows.extend(records)
+        owners.extend([username] * len(records))
+    df = pd.DataFrame(rows)
+    df[USER_COL] = owners
+    return df
+
+
+def value_states(
+    states: Iterable[Tuple[str, Optional[Dict[str, Any]]]],
+    prices: Dict[str, float],
+    use_side: str = "BUY",
+) -> pd.DataFrame:
+    """Value many stored states against one price dict; one ``REPORT_COLUMNS`` row per user.
+
+    All users' rows are stacked into a single frame and valued with the same
+    ``compute_display_assets`` pass the page uses, then summed per user, so
+    the cost is a few vectorized operations per call rather than per user.
+    A ``StateLoadError`` in place of a payload is reported in ``error``.
+    """
+    states = list(states)
+    loaded = [(u, p) for u, p in states if p and not isinstance(p, Exception)]
+    report = pd.DataFrame({"username": [u for u, _ in states]})
+    if loaded:
+        assets = normalize_asset_codes(_stack(loaded, "assets"))
+        display = compute_display_assets(assets, prices, use_side)
+        asset_totals = display.groupby(USER_COL, sort=False)["Tutar (TL)"].sum()
+        rows = display.groupby(USER_COL, sort=False).size()
+        debts = _stack(loaded, "debts")
+        amounts = pd.to_numeric(debts["Tutar (TL)"], errors="coerce") if "Tutar (TL)" in debts.columns else pd.Series(0.0, index=debts.index)
+        debt_totals = amounts.fillna(0.0).groupby(debts[USER_COL], sort=False).sum()
+    else:
+        asset_totals = debt_totals = rows = pd.Series(dtype=float)
+
+    users = report["username"]
+    report["assets"] = users.map(asset_totals).fillna(0.0)
+    report["debts"] = users.map(debt_totals).fillna(0.0)
+    report["net"] = report["assets"] - report["debts"]
+    report["rows"] = users.map(rows).fillna(0).astype(int)
+    missing = ~users.isin([u for u, _ in loaded])
+    report["error"] = None
+    report.loc[missing, ["assets", "debts", "net"]] = float("nan")
+    report.loc[missing, "error"] = "no state"
+    for username, payload in states:
+        if isinstance(payload, Exception):
+            report.loc[users == username, "error"] = f"{type(payload).__name__}: {payload}"
+    return report[REPORT_COLUMNS]
+
+
+def value_chunk(
+    kind: str,
+    root: Optional[str],
+    usernames: Sequence[str],
+    prices: Dict[str, float],
+    use_side: str = "BUY",
+) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Load and value one chunk (process pool entry point); returns the report rows and phase timings."""
+    t0 = time.perf_counter()
+    states = list(open_store(kind, root).load_states(usernames))
+    t1 = time.perf_counter()
+    report = value_states(states, prices, use_side)
+    t2 = time.perf_counter()
+    return report, {"load_s": t1 - t0, "value_s": t2 - t1}
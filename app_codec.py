@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional fast path
+    orjson = None
+
+CODEC_ENV = "PORTFOLIO_JSON_CODEC"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def sanitize(obj: Any) -> Any:
+    """Plain-JSON copy of ``obj``: NaN/inf and pandas NA become None, NumPy scalars Python ones."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: sanitize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(v) for v in obj]
+    if isinstance(obj, (np.generic,)) or obj is pd.NA or obj is pd.NaT:
+        return sanitize(_default(obj))
+    return obj
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """``dumps(obj, compact) -> bytes`` and ``loads(bytes | str)``; NaN is always written as null."""
+
+    name: str
+    dumps: Callable[[Any, bool], bytes]
+    loads: Callable[[Union[bytes, str]], Any]
+
+
+def _std_dumps(obj: Any, compact: bool = False) -> bytes:
+    if compact:
+        text = json.dumps(sanitize(obj), ensure_ascii=False, separators=(",", ":"), allow_nan=False, default=_default)
+    else:
+        text = json.dumps(sanitize(obj), ensure_ascii=False, indent=2, allow_nan=False, default=_default)
+    return text.encode("utf-8")
+
+
+def _orjson_dumps(obj: Any, compact: bool = False) -> bytes:
+    option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+_CODECS: Dict[str, JsonCodec] = {"json": JsonCodec("json", _std_dumps, json.loads)}
+if orjson is not None:
+    _CODECS["orjson"] = JsonCodec("orjson", _orjson_dumps, orjson.loads)
+
+
+def register_codec(codec: JsonCodec) -> None:
+    _CODECS[codec.name] = codec
+
+
+def codec_names() -> List[str]:
+    return list(_CODECS)
+
+
+def get_codec(name: Optional[str] = None) -> JsonCodec:
+    """Codec by name; defaults to ``$PORTFOLIO_JSON_CODEC``, then orjson when installed, then stdlib."""
+    name = name or os.environ.get(CODEC_ENV) or ("orjson" if "orjson" in _CODECS else "json")
+    try:
+        return _CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON codec: {name}") from None
+
+
+def _column_tokens(col: pd.Series, codec: JsonCodec) -> np.ndarray:
+    """JSON text of every value in ``col``, built without per-row Python objects where possible."""
+    if pd.api.types.is_bool_dtype(col) or not pd.api.types.is_numeric_dtype(col):
+        # Text columns hold few distinct values; encode each once.
+        codes, uniques = pd.factorize(col, use_na_sentinel=True)
+        encoded = [codec.dumps(v, True).decode("utf-8") for v in uniques.tolist()]
+        return np.array(encoded + ["null"], dtype=object)[codes]
+    if pd.api.types.is_integer_dtype(col) and not col.hasnans:
+        values = col.to_numpy(dtype=np.int64).tolist()
+    else:
+        floats = col.to_numpy(dtype=float, na_value=np.nan)
+        values = floats.astype(object)
+        values[~np.isfinite(floats)] = None
+        values = values.tolist()
+    # Numbers never contain commas, so one dumps of the whole column splits cleanly.
+    body = codec.dumps(values, True).decode("utf-8")
+    return np.array(body[1:-1].split(","), dtype=object)
+
+
+def encode_frame(df: pd.DataFrame, codec: Optional[JsonCodec] = None, compact: bool = False, indent: str = "") -> str:
+    """``df`` as a JSON array of records, encoded column by column.
+
+    Equivalent to dumping ``df.to_dict(orient="records")`` with NaN mapped to
+    null, without materializing the row dicts.
+    """
+    codec = codec or get_codec()
+    if df.empty:
+        return "[]"
+    colon, comma = (":", ",") if compact else (": ", ", ")
+    columns = []
+    for name in df.columns:
+        key = codec.dumps(str(name), True).decode("utf-8") + colon
+        columns.append(key + _column_tokens(df[name], codec))
+    rows = ("{" + comma.join(row) + "}" for row in zip(*columns))
+    if compact:
+        return "[" + ",".join(rows) + "]"
+    inner = indent + "  "
+    return "[\n" + inner + (",\n" + inner).join(rows) + "\n" + indent + "]"
+
+
+def encode_columns(df: pd.DataFrame, codec: Optional[JsonCodec] = None, compact: bool = False, indent: str = "") -> str:
+    """``df`` as a JSON object of column name -> list of values (NaN as null), one column per line."""
+    codec = codec or get_codec()
+    colon = ":" if compact else ": "
+    parts = []
+    for name in df.columns:
+        tokens = _column_tokens(df[name], codec)
+        parts.append(codec.dumps(str(name), True).decode("utf-8") + colon + "[" + ",".join(tokens.tolist()) + "]")
+    if not parts:
+        return "{}"
+    if compact:
+        return "{" + ",".join(parts) + "}"
+    inner = indent + "  "
+    return "{\n" + inner + (",\n" + inner).join(parts) + "\n" + indent + "}"
+
+
+def encode_payload(
+    payload: Any,
+    compact: bool = False,
+    codec: Optional[JsonCodec] = None,
+    columnar: bool = False,
+) -> bytes:
+    """Encode a state payload; top-level DataFrame values go through ``encode_frame``.
+
+    With ``columnar`` frames are written as column -> values objects
+    (``encode_columns``) instead of record arrays.
+    """
+    codec = codec or get_codec()
+    if not isinstance(payload, dict) or not any(isinstance(v, pd.DataFrame) for v in payload.values()):
+        return codec.dumps(payload, compact)
+    encode_df = encode_columns if columnar else encode_frame
+    colon, sep = (":", ",") if compact else (": ", ",\n  ")
+    parts = []
+    for key, value in payload.items():
+        if isinstance(value, pd.DataFrame):
+            body = encode_df(value, codec, compact=compact, indent="  ")
+        else:
+            body = codec.dumps(value, compact).decode("utf-8")
+            if not compact:
+                body = body.replace("\n", "\n  ")
+        parts.append(codec.dumps(str(key), True).decode("utf-8") + colon + body)
+    if compact:
+        text = "{" + sep.join(parts) + "}"
+    else:
+        text = "{\n  " + sep.join(parts) + "\n}"
+    return text.encode("utf-8")
+
+
+def decode_payload(data: Union[bytes, str], codec: Optional[JsonCodec] = None) -> Any:
+    """Parse ``data``; documents the codec rejects fall back to stdlib json.
+
+    Older state files contain bare ``NaN`` tokens, which orjson refuses and
+    ``json.loads`` accepts.
+    """
+    codec = codec or get_codec()
+    try:
+        return codec.loads(data)
+    except ValueError:
+        if codec.loads is json.loads:
+            raise
+        return json.loads(data)
+
+
+def frame_records(df: pd.DataFrame) -> List[dict]:
+    """``to_dict(orient="records")`` with NaN/NA as None, for stores that need plain dicts."""
+    return sanitize(df.astype(object).where(df.notna(), None).to_dict(orient="records"))
+
+
+def plain_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: frame_records(v) if isinstance(v, pd.DataFrame) else sanitize(v) for k, v in payload.items()}
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from typing import Dict, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from app_constants import AUTO_PRICE_KEY
+from app_constants import ASSET_GROUP_BY_CODE, ASSET_GROUPS, AUTO_PRICE_KEY, DEFAULT_ASSET_GROUP
+
+GROUP_COL = "__group__"
 
 
 def get_auto_unit_price(code: str, prices: Dict[str, float], use_side: str) -> Optional[float]:
@@ -19,31 +23,80 @@ def get_auto_unit_price(code: str, prices: Dict[str, float], use_side: str) -> O
     return prices.get(key)
 
 
+def asset_group_from_code(code: str) -> str:
+    code = str(code or "").strip().upper()
+    return ASSET_GROUP_BY_CODE.get(code, DEFAULT_ASSET_GROUP)
+
+
+def auto_unit_price_map(prices: Dict[str, float], use_side: str) -> Dict[str, float]:
+    """Code -> unit price for every code that has an automatic price right now."""
+    out: Dict[str, float] = {"TRY": 1.0}
+    for code in AUTO_PRICE_KEY:
+        price = get_auto_unit_price(code, prices, use_side)
+        if price is not None:
+            out[code] = price
+    return out
+
+
+def column(df: pd.DataFrame, name: str, default: object) -> pd.Series:
+    """``df[name]``, or a ``default``-filled column on ``df``'s index if it is missing."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
 def compute_display_assets(assets_df: pd.DataFrame, prices: Dict[str, float], use_side: str) -> pd.DataFrame:
     df = assets_df.copy()
-    kur_list = []
-    tutar_list = []
 
-    for _, row in df.iterrows():
-        code = row.get("Kod", "")
-        qty = row.get("Adet", 0.0)
-        manual_kur = row.get("Kur (TL)", None)
+    codes = column(df, "Kod", "").fillna("").astype(str).str.strip().str.upper()
+    auto_kur = codes.map(auto_unit_price_map(prices, use_side)).astype(float)
+    manual_kur = column(df, "Kur (TL)", None)
+    kur = auto_kur.where(auto_kur.notna(), manual_kur)
 
-        auto_kur = get_auto_unit_price(code, prices, use_side)
-        kur = auto_kur if auto_kur is not None else manual_kur
+    # Unparseable or missing quantities/prices count as zero, like the old per-row loop.
+    qty = pd.to_numeric(column(df, "Adet", 0.0), errors="coerce").astype(float)
+    unit = pd.to_numeric(kur, errors="coerce").astype(float)
 
-        kur_list.append(kur)
+    df["Kur (TL)"] = kur
+    df["Tutar (TL)"] = (qty * unit).fillna(0.0)
+    return df
 
-        try:
-            q = float(qty) if qty is not None else 0.0
-            k = float(kur) if kur is not None else 0.0
-            tutar_list.append(q * k)
-        except Exception:
-            tutar_list.append(0.0)
 
-    df["Kur (TL)"] = kur_list
-    df["Tutar (TL)"] = tutar_list
-    return df
+@dataclass
+class AssetValuation:
+    """One valuation pass: display rows ordered by group, plus group and grand totals."""
+
+    display: pd.DataFrame
+    group_totals: Dict[str, float]
+    total_assets: float
+    _group_rows: Dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    def group(self, group_key: str) -> pd.DataFrame:
+        rows = self._group_rows.get(group_key)
+        if rows is None:
+            return self.display.iloc[0:0]
+        return self.display.iloc[rows]
+
+
+def value_assets(assets_df: pd.DataFrame, prices: Dict[str, float], use_side: str) -> AssetValuation:
+    display = compute_display_assets(assets_df, prices, use_side)
+    codes = column(display, "Kod", "").fillna("").astype(str).str.strip().str.upper()
+    display[GROUP_COL] = codes.map(ASSET_GROUP_BY_CODE).fillna(DEFAULT_ASSET_GROUP)
+
+    # Stable sort so each group is a contiguous block in the same order the editors show them.
+    order = {g: i for i, g in enumerate(ASSET_GROUPS)}
+    rank = display[GROUP_COL].map(order).fillna(len(order))
+    display = display.iloc[np.argsort(rank.to_numpy(), kind="stable")].reset_index(drop=True)
+
+    group_rows = display.groupby(GROUP_COL, sort=False).indices
+    sums = display.groupby(GROUP_COL, sort=False)["Tutar (TL)"].sum()
+    group_totals = {g: float(sums.get(g, 0.0)) for g in ASSET_GROUPS}
+    return AssetValuation(
+        display=display,
+        group_totals=group_totals,
+        total_assets=float(display["Tutar (TL)"].sum()),
+        _group_rows=dict(group_rows),
+    )
 
 
 def compute_totals(assets_display: pd.DataFrame, debts_df: pd.DataFrame) -> Tuple[float, float, float]:
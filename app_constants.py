@@ -14,6 +14,39 @@ AUTO_PRICE_KEY = {
     "BILEZIK": ("BILEZIK_BUY", "BILEZIK_SELL"),
 }
 
+ASSET_TYPE_TO_CODE = {
+    "mevduat hesabı": "TRY",
+    "banka (tl)": "TRY",
+    "tl": "TRY",
+    "euro": "EUR",
+    "dolar": "USD",
+    "usd": "USD",
+    "eur": "EUR",
+    "gram altın": "GRAM",
+    "gram altin": "GRAM",
+    "çeyrek": "CEYREK",
+    "ceyrek": "CEYREK",
+    "yarım": "YARIM",
+    "yarim": "YARIM",
+    "ata altın": "ATA",
+    "ata altin": "ATA",
+    "22-ayar-bilezik": "BILEZIK",
+    "bilezik": "BILEZIK",
+}
+
+ASSET_GROUP_BY_CODE = {
+    "TRY": "TL HESABI",
+    "USD": "DÖVİZ HESABI",
+    "EUR": "DÖVİZ HESABI",
+    "GRAM": "ALTIN HESABI",
+    "CEYREK": "ALTIN HESABI",
+    "YARIM": "ALTIN HESABI",
+    "ATA": "ALTIN HESABI",
+    "BILEZIK": "ALTIN HESABI",
+}
+DEFAULT_ASSET_GROUP = "TL HESABI"
+ASSET_GROUPS = ["TL HESABI", "DÖVİZ HESABI", "ALTIN HESABI"]
+
 APP_TITLE = "Portfolio Tracker"
 
 BASELINE_DATE = "2026-01-28"
@@ -1,12 +1,192 @@
 import io
+import threading
+import zipfile
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import pandas as pd
 
+from app_assets import frame_fingerprint
 
-def build_bilanco_xlsx(assets_df: pd.DataFrame, debts_df: pd.DataFrame) -> bytes:
-    """Create an Excel file in-memory with 2 sheets: Varlıklar, Borçlar."""
+ASSETS_SHEET = "Varlıklar"
+DEBTS_SHEET = "Borçlar"
+
+EXPORT_FORMATS = ("xlsx", "csv", "parquet", "arrow")
+CSV_CHUNK_ROWS = 10_000
+
+# Above this many rows the workbook is written row by row instead of via pandas.
+STREAMING_ROW_THRESHOLD = 5_000
+
+_XLSX_CACHE_SIZE = 4
+_xlsx_cache: "OrderedDict[Tuple[str, str, Optional[bool]], bytes]" = OrderedDict()
+_xlsx_cache_lock = threading.Lock()
+
+
+def _rows(df: pd.DataFrame) -> Iterable[tuple]:
+    # NaN/None become empty cells; both writers reject or mangle NaN otherwise.
+    yield tuple(str(c) for c in df.columns)
+    values = df.astype(object).where(df.notna(), None)
+    yield from values.itertuples(index=False, name=None)
+
+
+def _write_streaming(output: io.BytesIO, sheets: List[Tuple[str, pd.DataFrame]]) -> None:
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+
+    if xlsxwriter is not None:
+        workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+        for name, df in sheets:
+            ws = workbook.add_worksheet(name)
+            for r, row in enumerate(_rows(df)):
+                ws.write_row(r, 0, row)
+        workbook.close()
+        return
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for name, df in sheets:
+        ws = workbook.create_sheet(name)
+        for row in _rows(df):
+            ws.append(row)
+    workbook.save(output)
+
+
+def build_bilanco_xlsx(assets_df: pd.DataFrame, debts_df: pd.DataFrame, streaming: Optional[bool] = None) -> bytes:
+    """Create an Excel file in-memory with 2 sheets: Varlıklar, Borçlar.
+
+    ``streaming`` writes rows sequentially (xlsxwriter constant_memory when
+    installed, otherwise openpyxl write-only); by default it is used only for
+    sheets larger than ``STREAMING_ROW_THRESHOLD`` rows.
+    """
+    if streaming is None:
+        streaming = max(len(assets_df), len(debts_df)) > STREAMING_ROW_THRESHOLD
     output = io.BytesIO()
+    if streaming:
+        _write_streaming(output, [(ASSETS_SHEET, assets_df), (DEBTS_SHEET, debts_df)])
+        return output.getvalue()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        assets_df.to_excel(writer, index=False, sheet_name="Varlıklar")
-        debts_df.to_excel(writer, index=False, sheet_name="Borçlar")
+        assets_df.to_excel(writer, index=False, sheet_name=ASSETS_SHEET)
+        debts_df.to_excel(writer, index=False, sheet_name=DEBTS_SHEET)
     return output.getvalue()
+
+
+def build_bilanco_xlsx_cached(assets_df: pd.DataFrame, debts_df: pd.DataFrame, streaming: Optional[bool] = None) -> bytes:
+    """``build_bilanco_xlsx`` memoized on the content of both frames."""
+    key = (frame_fingerprint(assets_df), frame_fingerprint(debts_df), streaming)
+    with _xlsx_cache_lock:
+        cached = _xlsx_cache.get(key)
+        if cached is not None:
+            _xlsx_cache.move_to_end(key)
+            return cached
+    data = build_bilanco_xlsx(assets_df, debts_df, streaming=streaming)
+    with _xlsx_cache_lock:
+        _xlsx_cache[key] = data
+        while len(_xlsx_cache) > _XLSX_CACHE_SIZE:
+            _xlsx_cache.popitem(last=False)
+    return data
+
+
+def iter_csv_chunks(df: pd.DataFrame, chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[bytes]:
+    """UTF-8 CSV of ``df`` as a stream of byte chunks (header in the first one)."""
+    if df.empty:
+        yield df.to_csv(index=False).encode("utf-8")
+        return
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=start == 0).encode("utf-8")
+
+
+def build_csv(df: pd.DataFrame) -> bytes:
+    return b"".join(iter_csv_chunks(df))
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Parquet/Arrow export requires the 'pyarrow' package") from e
+    return pa
+
+
+def _arrow_table(df: pd.DataFrame):
+    pa = _pyarrow()
+    arrays = []
+    for name in df.columns:
+        col = df[name]
+        try:
+            arrays.append(pa.array(col, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed object columns (e.g. manual Kur text next to numbers) are exported as text.
+            arrays.append(pa.array(col.astype(object).where(col.notna(), None).map(lambda v: v if v is None else str(v))))
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+
+def build_parquet(df: pd.DataFrame, compression: str = "zstd") -> bytes:
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(_arrow_table(df), sink, compression=compression)
+    return sink.getvalue().to_pybytes()
+
+
+def build_arrow(df: pd.DataFrame) -> bytes:
+    """Arrow IPC file format; readers can memory-map it with ``pa.memory_map``."""
+    pa = _pyarrow()
+    table = _arrow_table(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def net_history_frame(net_history: List[dict]) -> pd.DataFrame:
+    df = pd.DataFrame(net_history, columns=["date", "net"])
+    df["net"] = pd.to_numeric(df["net"], errors="coerce")
+    return df.sort_values("date", kind="stable").reset_index(drop=True)
+
+
+def export_tables(
+    assets_df: pd.DataFrame,
+    debts_df: pd.DataFrame,
+    net_history: List[dict],
+    fmt: str,
+) -> Dict[str, bytes]:
+    """File name -> bytes for assets, debts and net history in ``fmt``.
+
+    ``xlsx`` keeps the two-sheet balance sheet plus a separate net history file.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    history = net_history_frame(net_history)
+    if fmt == "xlsx":
+        out = io.BytesIO()
+        with pd.ExcelWriter(out, engine="openpyxl") as writer:
+            history.to_excel(writer, index=False, sheet_name="Net")
+        return {"bilanco.xlsx": build_bilanco_xlsx(assets_df, debts_df), "net_history.xlsx": out.getvalue()}
+
+    build = {"csv": build_csv, "parquet": build_parquet, "arrow": build_arrow}[fmt]
+    return {
+        f"assets.{fmt}": build(assets_df),
+        f"debts.{fmt}": build(debts_df),
+        f"net_history.{fmt}": build(history),
+    }
+
+
+def build_export_zip(
+    assets_df: pd.DataFrame,
+    debts_df: pd.DataFrame,
+    net_history: List[dict],
+    fmt: str,
+) -> bytes:
+    """``export_tables`` as one zip archive, for a single download button."""
+    out = io.BytesIO()
+    # Parquet/Arrow files are already compressed; storing them avoids a second pass.
+    compression = zipfile.ZIP_DEFLATED if fmt in ("csv", "xlsx") else zipfile.ZIP_STORED
+    with zipfile.ZipFile(out, "w", compression=compression) as zf:
+        for name, data in export_tables(assets_df, debts_df, net_history, fmt).items():
+            zf.writestr(name, data)
+    return out.getvalue()
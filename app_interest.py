@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import datetime as dt
+import re
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+WITHHOLDING_RATE = 0.175
+DEPOSIT_TYPE = "mevduat hesabı"
+INTEREST_DAY_START_HOUR = 6
+
+_RATE_PATTERN = r"([-+]?\d*\.?\d+)"
+
+ArrayLike = Union[float, int, np.ndarray, pd.Series, list]
+
+
+def parse_rate_percent(value: str) -> float:
+    if value is None:
+        return 0.0
+    text = str(value).strip().replace(",", ".")
+    if not text:
+        return 0.0
+    match = re.search(_RATE_PATTERN, text)
+    if not match:
+        return 0.0
+    try:
+        return float(match.group(0))
+    except Exception:
+        return 0.0
+
+
+def parse_rate_percents(values: pd.Series) -> np.ndarray:
+    """Vectorized ``parse_rate_percent``: first number in each cell, 0 when there is none."""
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_numeric(values, errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    # Rate columns hold few distinct values; parse each one once.
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parsed = np.array([parse_rate_percent(v) for v in uniques] + [0.0], dtype=float)
+    return parsed[codes]
+
+
+def _is_deposit(types: pd.Series) -> np.ndarray:
+    codes, uniques = pd.factorize(types, use_na_sentinel=True)
+    matches = np.array([str(v).strip().lower() == DEPOSIT_TYPE for v in uniques] + [False], dtype=bool)
+    return matches[codes]
+
+
+def interest_effective_date(now: dt.datetime) -> dt.date:
+    """Interest day for ``now``; the day rolls over at 06:00."""
+    effective = now.date()
+    if now.hour < INTEREST_DAY_START_HOUR:
+        effective = effective - dt.timedelta(days=1)
+    return effective
+
+
+def compound_growth(annual_rate_pct: ArrayLike, days: ArrayLike, withholding: float = WITHHOLDING_RATE) -> np.ndarray:
+    """Net-of-withholding daily compound growth factor.
+
+    With 1-D inputs each row compounds ``days`` at its own rate. With a 2-D
+    ``annual_rate_pct`` of shape (rows, segments) each column is one segment of
+    a rate schedule, ``days`` gives the segment lengths (shape (segments,) or
+    (rows, segments)) and the segment factors are multiplied together.
+    Non-positive rates do not accrue.
+    """
+    rates = np.asarray(annual_rate_pct, dtype=float)
+    days = np.asarray(days, dtype=float)
+    daily = np.where(rates > 0, rates / 100.0 / 365.0 * (1.0 - withholding), 0.0)
+    growth = np.power(1.0 + daily, np.maximum(days, 0.0))
+    if growth.ndim == 2:
+        growth = growth.prod(axis=1)
+    return growth
+
+
+def accrue_deposit_interest(
+    assets_df: pd.DataFrame,
+    days: ArrayLike,
+    annual_rate_pct: Optional[ArrayLike] = None,
+    withholding: float = WITHHOLDING_RATE,
+) -> pd.DataFrame:
+    """Grow ``Adet`` of every positive "Mevduat Hesabı" row by its compounded interest.
+
+    ``days`` may be a scalar or one gap per row. ``annual_rate_pct`` overrides
+    the parsed ``Yıllık Faiz (%)`` column and may be a per-row rate schedule
+    (see ``compound_growth``).
+    """
+    df = assets_df.copy()
+    if df.empty or "Adet" not in df.columns:
+        return df
+
+    is_deposit = _is_deposit(df.get("Varlık Türü", pd.Series("", index=df.index)))
+    principal = pd.to_numeric(df["Adet"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+    if annual_rate_pct is None:
+        rates = parse_rate_percents(df.get("Yıllık Faiz (%)", pd.Series("", index=df.index)))
+    else:
+        rates = np.asarray(annual_rate_pct, dtype=float)
+    growth = np.broadcast_to(compound_growth(rates, days, withholding), principal.shape)
+
+    mask = is_deposit & (principal > 0) & (growth != 1.0)
+    if mask.any():
+        df.loc[mask, "Adet"] = principal[mask] * growth[mask]
+    return df
+
+
+def accrue_since(
+    assets_df: pd.DataFrame,
+    last_date_str: Optional[str],
+    now: dt.datetime,
+    withholding: float = WITHHOLDING_RATE,
+) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Apply interest for the days between ``last_date_str`` and ``now``.
+
+    Returns the (possibly unchanged) frame and the interest date to store.
+    """
+    effective_date = interest_effective_date(now)
+    if not last_date_str:
+        return assets_df, effective_date.isoformat()
+    try:
+        last_date = dt.date.fromisoformat(last_date_str)
+    except Exception:
+        return assets_df, last_date_str
+    days = (effective_date - last_date).days
+    if days <= 0:
+        return assets_df, last_date_str
+    return accrue_deposit_interest(assets_df, days, withholding=withholding), effective_date.isoformat()
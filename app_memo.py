@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+MEMO_KEY = "_stage_memo"
+
+
+class StageMemo:
+    """Remembers the last input key and result of each named pipeline stage.
+
+    A stage is recomputed only when its key changes; keys are built from
+    content fingerprints (see ``app_assets.frame_fingerprint``) and plain values such as
+    the price signature, so equal inputs hit even across reruns that rebuilt
+    the frames.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[Hashable, Any]] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def run(self, stage: str, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        entry = self._entries.get(stage)
+        if entry is not None and entry[0] == key:
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            return entry[1]
+        self.misses[stage] = self.misses.get(stage, 0) + 1
+        value = fn(*args, **kwargs)
+        self._entries[stage] = (key, value)
+        return value
+
+    def stats(self) -> List[Dict[str, Any]]:
+        rows = []
+        for stage in sorted(set(self.hits) | set(self.misses)):
+            hits = self.hits.get(stage, 0)
+            misses = self.misses.get(stage, 0)
+            rows.append({"stage": stage, "hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)})
+        return rows
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits.clear()
+        self.misses.clear()
+
+
+def get_stage_memo(session_state: Dict) -> StageMemo:
+    memo = session_state.get(MEMO_KEY)
+    if memo is None:
+        memo = StageMemo()
+        session_state[MEMO_KEY] = memo
+    return memo
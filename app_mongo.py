@@ -1,7 +1,24 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Connection pool settings, read from env or Streamlit secrets. Compression is
+# off unless MONGO_COMPRESSORS lists some (e.g. "zstd,snappy,zlib"); the
+# server then picks the first one it also supports.
+POOL_SETTINGS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int, 20),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int, 0),
+    "MONGO_MAX_IDLE_MS": ("maxIdleTimeMS", int, 300_000),
+    "MONGO_SERVER_SELECTION_MS": ("serverSelectionTimeoutMS", int, 5000),
+    "MONGO_COMPRESSORS": ("compressors", str, ""),
+}
+
+BULK_BATCH_SIZE = 500
+# Documents per cursor round trip when streaming a collection.
+CURSOR_BATCH_SIZE = 1000
 
 
 def _get_secret(name: str) -> Optional[str]:
@@ -13,31 +30,176 @@ def _get_secret(name: str) -> Optional[str]:
         return None
 
 
+def _strip_quotes(value: str) -> str:
+    value = str(value).strip()
+    # Strip surrounding quotes if env/secret includes them
+    if (value.startswith('"') and value.endswith('"')) or (value.startswith("'") and value.endswith("'")):
+        value = value[1:-1].strip()
+    return value
+
+
+def _setting(name: str) -> Optional[str]:
+    value = os.getenv(name) or _get_secret(name)
+    if value is None:
+        return None
+    return _strip_quotes(value) or None
+
+
 def get_mongo_uri() -> Optional[str]:
     uri = os.getenv("MONGO_URI") or _get_secret("MONGO_URI")
     if not uri:
         return None
-    uri = str(uri).strip()
-    # Strip surrounding quotes if env/secret includes them
-    if (uri.startswith('"') and uri.endswith('"')) or (uri.startswith("'") and uri.endswith("'")):
-        uri = uri[1:-1].strip()
-    return uri or None
+    return _strip_quotes(uri) or None
 
 
 def get_mongo_db_name() -> str:
-    name = os.getenv("MONGO_DB") or _get_secret("MONGO_DB") or "portfolio"
-    name = str(name).strip()
-    if (name.startswith('"') and name.endswith('"')) or (name.startswith("'") and name.endswith("'")):
-        name = name[1:-1].strip()
-    return name or "portfolio"
+    return _setting("MONGO_DB") or "portfolio"
 
 
 def mongo_enabled() -> bool:
     return bool(get_mongo_uri())
 
 
+def mongo_client_options() -> Dict[str, Any]:
+    """``MongoClient`` keyword arguments from the ``POOL_SETTINGS`` env/secrets."""
+    options: Dict[str, Any] = {}
+    for name, (option, cast, default) in POOL_SETTINGS.items():
+        raw = _setting(name)
+        if raw is None:
+            options[option] = default
+            continue
+        try:
+            options[option] = cast(raw)
+        except ValueError:
+            options[option] = default
+    # "none" turns compression off.
+    compressors = [c.strip() for c in str(options.pop("compressors")).split(",") if c.strip() not in ("", "none")]
+    if compressors:
+        options["compressors"] = _available_compressors(compressors)
+    if not options.get("compressors"):
+        options.pop("compressors", None)
+    return options
+
+
+def _available_compressors(names: Sequence[str]) -> List[str]:
+    # zstd and snappy need optional client packages; asking for them without
+    # the package makes MongoClient raise.
+    modules = {"zstd": "zstandard", "snappy": "snappy"}
+    out = []
+    for name in names:
+        module = modules.get(name)
+        if module is not None:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+        out.append(name)
+    return out
+
+
+class CommandMetrics:
+    """Per-command latency totals fed by a pymongo command listener.
+
+    Keeps count, failures, total and max duration, plus the most recent
+    ``window`` durations for percentiles.
+    """
+
+    def __init__(self, window: int = 512) -> None:
+        self._lock = threading.Lock()
+        self._window = window
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, command: str, duration_ms: float, failed: bool = False) -> None:
+        with self._lock:
+            st = self._stats.get(command)
+            if st is None:
+                st = {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0, "recent": deque(maxlen=self._window)}
+                self._stats[command] = st
+            st["count"] += 1
+            st["failures"] += int(failed)
+            st["total_ms"] += duration_ms
+            st["max_ms"] = max(st["max_ms"], duration_ms)
+            st["recent"].append(duration_ms)
+
+    def started(self, event: Any) -> None:
+        pass
+
+    def succeeded(self, event: Any) -> None:
+        self.record(event.command_name, event.duration_micros / 1000.0)
+
+    def failed(self, event: Any) -> None:
+        self.record(event.command_name, event.duration_micros / 1000.0, failed=True)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        rows = []
+        with self._lock:
+            for command, st in sorted(self._stats.items()):
+                recent = sorted(st["recent"])
+                p95 = recent[min(len(recent) - 1, int(0.95 * len(recent)))] if recent else 0.0
+                rows.append(
+                    {
+                        "command": command,
+                        "count": st["count"],
+                        "failures": st["failures"],
+                        "mean_ms": st["total_ms"] / st["count"],
+                        "p95_ms": p95,
+                        "max_ms": st["max_ms"],
+                    }
+                )
+        return rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+_metrics = CommandMetrics()
+
+
+def mongo_metrics() -> List[Dict[str, Any]]:
+    return _metrics.stats()
+
+
+def reset_mongo_metrics() -> None:
+    _metrics.reset()
+
+
+def _command_listener(metrics: CommandMetrics):
+    from pymongo import monitoring
+
+    class _Listener(monitoring.CommandListener):
+        def started(self, event):
+            metrics.started(event)
+
+        def succeeded(self, event):
+            metrics.succeeded(event)
+
+        def failed(self, event):
+            metrics.failed(event)
+
+    return _Listener()
+
+
 _client = None
 _db = None
+_db_lock = threading.Lock()
+
+
+def use_db(db: Any) -> None:
+    """Install ``db`` (e.g. a mongomock database or a test stand-in) as the process database."""
+    global _client, _db
+    with _db_lock:
+        _client = None
+        _db = db
+
+
+def close_db() -> None:
+    global _client, _db
+    with _db_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _db = None
 
 
 def get_db():
@@ -49,12 +211,103 @@ def get_db():
         raise RuntimeError("MongoDB URI not configured")
     from pymongo import MongoClient
 
-    _client = MongoClient(uri, serverSelectionTimeoutMS=5000)
-    _db = _client[get_mongo_db_name()]
+    with _db_lock:
+        if _db is not None:
+            return _db
+        _client = MongoClient(uri, event_listeners=[_command_listener(_metrics)], **mongo_client_options())
+        db = _client[get_mongo_db_name()]
+        _ensure_indexes(db)
+        _db = db
+    return _db
+
+
+def _ensure_indexes(db) -> None:
     try:
-        _db["users"].create_index("username", unique=True)
-        _db["user_state"].create_index("username", unique=True)
+        db["users"].create_index("username", unique=True)
+        db["user_state"].create_index("username", unique=True)
     except Exception:
         # Index creation can fail if permissions are limited; ignore to avoid crash
         pass
-    return _db
+
+
+def projection(*fields: str, include_id: bool = False) -> Dict[str, int]:
+    """Inclusion projection for ``fields``; ``_id`` is excluded unless asked for."""
+    proj = {f: 1 for f in fields}
+    if not include_id:
+        proj["_id"] = 0
+    return proj
+
+
+def iter_documents(
+    coll: Any,
+    flt: Optional[Dict[str, Any]] = None,
+    fields: Sequence[str] = (),
+    batch_size: int = CURSOR_BATCH_SIZE,
+    sort_key: Optional[str] = "username",
+) -> Iterator[Dict[str, Any]]:
+    """Stream the documents matching ``flt``, projected to ``fields`` (whole documents if empty).
+
+    The cursor fetches ``batch_size`` documents per round trip, so memory is
+    bounded by one batch whatever the collection size. Sorting on the indexed
+    ``sort_key`` keeps the order stable; the cursor is closed when the
+    generator is, including when a caller stops early.
+    """
+    kwargs: Dict[str, Any] = {"batch_size": batch_size}
+    if sort_key:
+        kwargs["sort"] = [(sort_key, 1)]
+    cursor = coll.find(flt or {}, projection(*fields) if fields else None, **kwargs)
+    try:
+        yield from cursor
+    finally:
+        close = getattr(cursor, "close", None)
+        if close is not None:
+            close()
+
+
+def batched(items: Iterable[Any], size: int = BULK_BATCH_SIZE) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def bulk_update(
+    coll: Any,
+    updates: Iterable[Tuple[Dict[str, Any], Dict[str, Any]]],
+    upsert: bool = False,
+    batch_size: int = BULK_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Send ``(filter, update)`` pairs as unordered ``bulk_write`` batches; returns summed counts."""
+    from pymongo import UpdateOne
+
+    totals = {"matched": 0, "modified": 0, "upserted": 0, "batches": 0}
+    for batch in batched(updates, batch_size):
+        result = coll.bulk_write([UpdateOne(f, u, upsert=upsert) for f, u in batch], ordered=False)
+        totals["matched"] += result.matched_count
+        totals["modified"] += result.modified_count
+        totals["upserted"] += result.upserted_count
+        totals["batches"] += 1
+    return totals
+
+
+def bulk_set_by_key(
+    coll: Any,
+    docs: Iterable[Dict[str, Any]],
+    key: str = "username",
+    upsert: bool = True,
+    batch_size: int = BULK_BATCH_SIZE,
+) -> Dict[str, int]:
+    """Upsert each document by ``key`` with ``$set`` of its fields, in bulk batches."""
+    return bulk_update(coll, (({key: d[key]}, {"$set": d}) for d in docs), upsert=upsert, batch_size=batch_size)
+
+
+def bulk_delete_by_key(coll: Any, values: Iterable[Any], key: str = "username", batch_size: int = BULK_BATCH_SIZE) -> int:
+    """Delete documents whose ``key`` is in ``values``, one ``$in`` query per batch."""
+    deleted = 0
+    for batch in batched(values, batch_size):
+        deleted += coll.delete_many({key: {"$in": batch}}).deleted_count
+    return deleted
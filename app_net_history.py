@@ -1,40 +1,135 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional
+import bisect
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from app_constants import BASELINE_DATE, BASELINE_NET
 
+INDEX_KEY = "_net_history_index"
+
+
+class NetHistoryIndex:
+    """Date index over the ``net_history`` list.
+
+    The records list stays the storage format (list of ``{"date", "net"}``
+    dicts, sorted by date); the index keeps a parallel sorted list of dates for
+    bisect range queries and a dict for O(1) lookups. ``version`` changes
+    whenever a record is added or its value changes.
+    """
+
+    def __init__(self, records: List[dict]) -> None:
+        records.sort(key=lambda x: x.get("date", ""))
+        self.records = records
+        self.dates: List[str] = [r.get("date", "") for r in records]
+        self.by_date: Dict[str, dict] = {}
+        for d, r in zip(self.dates, records):
+            self.by_date.setdefault(d, r)
+        self.version = 0
+
+    def matches(self, records: List[dict]) -> bool:
+        return records is self.records and len(records) == len(self.dates)
+
+    def __contains__(self, date_str: str) -> bool:
+        return date_str in self.by_date
+
+    def get(self, date_str: str) -> Optional[float]:
+        r = self.by_date.get(date_str)
+        if r is None:
+            return None
+        try:
+            return float(r.get("net"))
+        except Exception:
+            return None
+
+    def add(self, date_str: str, net_value: object) -> dict:
+        """Add a record for a date not yet in the index.
+
+        Snapshots arrive in date order, so the common case is an O(1) append;
+        an earlier date is inserted in place, which shifts the tail (O(n)).
+        Merge many out-of-order dates with ``bulk_upsert`` instead.
+        """
+        record = {"date": date_str, "net": net_value}
+        if not self.dates or date_str >= self.dates[-1]:
+            self.dates.append(date_str)
+            self.records.append(record)
+        else:
+            pos = bisect.bisect_right(self.dates, date_str)
+            self.dates.insert(pos, date_str)
+            self.records.insert(pos, record)
+        self.by_date[date_str] = record
+        self.version += 1
+        return record
+
+    def upsert(self, date_str: str, net_value: float) -> bool:
+        """Insert or update ``date_str``; returns True if anything changed."""
+        net_value = float(net_value)
+        r = self.by_date.get(date_str)
+        if r is None:
+            self.add(date_str, net_value)
+            return True
+        if r.get("net") == net_value:
+            return False
+        r["net"] = net_value
+        self.version += 1
+        return True
+
+    def bulk_upsert(self, items: Iterable[Tuple[str, float]], overwrite: bool = False) -> int:
+        """Merge many ``(date, net)`` pairs with one sort; returns how many records were added or changed.
+
+        Existing dates keep their value unless ``overwrite`` is set.
+        """
+        changed = 0
+        for date_str, net_value in items:
+            net_value = float(net_value)
+            r = self.by_date.get(date_str)
+            if r is None:
+                r = {"date": date_str, "net": net_value}
+                self.records.append(r)
+                self.by_date[date_str] = r
+                changed += 1
+            elif overwrite and r.get("net") != net_value:
+                r["net"] = net_value
+                changed += 1
+        if changed:
+            self.records.sort(key=lambda x: x.get("date", ""))
+            self.dates = [r.get("date", "") for r in self.records]
+            self.version += 1
+        return changed
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> List[dict]:
+        """Records with ``start <= date <= end`` (either bound may be omitted)."""
+        lo = 0 if start is None else bisect.bisect_left(self.dates, start)
+        hi = len(self.dates) if end is None else bisect.bisect_right(self.dates, end)
+        return self.records[lo:hi]
+
+
+def get_net_history_index(session_state: Dict) -> NetHistoryIndex:
+    nh = session_state.get("net_history")
+    if nh is None:
+        nh = []
+        session_state["net_history"] = nh
+    idx = session_state.get(INDEX_KEY)
+    if idx is None or not idx.matches(nh):
+        idx = NetHistoryIndex(nh)
+        session_state[INDEX_KEY] = idx
+    return idx
+
 
 def ensure_baseline_net(session_state: Dict) -> None:
-    nh: List[dict] = session_state.get("net_history", [])
+    idx = get_net_history_index(session_state)
     baseline_date = session_state.get("baseline_date", BASELINE_DATE)
     baseline_net = session_state.get("baseline_net", BASELINE_NET)
-    if not any(r.get("date") == baseline_date for r in nh):
-        nh.append({"date": baseline_date, "net": baseline_net})
-        nh.sort(key=lambda x: x.get("date", ""))
-        session_state["net_history"] = nh
+    if baseline_date not in idx:
+        idx.add(baseline_date, baseline_net)
 
 
-def upsert_net_snapshot(session_state: Dict, date_str: str, net_value: float) -> None:
-    nh: List[dict] = session_state.get("net_history", [])
-    found = False
-    for r in nh:
-        if r.get("date") == date_str:
-            r["net"] = float(net_value)
-            found = True
-            break
-    if not found:
-        nh.append({"date": date_str, "net": float(net_value)})
-    nh.sort(key=lambda x: x.get("date", ""))
-    session_state["net_history"] = nh
+def upsert_net_snapshot(session_state: Dict, date_str: str, net_value: float) -> bool:
+    return get_net_history_index(session_state).upsert(date_str, net_value)
 
 
 def get_net_for(session_state: Dict, date_str: str) -> Optional[float]:
-    nh: List[dict] = session_state.get("net_history", [])
-    for r in nh:
-        if r.get("date") == date_str:
-            try:
-                return float(r.get("net"))
-            except Exception:
-                return None
-    return None
+    return get_net_history_index(session_state).get(date_str)
+
+
+def get_net_range(session_state: Dict, start: Optional[str] = None, end: Optional[str] = None) -> List[dict]:
+    return get_net_history_index(session_state).range(start, end)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app_net_history import get_net_history_index
+
+SERIES_KEY = "_net_series"
+
+DateLike = Union[str, dt.date, np.datetime64]
+
+
+def _day(value: DateLike) -> np.datetime64:
+    return np.datetime64(value, "D") if not isinstance(value, str) else np.datetime64(value[:10], "D")
+
+
+@dataclass(frozen=True)
+class NetSeries:
+    """Net history as parallel ``datetime64[D]`` / ``float64`` arrays sorted by date."""
+
+    dates: np.ndarray
+    nets: np.ndarray
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "NetSeries":
+        records = list(records)
+        dates = pd.to_datetime([r.get("date") for r in records], errors="coerce").to_numpy()
+        nets = pd.to_numeric(pd.Series([r.get("net") for r in records], dtype=object), errors="coerce").to_numpy(dtype=float)
+        keep = ~np.isnat(dates)
+        dates = dates[keep].astype("datetime64[D]")
+        nets = nets[keep]
+        order = np.argsort(dates, kind="stable")
+        return cls(dates=dates[order], nets=nets[order])
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def slice(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> "NetSeries":
+        """Inclusive date window, found by binary search."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, _day(start), side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, _day(end), side="right"))
+        return NetSeries(dates=self.dates[lo:hi], nets=self.nets[lo:hi])
+
+    def value_at(self, day: DateLike) -> Optional[float]:
+        i = int(np.searchsorted(self.dates, _day(day)))
+        if i < len(self.dates) and self.dates[i] == _day(day):
+            return float(self.nets[i])
+        return None
+
+    def pnl(self, base_net: float) -> np.ndarray:
+        return self.nets - float(base_net)
+
+    def returns(self, periods: int = 1) -> np.ndarray:
+        """Simple return over ``periods`` observations; NaN where there is no prior value."""
+        out = np.full(len(self.nets), np.nan)
+        if periods <= 0 or len(self.nets) <= periods:
+            return out
+        prev = self.nets[:-periods]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[periods:] = np.where(prev != 0, self.nets[periods:] / prev - 1.0, np.nan)
+        return out
+
+    def drawdown(self) -> np.ndarray:
+        """Fraction below the running peak (0 at a new high, negative below it)."""
+        if not len(self.nets):
+            return self.nets.copy()
+        peak = np.fmax.accumulate(self.nets)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(peak > 0, self.nets / peak - 1.0, 0.0)
+
+    def max_drawdown(self) -> float:
+        dd = self.drawdown()
+        return float(np.nanmin(dd)) if len(dd) else 0.0
+
+    def resample(self, freq: str) -> "NetSeries":
+        """Last observation per day (``D``), ISO week (``W``) or month (``M``)."""
+        if freq == "D":
+            buckets = self.dates
+        elif freq == "W":
+            # 1970-01-01 was a Thursday; shift so buckets start on Monday.
+            days = self.dates.astype("int64")
+            buckets = days - (days + 3) % 7
+        elif freq == "M":
+            buckets = self.dates.astype("datetime64[M]")
+        else:
+            raise ValueError(f"Unsupported frequency: {freq}")
+        if not len(buckets):
+            return self
+        last = np.flatnonzero(np.r_[buckets[1:] != buckets[:-1], True])
+        return NetSeries(dates=self.dates[last], nets=self.nets[last])
+
+    def date_strings(self) -> np.ndarray:
+        return np.datetime_as_string(self.dates, unit="D")
+
+
+def get_net_series(session_state: Dict) -> NetSeries:
+    """Columnar view of ``net_history``, rebuilt only when the history index changes."""
+    idx = get_net_history_index(session_state)
+    key = (idx.version, len(idx.records))
+    cached = session_state.get(SERIES_KEY)
+    # The index object itself is kept: an id() can be reused by a new index
+    # once the old one is collected.
+    if cached is not None and cached[0] is idx and cached[1] == key:
+        return cached[2]
+    series = NetSeries.from_records(idx.records)
+    session_state[SERIES_KEY] = (idx, key, series)
+    return series
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Iterable, Optional
+
+KDF_ALGORITHM = "pbkdf2_sha256"
+# Records without stored parameters were hashed with these.
+LEGACY_KDF_ROUNDS = 120_000
+KDF_ROUNDS = int(os.getenv("PORTFOLIO_KDF_ROUNDS", "600000"))
+
+# hashlib releases the GIL while deriving, so a few workers use a few cores;
+# more would only make every login slower under a burst.
+KDF_WORKERS = int(os.getenv("PORTFOLIO_KDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+KDF_TIMEOUT_S = 10.0
+# One derivation at KDF_ROUNDS on a slow core (about 0.3-0.6 s at 600k here).
+KDF_HASH_ESTIMATE_S = float(os.getenv("PORTFOLIO_KDF_HASH_ESTIMATE_S", "1.0")) * KDF_ROUNDS / 600_000
+# The last check in a full queue waits max_pending / workers derivations;
+# keep that within half the timeout so queued logins finish instead of timing out.
+KDF_MAX_PENDING = max(KDF_WORKERS, int(KDF_WORKERS * KDF_TIMEOUT_S / 2 / KDF_HASH_ESTIMATE_S))
+
+THROTTLE_MAX_FAILURES = 5
+THROTTLE_WINDOW_S = 300.0
+THROTTLE_BASE_DELAY_S = 30.0
+THROTTLE_MAX_DELAY_S = 900.0
+# Upper bound on tracked keys; a credential-stuffing run tries endless names.
+THROTTLE_MAX_KEYS = 100_000
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the KDF queue is full or a check timed out; callers should ask the user to retry."""
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("utf-8")
+
+
+def derive(password: str, salt: bytes, rounds: int, algorithm: str = KDF_ALGORITHM) -> bytes:
+    if algorithm != KDF_ALGORITHM:
+        raise ValueError(f"Unsupported password algorithm: {algorithm}")
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, rounds)
+
+
+class HashingService:
+    """Runs KDF work on a bounded pool instead of the calling (script) thread.
+
+    At most ``max_pending`` derivations are queued or running; beyond that
+    ``HashingBusy`` is raised immediately rather than piling up threads. A
+    derivation that does not finish within ``timeout_s`` raises it as well.
+    """
+
+    def __init__(self, workers: int = KDF_WORKERS, max_pending: int = KDF_MAX_PENDING) -> None:
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="kdf")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+
+    def run(self, fn: Callable[..., Any], *args: Any, timeout_s: float = KDF_TIMEOUT_S) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password checks in progress")
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout_s)
+        except FutureTimeout:
+            future.cancel()  # frees the slot now if it never started
+            raise HashingBusy("Password check timed out") from None
+
+    def derive(self, password: str, salt: bytes, rounds: int, algorithm: str = KDF_ALGORITHM) -> bytes:
+        return self.run(derive, password, salt, rounds, algorithm)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_service: Optional[HashingService] = None
+_service_lock = threading.Lock()
+
+
+def get_hashing_service() -> HashingService:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = HashingService()
+    return _service
+
+
+def make_password_record(password: str, rounds: Optional[int] = None, service: Optional[HashingService] = None) -> Dict[str, Any]:
+    """Fresh salt + hash with the KDF parameters stored next to them."""
+    rounds = rounds or KDF_ROUNDS
+    salt = os.urandom(16)
+    digest = (service or get_hashing_service()).derive(password, salt, rounds)
+    return {"salt": _b64(salt), "hash": _b64(digest), "algo": KDF_ALGORITHM, "rounds": rounds}
+
+
+def check_password(record: Dict[str, Any], password: str, service: Optional[HashingService] = None) -> bool:
+    salt_b64 = record.get("salt")
+    hash_b64 = record.get("hash")
+    if not salt_b64 or not hash_b64:
+        return False
+    try:
+        salt = base64.b64decode(salt_b64.encode("utf-8"))
+        expected = base64.b64decode(hash_b64.encode("utf-8"))
+    except Exception:
+        return False
+    algorithm = record.get("algo") or KDF_ALGORITHM
+    rounds = int(record.get("rounds") or LEGACY_KDF_ROUNDS)
+    computed = (service or get_hashing_service()).derive(password, salt, rounds, algorithm)
+    return hmac.compare_digest(computed, expected)
+
+
+def needs_rehash(record: Dict[str, Any], rounds: Optional[int] = None) -> bool:
+    rounds = rounds or KDF_ROUNDS
+    return (record.get("algo") or KDF_ALGORITHM) != KDF_ALGORITHM or int(record.get("rounds") or LEGACY_KDF_ROUNDS) < rounds
+
+
+class LoginThrottle:
+    """Failed-login counter per key (``user:<name>``, ``ip:<addr>``).
+
+    After ``max_failures`` failures within ``window_s`` a key is locked for
+    ``base_delay_s``, doubling with each further failure up to
+    ``max_delay_s``. A successful login clears the keys it used.
+
+    Keys whose window and lockout have both passed are dropped once per
+    ``window_s``, and at most ``max_keys`` keys are kept (least recently
+    failed first out), so unique usernames cannot grow the state without limit.
+    """
+
+    def __init__(
+        self,
+        max_failures: int = THROTTLE_MAX_FAILURES,
+        window_s: float = THROTTLE_WINDOW_S,
+        base_delay_s: float = THROTTLE_BASE_DELAY_S,
+        max_delay_s: float = THROTTLE_MAX_DELAY_S,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = THROTTLE_MAX_KEYS,
+    ) -> None:
+        self.max_failures = max_failures
+        self.window_s = window_s
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self._clock = clock
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # Both dicts are kept in least-recently-failed order.
+        self._failures: Dict[str, list] = {}
+        self._locked_until: Dict[str, float] = {}
+        self._pruned_at = clock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._failures.keys() | self._locked_until.keys())
+
+    def _prune(self, now: float) -> None:
+        for key in [k for k, times in self._failures.items() if now - times[-1] >= self.window_s]:
+            del self._failures[key]
+        for key in [k for k, until in self._locked_until.items() if until <= now]:
+            del self._locked_until[key]
+        self._pruned_at = now
+
+    def retry_after(self, keys: Iterable[str]) -> float:
+        """Seconds until any of ``keys`` may try again (0 if none is locked)."""
+        now = self._clock()
+        with self._lock:
+            return max([self._locked_until.get(k, 0.0) - now for k in keys] + [0.0])
+
+    def record_failure(self, keys: Iterable[str]) -> None:
+        now = self._clock()
+        with self._lock:
+            if now - self._pruned_at >= self.window_s:
+                self._prune(now)
+            for key in keys:
+                recent = [t for t in self._failures.pop(key, []) if now - t < self.window_s]
+                recent.append(now)
+                self._failures[key] = recent
+                excess = len(recent) - self.max_failures
+                if excess >= 0:
+                    delay = min(self.base_delay_s * (2 ** excess), self.max_delay_s)
+                    self._locked_until.pop(key, None)
+                    self._locked_until[key] = now + delay
+            for d in (self._failures, self._locked_until):
+                while len(d) > self.max_keys:
+                    del d[next(iter(d))]
+
+    def record_success(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._failures.pop(key, None)
+                self._locked_until.pop(key, None)
+
+
+_throttle = LoginThrottle()
+
+
+def get_login_throttle() -> LoginThrottle:
+    return _throttle
+
+
+def throttle_keys(username: str, ip: Optional[str] = None) -> list:
+    keys = [f"user:{username.lower()}"]
+    if ip:
+        keys.append(f"ip:{ip}")
+    return keys
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app_pricing import PriceSnapshot, SharedPriceCache
+
+PRICE_HISTORY_PATH = os.getenv("PRICE_HISTORY_PATH", os.path.join("user_data", "_price_history.sqlite3"))
+
+TimeLike = Union[str, dt.datetime, dt.date]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    ts TEXT PRIMARY KEY,
+    source TEXT,
+    digest TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS prices (
+    code TEXT NOT NULL,
+    ts TEXT NOT NULL,
+    price REAL NOT NULL,
+    PRIMARY KEY (code, ts)
+) WITHOUT ROWID;
+"""
+
+
+def _utc(value: dt.datetime) -> dt.datetime:
+    # Naive values are local time, like every dt.datetime.now() in the app.
+    return value.astimezone(dt.timezone.utc).replace(tzinfo=None)
+
+
+def _ts(value: TimeLike) -> str:
+    """Naive UTC ISO timestamp text; sorts chronologically, which the range queries rely on.
+
+    Aware values are converted; naive ones and bare dates are local time.
+    """
+    if isinstance(value, str):
+        value = dt.date.fromisoformat(value) if len(value) == 10 else dt.datetime.fromisoformat(value)
+    if not isinstance(value, dt.datetime):
+        # A date means "as of the end of that day".
+        value = dt.datetime.combine(value, dt.time.max)
+    return _utc(value).isoformat(timespec="microseconds")
+
+
+def snapshot_digest(prices_try: Dict[str, float]) -> str:
+    payload = json.dumps(sorted((str(k), float(v)) for k, v in prices_try.items()), separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PriceHistory:
+    """Append-only SQLite store of price snapshots.
+
+    Each distinct snapshot gets a row in ``snapshots`` (a snapshot identical
+    to the previous one is skipped) and each price code a row in ``prices``
+    only when its value changed, so a code's rows form a step series. Both
+    tables are keyed for index seeks: "price as of t" is a single
+    ``(code, ts)`` B-tree lookup.
+    """
+
+    def __init__(self, path: str = PRICE_HISTORY_PATH) -> None:
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._last_digest = self._query_last_digest()
+            self._last_prices = self._query_latest_prices()
+
+    def _query_last_digest(self) -> Optional[str]:
+        row = self._conn.execute("SELECT digest FROM snapshots ORDER BY ts DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def _query_latest_prices(self) -> Dict[str, float]:
+        rows = self._conn.execute(
+            "SELECT p.code, p.price FROM prices p "
+            "JOIN (SELECT code, MAX(ts) AS ts FROM prices GROUP BY code) last "
+            "ON p.code = last.code AND p.ts = last.ts"
+        )
+        return {code: price for code, price in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record(self, snap: PriceSnapshot) -> bool:
+        """Store ``snap``; returns False for empty snapshots and repeats of the previous one."""
+        prices = {str(k): float(v) for k, v in (snap.prices_try or {}).items() if v is not None}
+        if not prices:
+            return False
+        digest = snapshot_digest(prices)
+        ts = _ts(snap.fetched_at)
+        with self._lock:
+            if digest == self._last_digest:
+                return False
+            changed = [(code, ts, price) for code, price in prices.items() if self._last_prices.get(code) != price]
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (ts, source, digest) VALUES (?, ?, ?)", (ts, snap.source, digest)
+                )
+                self._conn.executemany("INSERT OR REPLACE INTO prices (code, ts, price) VALUES (?, ?, ?)", changed)
+            self._last_digest = digest
+            self._last_prices.update(prices)
+        return True
+
+    def __call__(self, snap: PriceSnapshot) -> None:
+        # Lets the store itself be registered as a SharedPriceCache listener.
+        self.record(snap)
+
+    def codes(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT code FROM prices ORDER BY code")]
+
+    def snapshot_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    def price_as_of(self, code: str, when: TimeLike) -> Optional[float]:
+        """Last known price of ``code`` at or before ``when``."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT price FROM prices WHERE code = ? AND ts <= ? ORDER BY ts DESC LIMIT 1", (code, _ts(when))
+            ).fetchone()
+        return row[0] if row else None
+
+    def prices_as_of(self, when: TimeLike, codes: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """``prices_try``-style dict for ``when`` (only codes with a known price)."""
+        out = {}
+        for code in (self.codes() if codes is None else codes):
+            price = self.price_as_of(code, when)
+            if price is not None:
+                out[code] = price
+        return out
+
+    def range(
+        self,
+        code: str,
+        start: Optional[TimeLike] = None,
+        end: Optional[TimeLike] = None,
+        include_prior: bool = True,
+    ) -> Tuple[List[str], np.ndarray]:
+        """Change points of ``code`` in ``[start, end]`` as (naive UTC timestamps, prices).
+
+        With ``include_prior`` the value in force at ``start`` is included, so
+        the returned step series covers the whole window.
+        """
+        lo = _ts(start) if start is not None else ""
+        hi = _ts(end) if end is not None else "\uffff"
+        return self._range(code, lo, hi, include_prior and start is not None)
+
+    def _range(self, code: str, lo: str, hi: str, include_prior: bool) -> Tuple[List[str], np.ndarray]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, price FROM prices WHERE code = ? AND ts >= ? AND ts <= ? ORDER BY ts", (code, lo, hi)
+            ).fetchall()
+            if include_prior and (not rows or rows[0][0] > lo):
+                prior = self._conn.execute(
+                    "SELECT ts, price FROM prices WHERE code = ? AND ts < ? ORDER BY ts DESC LIMIT 1", (code, lo)
+                ).fetchone()
+                if prior:
+                    rows.insert(0, prior)
+        return [r[0] for r in rows], np.array([r[1] for r in rows], dtype=float)
+
+    def asof_matrix(self, codes: Sequence[str], times: Sequence[TimeLike]) -> np.ndarray:
+        """Prices of ``codes`` at each of ``times`` (sorted), shape (len(times), len(codes)); NaN if unknown.
+
+        One range read per code, then a vectorized as-of join via ``searchsorted``.
+        """
+        keys = np.array([_ts(t) for t in times])
+        out = np.full((len(keys), len(codes)), np.nan)
+        if not len(keys):
+            return out
+        for j, code in enumerate(codes):
+            # keys are already normalized; passing them through range() would convert them again.
+            ts, prices = self._range(code, keys[0], keys[-1], include_prior=True)
+            if not ts:
+                continue
+            idx = np.searchsorted(np.array(ts), keys, side="right") - 1
+            valid = idx >= 0
+            out[valid, j] = prices[idx[valid]]
+        return out
+
+
+_history: Optional[PriceHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_price_history(path: Optional[str] = None) -> PriceHistory:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = PriceHistory(path or PRICE_HISTORY_PATH)
+        return _history
+
+
+def attach_price_history(cache: SharedPriceCache, history: Optional[PriceHistory] = None) -> Optional[PriceHistory]:
+    """Record every snapshot ``cache`` stores from now on (safe to call on every rerun).
+
+    History is best effort: if the store cannot be opened or written the page
+    keeps working without it and None is returned.
+    """
+    try:
+        history = history or get_price_history()
+        cache.add_listener(history)
+        snap = cache.snapshot
+        if snap is not None and snap.prices_try:
+            history.record(snap)
+    except Exception:
+        return None
+    return history
@@ -1,12 +1,20 @@
 from __future__ import annotations
 
+import os
+import threading
 import time
 import datetime as dt
+import statistics
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app_constants import AUTO_PRICE_KEY
 
 
 @dataclass
@@ -68,17 +76,150 @@ def _parse_update_date(s: str) -> dt.datetime:
     return dt.datetime.now()
 
 
+HTTP_POOL_SIZE = 8
+HTTP_RETRY = Retry(
+    total=2,
+    connect=2,
+    read=1,
+    status=2,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"GET"}),
+    respect_retry_after_header=True,
+)
+
+_http_session: Optional[requests.Session] = None
+_http_lock = threading.Lock()
+_http_counters: Dict[str, int] = {"requests": 0, "new_connections": 0, "reused_connections": 0, "not_modified": 0}
+# Connections the session had opened as of the last counted request, and how
+# many of those no request has been credited with yet (guarded by _http_lock).
+_connections_seen = 0
+_connections_unclaimed = 0
+
+
+@dataclass
+class _Validated:
+    etag: Optional[str]
+    last_modified: Optional[str]
+    snapshot: PriceSnapshot
+
+
+# url -> validators and the snapshot parsed from the last 200 response
+_validated: Dict[str, _Validated] = {}
+_validated_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """Shared keep-alive session used by all price sources."""
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=HTTP_RETRY)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = "Mozilla/5.0 (portfolio-tracker)"
+            _http_session = session
+        return _http_session
+
+
+def http_stats() -> Dict[str, int]:
+    with _http_lock:
+        return dict(_http_counters)
+
+
+def reset_http_stats() -> None:
+    with _http_lock:
+        for key in _http_counters:
+            _http_counters[key] = 0
+
+
+def clear_validator_cache() -> None:
+    """Forget stored ETag/Last-Modified validators, so the next fetch of every source is unconditional."""
+    with _validated_lock:
+        _validated.clear()
+
+
+def _count(key: str) -> None:
+    with _http_lock:
+        _http_counters[key] += 1
+
+
+def _count_request(opened_total: Optional[int]) -> None:
+    """Count one request; ``opened_total`` is the session's connection total right after it.
+
+    Concurrent fetches share the session, so a before/after pair per request
+    would see other threads' connections. Instead the growth of that total is
+    tracked under the lock and each new connection is credited to one request;
+    every other request counts as reused.
+    """
+    global _connections_seen, _connections_unclaimed
+    with _http_lock:
+        _http_counters["requests"] += 1
+        if opened_total is None:
+            return
+        _connections_unclaimed += max(0, opened_total - _connections_seen)
+        _connections_seen = max(_connections_seen, opened_total)
+        if _connections_unclaimed:
+            _connections_unclaimed -= 1
+            _http_counters["new_connections"] += 1
+        else:
+            _http_counters["reused_connections"] += 1
+
+
+def _opened_connections(session: requests.Session, url: str) -> Optional[int]:
+    """Total connections ever opened by the adapter serving ``url`` (None if unknown)."""
+    try:
+        pools = session.get_adapter(url).poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+    except Exception:
+        return None
+
+
+def _conditional_get(url: str, headers: Dict[str, str], timeout_s: float) -> Tuple[Optional[requests.Response], Optional[PriceSnapshot]]:
+    """GET ``url`` with stored validators.
+
+    Returns ``(response, None)`` for a fresh body, or ``(None, snapshot)`` when
+    the server answered 304 and the previously parsed snapshot is still valid.
+    """
+    session = get_http_session()
+    with _validated_lock:
+        cached = _validated.get(url)
+    request_headers = dict(headers)
+    if cached is not None:
+        if cached.etag:
+            request_headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            request_headers["If-Modified-Since"] = cached.last_modified
+
+    r = session.get(url, headers=request_headers, timeout=timeout_s)
+    _count_request(_opened_connections(session, url))
+
+    if r.status_code == 304 and cached is not None:
+        _count("not_modified")
+        return None, cached.snapshot
+    r.raise_for_status()
+    return r, None
+
+
+def _remember_validators(url: str, response: requests.Response, snapshot: PriceSnapshot) -> None:
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    with _validated_lock:
+        if etag or last_modified:
+            _validated[url] = _Validated(etag=etag, last_modified=last_modified, snapshot=snapshot)
+        else:
+            _validated.pop(url, None)
+
+
 def _fetch_truncgil(url: str, timeout_s: int) -> Optional[PriceSnapshot]:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (portfolio-tracker)",
-        "Cache-Control": "no-cache",
-        "Pragma": "no-cache",
-    }
+    # max-age=0 makes intermediaries revalidate with the origin instead of
+    # serving a stale copy, while still allowing a cheap 304.
+    headers = {"Cache-Control": "max-age=0"}
     try:
-        cache_buster = int(time.time())
-        sep = "&" if "?" in url else "?"
-        r = requests.get(f"{url}{sep}t={cache_buster}", headers=headers, timeout=timeout_s)
-        r.raise_for_status()
+        r, not_modified = _conditional_get(url, headers, timeout_s)
+        if not_modified is not None:
+            return not_modified
         data = r.json()
 
         update_date = data.get("Update_Date") or data.get("UpdateDate") or data.get("update_date")
@@ -139,7 +280,7 @@ def _fetch_truncgil(url: str, timeout_s: int) -> Optional[PriceSnapshot]:
         if not prices:
             return None
 
-        return PriceSnapshot(
+        snap = PriceSnapshot(
             prices_try=prices,
             fetched_at=fetched_at,
             source=url,
@@ -147,6 +288,8 @@ def _fetch_truncgil(url: str, timeout_s: int) -> Optional[PriceSnapshot]:
             raw_data=data,
             update_date_str=str(update_date) if update_date else None,
         )
+        _remember_validators(url, r, snap)
+        return snap
     except Exception:
         return None
 
@@ -159,14 +302,13 @@ def fetch_from_truncgil_today_json(timeout_s: int = 10) -> Optional[PriceSnapsho
 def fetch_from_harem_gecmis_kurlar(timeout_s: int = 10) -> Optional[PriceSnapshot]:
     url = "https://www.haremaltin.com/gecmis-kurlar"
     headers = {
-        "User-Agent": "Mozilla/5.0 (portfolio-tracker)",
         "Accept-Language": "tr-TR,tr;q=0.9,en;q=0.8",
-        "Cache-Control": "no-cache",
-        "Pragma": "no-cache",
+        "Cache-Control": "max-age=0",
     }
     try:
-        r = requests.get(url, headers=headers, timeout=timeout_s)
-        r.raise_for_status()
+        r, not_modified = _conditional_get(url, headers, timeout_s)
+        if not_modified is not None:
+            return not_modified
         soup = BeautifulSoup(r.text, "lxml")
         rows = soup.find_all("tr")
         prices = {}
@@ -186,54 +328,318 @@ def fetch_from_harem_gecmis_kurlar(timeout_s: int = 10) -> Optional[PriceSnapsho
         if not prices:
             return None
 
-        return PriceSnapshot(
+        snap = PriceSnapshot(
             prices_try=prices,
             fetched_at=dt.datetime.now(),
             source=url,
             notes="Fallback: Harem AltÄ±n (Buying'e yakÄ±n).",
         )
+        _remember_validators(url, r, snap)
+        return snap
     except Exception:
         return None
 
 
-def fetch_prices(timeout_s: int = 10) -> PriceSnapshot:
-    sources = []
-    notes = []
+@dataclass
+class PriceSource:
+    name: str
+    fetch: Callable[[float], Optional[PriceSnapshot]]
+    priority: int = 100
+    deadline_s: Optional[float] = None
+
+
+PRICE_POLICIES = ("fallback", "priority", "first", "median")
+
+_PRICE_SOURCES: Dict[str, PriceSource] = {}
+
+_EXPECTED_KEYS = tuple(k for pair in AUTO_PRICE_KEY.values() for k in pair)
+
+
+def register_price_source(
+    name: str,
+    fetch: Callable[[float], Optional[PriceSnapshot]],
+    priority: int = 100,
+    deadline_s: Optional[float] = None,
+) -> None:
+    """Register (or replace) a source. Lower priority wins when merging."""
+    _PRICE_SOURCES[name] = PriceSource(name=name, fetch=fetch, priority=priority, deadline_s=deadline_s)
+
+
+def unregister_price_source(name: str) -> None:
+    _PRICE_SOURCES.pop(name, None)
+
+
+def price_sources() -> List[PriceSource]:
+    return sorted(_PRICE_SOURCES.values(), key=lambda src: src.priority)
+
+
+# Resolve the module-level functions at call time so they can be swapped out.
+register_price_source("truncgil", lambda timeout_s: fetch_from_truncgil_today_json(timeout_s=timeout_s), priority=0)
+register_price_source("harem", lambda timeout_s: fetch_from_harem_gecmis_kurlar(timeout_s=timeout_s), priority=10)
+
+
+def _merge_by_priority(results: List[Tuple[PriceSource, PriceSnapshot]]) -> Tuple[Dict[str, float], List[Tuple[PriceSource, PriceSnapshot]]]:
     merged: Dict[str, float] = {}
-    fetched_at = dt.datetime.now()
-    raw_data = None
-    update_date_str = None
-
-    snap = fetch_from_truncgil_today_json(timeout_s=timeout_s)
-    if snap:
-        merged.update(snap.prices_try)
-        fetched_at = snap.fetched_at
-        sources.append(snap.source)
-        notes.append(snap.notes)
-        raw_data = snap.raw_data
-        update_date_str = snap.update_date_str
-
-    if not merged:
-        snap2 = fetch_from_harem_gecmis_kurlar(timeout_s=timeout_s)
-        if snap2:
-            merged.update(snap2.prices_try)
-            fetched_at = snap2.fetched_at
-            sources.append(snap2.source)
-            notes.append(snap2.notes)
-
-    if not merged:
+    used = []
+    for src, snap in sorted(results, key=lambda r: r[0].priority):
+        added = False
+        for key, value in snap.prices_try.items():
+            if key not in merged and value is not None:
+                merged[key] = value
+                added = True
+        if added:
+            used.append((src, snap))
+    return merged, used
+
+
+def _best_result(results: List[Tuple[PriceSource, PriceSnapshot]]) -> Tuple[PriceSource, PriceSnapshot]:
+    return min(results, key=lambda r: r[0].priority)
+
+
+def _fallback_result_final(results: List[Tuple[PriceSource, PriceSnapshot]], pending: Sequence[PriceSource]) -> bool:
+    """True when no pending source outranks the best answer so far."""
+    return not pending or min(src.priority for src in pending) > _best_result(results)[0].priority
+
+
+def _priority_result_final(results: List[Tuple[PriceSource, PriceSnapshot]], pending: Sequence[PriceSource]) -> bool:
+    """True when no pending source could still win a key under the priority policy."""
+    if not pending:
+        return True
+    merged, used = _merge_by_priority(results)
+    if any(key not in merged for key in _EXPECTED_KEYS):
+        return False
+    worst_used = max(src.priority for src, _ in used)
+    return min(src.priority for src in pending) > worst_used
+
+
+def _collect_snapshots(sources: Sequence[PriceSource], timeout_s: float, policy: str) -> List[Tuple[PriceSource, PriceSnapshot]]:
+    """Query all sources concurrently; each one is abandoned after its own deadline."""
+    results: List[Tuple[PriceSource, PriceSnapshot]] = []
+    if not sources:
+        return results
+
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="price-source")
+    try:
+        pending = {}
+        for src in sources:
+            deadline = src.deadline_s if src.deadline_s is not None else timeout_s
+            pending[pool.submit(src.fetch, deadline)] = (src, started + deadline)
+
+        while pending:
+            now = time.monotonic()
+            for fut in [f for f, (_, until) in pending.items() if until <= now and not f.done()]:
+                pending.pop(fut)
+            if not pending:
+                break
+            wait_s = max(0.0, min(until for _, until in pending.values()) - now)
+            done, _ = wait(list(pending), timeout=wait_s, return_when=FIRST_COMPLETED)
+            for fut in done:
+                src, _ = pending.pop(fut)
+                try:
+                    snap = fut.result()
+                except Exception:
+                    snap = None
+                if snap and snap.prices_try:
+                    results.append((src, snap))
+                    if policy == "first":
+                        return results
+            if results:
+                still_pending = [src for src, _ in pending.values()]
+                if policy == "fallback" and _fallback_result_final(results, still_pending):
+                    return results
+                if policy == "priority" and _priority_result_final(results, still_pending):
+                    return results
+        return results
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_prices(timeout_s: int = 10, policy: str = "fallback", sources: Optional[Sequence[PriceSource]] = None) -> PriceSnapshot:
+    """Query every registered source concurrently and combine them per ``policy``.
+
+    ``fallback`` returns the best-ranked (lowest priority number) non-empty
+    snapshot as is; a lower-ranked source is only used when every source
+    above it failed or came back empty. ``priority`` merges keys with the
+    best-ranked source winning, so a key the primary lacks is filled in from
+    the next source, and it waits for that source when a key is missing.
+    ``first`` returns the first non-empty snapshot and ``median`` takes the
+    per-key median across all sources that answered before their deadline.
+    """
+    if policy not in PRICE_POLICIES:
+        raise ValueError(f"Unknown price policy: {policy}")
+    if sources is None:
+        sources = price_sources()
+
+    results = _collect_snapshots(list(sources), timeout_s, policy)
+
+    if not results:
         return PriceSnapshot(
             prices_try={},
-            fetched_at=fetched_at,
+            fetched_at=dt.datetime.now(),
             source="N/A",
             notes="Fiyatlar Ã§ekilemedi. Ä°nternet/engelleme olabilir. 'Kur (TL)' alanÄ±na manuel yazabilirsin.",
         )
 
+    if policy == "first":
+        return results[0][1]
+    if policy == "fallback":
+        return _best_result(results)[1]
+
+    merged, used = _merge_by_priority(results)
+    if policy == "median":
+        used = sorted(results, key=lambda r: r[0].priority)
+        for key in merged:
+            values = [snap.prices_try[key] for _, snap in used if snap.prices_try.get(key) is not None]
+            merged[key] = float(statistics.median(values))
+
+    primary = used[0][1]
     return PriceSnapshot(
         prices_try=merged,
-        fetched_at=fetched_at,
-        source=" + ".join(sources),
-        notes=" | ".join(notes),
-        raw_data=raw_data,
-        update_date_str=update_date_str,
+        fetched_at=primary.fetched_at,
+        source=" + ".join(snap.source for _, snap in used),
+        notes=" | ".join(snap.notes for _, snap in used if snap.notes),
+        raw_data=primary.raw_data,
+        update_date_str=primary.update_date_str,
     )
+
+
+class SharedPriceCache:
+    """Process-wide price cache shared by every session.
+
+    Reads never block once a snapshot exists: a stale snapshot is served while
+    a single background refresh revalidates it. ``generation`` increases every
+    time a new snapshot is stored so sessions can tell when to pick it up, and
+    listeners added with ``add_listener`` are called with each such snapshot.
+    After a failed or empty fetch the next attempt waits ``min(ttl_s, 2**n)``
+    seconds (``n`` failures in a row) instead of retrying on every read.
+    """
+
+    def __init__(
+        self,
+        ttl_s: float = 60.0,
+        timeout_s: int = 10,
+        fetch: Optional[Callable[[int], PriceSnapshot]] = None,
+    ) -> None:
+        self.ttl_s = float(ttl_s)
+        self.timeout_s = timeout_s
+        self.generation = 0
+        self._fetch = fetch or (lambda timeout_s_: fetch_prices(timeout_s=timeout_s_))
+        self._snapshot: Optional[PriceSnapshot] = None
+        self._stored_at = 0.0
+        # Last fetch attempt and how many in a row failed; successes reset both.
+        self._attempted_at = 0.0
+        self._failed_attempts = 0
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[PriceSnapshot], None]] = []
+
+    def add_listener(self, listener: Callable[[PriceSnapshot], None]) -> None:
+        """Call ``listener(snapshot)`` for every non-empty snapshot stored from now on (idempotent)."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[PriceSnapshot], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, snap: PriceSnapshot) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(snap)
+            except Exception:
+                # A broken consumer must not stop prices from refreshing.
+                pass
+
+    @property
+    def snapshot(self) -> Optional[PriceSnapshot]:
+        return self._snapshot
+
+    def age_s(self) -> float:
+        if self._snapshot is None:
+            return float("inf")
+        return time.monotonic() - self._stored_at
+
+    def retry_wait_s(self) -> float:
+        """Seconds until the backoff after failed fetches allows another attempt (0 if none failed)."""
+        if not self._failed_attempts:
+            return 0.0
+        backoff = min(self.ttl_s, 2.0 ** self._failed_attempts)
+        return max(0.0, backoff - (time.monotonic() - self._attempted_at))
+
+    def _due(self, max_age_s: float) -> bool:
+        stale = not self._snapshot.prices_try or self.age_s() >= max_age_s
+        return stale and self.retry_wait_s() <= 0
+
+    def get(self, max_age_s: Optional[float] = None, timeout_s: Optional[int] = None) -> PriceSnapshot:
+        """Return the cached snapshot, revalidating in the background once it is older than ``max_age_s``."""
+        if self._snapshot is None:
+            return self.refresh(timeout_s=timeout_s)
+        if self._due(self.ttl_s if max_age_s is None else max_age_s):
+            self.revalidate_async(timeout_s=timeout_s)
+        return self._snapshot
+
+    def refresh(self, timeout_s: Optional[int] = None) -> PriceSnapshot:
+        """Fetch live prices now. Concurrent callers share a single fetch."""
+        generation_before = self.generation
+        with self._refresh_lock:
+            if self.generation != generation_before and self._snapshot is not None:
+                return self._snapshot
+            self._attempted_at = time.monotonic()
+            self._failed_attempts += 1  # until the fetch below proves otherwise
+            snap = self._fetch(timeout_s or self.timeout_s)
+            if snap.prices_try:
+                self._failed_attempts = 0
+            # Keep serving the last good prices rather than replacing them with an empty result.
+            if snap.prices_try or self._snapshot is None:
+                self._snapshot = snap
+                self._stored_at = time.monotonic()
+                self.generation += 1
+                if snap.prices_try:
+                    self._notify(snap)
+            return self._snapshot
+
+    def revalidate_async(self, timeout_s: Optional[int] = None) -> bool:
+        if self._refresh_lock.locked():
+            return False
+        threading.Thread(
+            target=self._refresh_quietly, args=(timeout_s,), name="price-revalidate", daemon=True
+        ).start()
+        return True
+
+    def _refresh_quietly(self, timeout_s: Optional[int] = None) -> None:
+        try:
+            self.refresh(timeout_s=timeout_s)
+        except Exception:
+            pass
+
+    def start_background_refresh(self) -> None:
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="price-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop_background_refresh(self) -> None:
+        self._stop.set()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(max(1.0, self.ttl_s - self.age_s(), self.retry_wait_s())):
+            if self._snapshot is None or self._due(self.ttl_s):
+                self._refresh_quietly()
+
+
+PRICE_CACHE_TTL_S = float(os.getenv("PRICE_CACHE_TTL_S", "60"))
+
+_shared_cache: Optional[SharedPriceCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_price_cache() -> SharedPriceCache:
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = SharedPriceCache(ttl_s=PRICE_CACHE_TTL_S)
+            _shared_cache.start_background_refresh()
+        return _shared_cache
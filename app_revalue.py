@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app_compute import column
+from app_constants import AUTO_PRICE_KEY
+from app_net_history import NetHistoryIndex
+from app_price_history import PriceHistory, TimeLike
+
+
+@dataclass(frozen=True)
+class Holdings:
+    """A stored asset state reduced to what a revaluation needs.
+
+    ``price_keys`` are the ``prices_try`` keys the state depends on (one per
+    ``AUTO_PRICE_KEY`` code it holds). For each key, ``quantities`` is the
+    total quantity and ``manual_values`` what those rows are worth at their
+    manual Kur, used on days the price is unknown (as the page does).
+    ``fixed_value`` covers TRY and manually priced rows.
+    """
+
+    price_keys: List[str]
+    quantities: np.ndarray
+    manual_values: np.ndarray
+    fixed_value: float
+    total_debts: float
+
+    @classmethod
+    def from_state(cls, assets_df: pd.DataFrame, debts_df: pd.DataFrame, use_side: str = "BUY") -> "Holdings":
+        codes = column(assets_df, "Kod", "").fillna("").astype(str).str.strip().str.upper()
+        qty = pd.to_numeric(column(assets_df, "Adet", 0.0), errors="coerce").astype(float)
+        manual = pd.to_numeric(column(assets_df, "Kur (TL)", None), errors="coerce").astype(float)
+        manual_value = (qty * manual).fillna(0.0)
+
+        side = 1 if use_side == "SELL" else 0
+        key = codes.map({code: pair[side] for code, pair in AUTO_PRICE_KEY.items()})
+        auto = key.notna()
+        is_try = codes == "TRY"
+        fixed = float(qty[is_try].fillna(0.0).sum() + manual_value[~auto & ~is_try].sum())
+
+        grouped = pd.DataFrame({"key": key[auto], "qty": qty[auto].fillna(0.0), "manual": manual_value[auto]})
+        sums = grouped.groupby("key", sort=True)[["qty", "manual"]].sum()
+        debts = pd.to_numeric(column(debts_df, "Tutar (TL)", 0.0), errors="coerce").fillna(0.0).sum()
+        return cls(
+            price_keys=list(sums.index),
+            quantities=sums["qty"].to_numpy(dtype=float),
+            manual_values=sums["manual"].to_numpy(dtype=float),
+            fixed_value=fixed,
+            total_debts=float(debts),
+        )
+
+    def aligned(self, price_keys: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(quantities, manual_values) laid out over ``price_keys`` (zeros for keys not held)."""
+        pos = {k: i for i, k in enumerate(price_keys)}
+        qty = np.zeros(len(price_keys))
+        manual = np.zeros(len(price_keys))
+        idx = [pos[k] for k in self.price_keys]
+        qty[idx] = self.quantities
+        manual[idx] = self.manual_values
+        return qty, manual
+
+
+def revalue(holdings: Holdings, prices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Net value per row of ``prices`` (days × ``holdings.price_keys``, NaN = unknown).
+
+    Returns ``(nets, covered)``; ``covered`` is False on days where a held
+    price was unknown and the manual Kur stood in for it.
+    """
+    return revalue_many([holdings], prices, holdings.price_keys)
+
+
+def revalue_many(
+    holdings: Sequence[Holdings],
+    prices: np.ndarray,
+    price_keys: Sequence[str],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Net values of many states at once: days × users ``(nets, covered)``.
+
+    With ``Q`` the keys × users quantity matrix, the valuation is the matrix
+    product ``P @ Q`` over the known prices plus ``isnan(P) @ M`` for the
+    manual fallbacks, then the constant TRY/manual value minus debts.
+    """
+    prices = np.asarray(prices, dtype=float)
+    # reshape(-1, 0) is ambiguous; a state holding no priced codes keeps its day count.
+    prices = prices.reshape(-1, len(price_keys)) if len(price_keys) else prices.reshape(len(prices), 0)
+    q = np.zeros((len(price_keys), len(holdings)))
+    m = np.zeros((len(price_keys), len(holdings)))
+    for j, h in enumerate(holdings):
+        q[:, j], m[:, j] = h.aligned(price_keys)
+    offset = np.array([h.fixed_value - h.total_debts for h in holdings])
+
+    missing = np.isnan(prices)
+    nets = np.where(missing, 0.0, prices) @ q + missing.astype(float) @ m + offset
+    covered = (missing.astype(float) @ (q != 0).astype(float)) == 0
+    return nets, covered
+
+
+def day_range(start: TimeLike, end: TimeLike) -> np.ndarray:
+    """Calendar days from ``start`` to ``end`` inclusive, as ``datetime64[D]``."""
+    lo = np.datetime64(str(start)[:10], "D")
+    hi = np.datetime64(str(end)[:10], "D")
+    return np.arange(lo, hi + 1, dtype="datetime64[D]")
+
+
+def price_matrix(history: PriceHistory, price_keys: Sequence[str], days: np.ndarray) -> np.ndarray:
+    """End-of-day prices for ``days`` × ``price_keys`` from ``history``."""
+    return history.asof_matrix(list(price_keys), [dt.date.fromisoformat(d) for d in days.astype(str)])
+
+
+def revalue_range(
+    holdings: Holdings,
+    history: PriceHistory,
+    start: TimeLike,
+    end: TimeLike,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(days, nets, covered)`` for every day in ``[start, end]``.
+
+    Holdings are taken as they are stored now; quantities are not rolled
+    back through past edits or interest accruals.
+    """
+    days = day_range(start, end)
+    nets, covered = revalue(holdings, price_matrix(history, holdings.price_keys, days))
+    return days, nets[:, 0], covered[:, 0]
+
+
+def backfill_net_history(
+    records: List[dict],
+    days: np.ndarray,
+    nets: np.ndarray,
+    covered: Optional[np.ndarray] = None,
+    overwrite: bool = False,
+) -> int:
+    """Merge revalued days into a ``net_history`` list in place; returns how many records changed.
+
+    Only ``covered`` days are written, and existing entries are kept unless
+    ``overwrite`` is set.
+    """
+    keep = np.isfinite(nets)
+    if covered is not None:
+        keep &= covered
+    items = zip(days[keep].astype(str).tolist(), nets[keep].tolist())
+    return NetHistoryIndex(records).bulk_upsert(items, overwrite=overwrite)
+
+
+def backfill_from_history(
+    state: Dict,
+    history: PriceHistory,
+    start: TimeLike,
+    end: TimeLike,
+    use_side: str = "BUY",
+    overwrite: bool = False,
+) -> int:
+    """Revalue a stored state (``assets``/``debts`` records or frames) and backfill its ``net_history``."""
+    assets = state.get("assets")
+    debts = state.get("debts")
+    holdings = Holdings.from_state(
+        assets if isinstance(assets, pd.DataFrame) else pd.DataFrame(assets or []),
+        debts if isinstance(debts, pd.DataFrame) else pd.DataFrame(debts or []),
+        use_side,
+    )
+    days, nets, covered = revalue_range(holdings, history, start, end)
+    records = state.setdefault("net_history", [])
+    return backfill_net_history(records, days, nets, covered, overwrite=overwrite)
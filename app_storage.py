@@ -2,33 +2,274 @@ from __future__ import annotations
 
 import json
 import os
+import tempfile
+import threading
 import datetime as dt
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+import pandas as pd
 import streamlit as st
 
-from app_mongo import get_db, mongo_enabled
+from app_codec import decode_payload, encode_payload, plain_payload, sanitize
+from app_mongo import get_db, mongo_enabled, projection
+from app_net_history import NetHistoryIndex
 
-def load_state_from_json(path: str) -> Optional[Dict[str, Any]]:
+# Compact the net_history journal into the state file after this many appends.
+JOURNAL_COMPACT_LINES = 64
+
+# "records" keeps assets/debts as lists of row objects (state.json); "columnar"
+# stores them as column -> values objects (state.columnar.json), which pandas
+# loads straight into typed columns.
+STATE_LAYOUT_ENV = "PORTFOLIO_STATE_LAYOUT"
+STATE_FILES = {"records": "state.json", "columnar": "state.columnar.json"}
+FRAME_KEYS = ("assets", "debts")
+
+# Read once at import: os.umask can only be queried by setting it, which is not thread-safe.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _file_mode(path: str) -> int:
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Write ``data`` to a temp file next to ``path`` and rename it into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        # mkstemp creates 0600 files; keep the permissions a plain open() would give.
+        os.chmod(tmp_path, _file_mode(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path: str, text: str) -> None:
+    atomic_write_bytes(path, text.encode("utf-8"))
+
+
+def state_layout() -> str:
+    layout = os.environ.get(STATE_LAYOUT_ENV, "records").strip().lower()
+    return layout if layout in STATE_FILES else "records"
+
+
+def _is_columnar(path: str) -> bool:
+    return os.path.basename(path) == STATE_FILES["columnar"]
+
+
+def _encode_state(path: str, payload: Any, compact: bool = False) -> bytes:
+    return encode_payload(payload, compact=compact, columnar=_is_columnar(path))
+
+
+def migrate_state(src: str, dst: str, compact: bool = False) -> bool:
+    """Rewrite the state at ``src`` (journal included) in the layout of ``dst`` and remove ``src``."""
+    data = load_state_from_json(src)
+    if data is None:
+        return False
+    for key in FRAME_KEYS:
+        if key in data:
+            data[key] = pd.DataFrame(data[key])
+    atomic_write_bytes(dst, _encode_state(dst, data, compact=compact))
+    _clear_journal(src)
+    os.remove(src)
+    return True
+
+
+def resolve_state_path(user_dir: str, layout: Optional[str] = None) -> str:
+    """State file for ``user_dir`` in the configured layout, migrating a file in the other layout."""
+    layout = layout or state_layout()
+    target = os.path.join(user_dir, STATE_FILES[layout])
+    if os.path.exists(target):
+        return target
+    for other, name in STATE_FILES.items():
+        source = os.path.join(user_dir, name)
+        if other == layout or not os.path.exists(source):
+            continue
+        try:
+            migrated = migrate_state(source, target)
+        except Exception as e:
+            st.warning(f"State dosyası dönüştürülemedi: {e}")
+            return source
+        if not migrated:
+            # Unreadable source: keep using it rather than starting an empty target.
+            st.warning(f"State dosyası okunamadı, dönüştürülmedi: {source}")
+            return source
+        break
+    return target
+
+
+def find_state_path(user_dir: str) -> Optional[str]:
+    """Existing state file in ``user_dir`` (configured layout first), without migrating anything."""
+    layout = state_layout()
+    names = [STATE_FILES[layout]] + [n for k, n in STATE_FILES.items() if k != layout]
+    for name in names:
+        path = os.path.join(user_dir, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def iter_state_paths(root: str) -> Iterator[Tuple[str, str]]:
+    """``(username, state path)`` for every user directory under ``root`` that has a state file."""
+    try:
+        with os.scandir(root) as entries:
+            names = sorted(e.name for e in entries if e.is_dir())
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = find_state_path(os.path.join(root, name))
+        if path is not None:
+            yield name, path
+
+
+def journal_path(path: str) -> str:
+    return f"{path}.journal"
+
+
+def _read_journal(path: str) -> List[dict]:
+    entries = []
+    try:
+        with open(journal_path(path), "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-append; everything before it is intact.
+                    continue
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _replay_journal(path: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    entries = _read_journal(path)
+    if not entries:
+        return data
+    idx = NetHistoryIndex(list(data.get("net_history") or []))
+    for entry in entries:
+        if entry.get("date") is not None:
+            idx.upsert(entry["date"], entry.get("net", 0.0))
+    data["net_history"] = idx.records
+    return data
+
+
+def _clear_journal(path: str) -> None:
+    try:
+        os.remove(journal_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def append_net_snapshot(path: str, date_str: str, net_value: float) -> None:
+    """Record one net snapshot without rewriting the state document."""
+    line = json.dumps({"date": date_str, "net": float(net_value)}, ensure_ascii=False) + "\n"
+    with open(journal_path(path), "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+    if len(_read_journal(path)) >= JOURNAL_COMPACT_LINES:
+        compact_state(path)
+
+
+def compact_state(path: str, compact: bool = False) -> None:
+    """Fold the journal into the state file and drop it. Safe to repeat after a crash."""
+    data = _replay_journal(path, _read_json(path) or {})
+    atomic_write_bytes(path, _encode_state(path, data, compact=compact))
+    _clear_journal(path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
     if not os.path.exists(path):
         return None
+    with open(path, "rb") as f:
+        return decode_payload(f.read())
+
+
+# path -> (mtime_ns, size) of the state file as this process last read or wrote it.
+_seen_files: Dict[str, Tuple[int, int]] = {}
+_seen_files_lock = threading.Lock()
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _remember_file(path: str, signature: Optional[Tuple[int, int]] = None) -> None:
+    signature = signature or _file_signature(path)
+    with _seen_files_lock:
+        if signature is None:
+            _seen_files.pop(path, None)
+        else:
+            _seen_files[path] = signature
+
+
+def _seen_signature(path: str) -> Optional[Tuple[int, int]]:
+    with _seen_files_lock:
+        return _seen_files.get(path)
+
+
+class StateLoadError(Exception):
+    """A stored state exists but could not be read."""
+
+
+def read_state_file(path: str) -> Optional[Dict[str, Any]]:
+    """The state at ``path`` with its journal replayed; ``None`` only if there is no file.
+
+    A file that exists but cannot be parsed raises ``StateLoadError``, so
+    callers never mistake it for a new user and overwrite it.
+    """
+    # Taken before reading: if the file is replaced meanwhile, the next merge re-reads it.
+    signature = _file_signature(path)
+    try:
+        data = _read_json(path)
+    except Exception as e:
+        raise StateLoadError(f"{path}: {type(e).__name__}: {e}") from e
+    if data is None:
         return None
+    if not isinstance(data, dict):
+        raise StateLoadError(f"{path}: expected an object, got {type(data).__name__}")
+    _remember_file(path, signature)
+    return _replay_journal(path, data)
 
 
-def save_state_to_json(path: str, session_state: Dict[str, Any]) -> None:
+def load_state_from_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        return read_state_file(path)
+    except StateLoadError:
+        return None
+
+
+def save_state_to_json(path: str, session_state: Dict[str, Any], compact: bool = False) -> None:
     data = build_payload_from_session(session_state)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    atomic_write_bytes(path, _encode_state(path, data, compact=compact))
+    _clear_journal(path)
 
 
 def build_payload_from_session(session_state: Dict[str, Any]) -> Dict[str, Any]:
+    # Frames stay DataFrames: the file codec encodes them column-wise and
+    # Mongo saves convert them with ``plain_payload``.
     return {
-        "assets": session_state["assets_df"].to_dict(orient="records"),
-        "debts": session_state["debts_df"].to_dict(orient="records"),
+        "assets": session_state["assets_df"],
+        "debts": session_state["debts_df"],
         "net_history": session_state.get("net_history", []),
         "cashflow_base_date": session_state.get("cashflow_base_date"),
         "baseline_date": session_state.get("baseline_date"),
@@ -38,16 +279,131 @@ def build_payload_from_session(session_state: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def load_state_for_user(username: str, path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+# Row lists where at most this share of rows changed are updated row by row;
+# beyond that a single $set of the list is smaller.
+ROW_DIFF_MAX_FRACTION = 0.5
+ROW_LIST_KEYS = ("assets", "debts")
+HISTORY_KEY = "net_history"
+
+
+def _diff_rows(path: str, old: Any, new: Any, sets: Dict[str, Any]) -> None:
+    if not isinstance(old, list) or not isinstance(new, list) or len(old) != len(new):
+        sets[path] = new
+        return
+    changed = [i for i, (a, b) in enumerate(zip(old, new)) if a != b]
+    if len(changed) > ROW_DIFF_MAX_FRACTION * max(len(new), 1):
+        sets[path] = new
+        return
+    for i in changed:
+        sets[f"{path}.{i}"] = new[i]
+
+
+def build_payload_update(old: Optional[Dict[str, Any]], new: Dict[str, Any], prefix: str = "payload") -> Optional[Dict[str, Any]]:
+    """MongoDB update turning the stored payload ``old`` into ``new`` (both plain payloads).
+
+    Scalars are ``$set`` by path, changed asset/debt rows by index and
+    snapshots appended to ``net_history`` are ``$push``-ed. Anything else that
+    changed in net_history (an edited or back-filled date) cannot be combined
+    with a push on the same array, so the whole list is ``$set`` instead.
+    Returns None when nothing changed.
+    """
+    if old is None:
+        return {"$set": {prefix: new}}
+    sets: Dict[str, Any] = {}
+    update: Dict[str, Any] = {}
+    for key, value in new.items():
+        path = f"{prefix}.{key}"
+        if key not in old:
+            sets[path] = value
+        elif old[key] == value:
+            continue
+        elif key in ROW_LIST_KEYS:
+            _diff_rows(path, old[key], value, sets)
+        elif key == HISTORY_KEY and isinstance(old[key], list) and isinstance(value, list) \
+                and len(value) > len(old[key]) and value[:len(old[key])] == old[key]:
+            update["$push"] = {path: {"$each": value[len(old[key]):]}}
+        else:
+            sets[path] = value
+    unset = {f"{prefix}.{key}": "" for key in old if key not in new}
+    if sets:
+        update["$set"] = sets
+    if unset:
+        update["$unset"] = unset
+    return update or None
+
+
+# Last payload this process wrote or read per user, with the document revision
+# it corresponds to. Partial updates are only applied on top of that revision.
+_mongo_baselines: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_mongo_baselines_lock = threading.Lock()
+
+
+def _remember_mongo_baseline(username: str, revision: Optional[int], payload: Dict[str, Any]) -> None:
+    with _mongo_baselines_lock:
+        if revision is None:
+            _mongo_baselines.pop(username, None)
+        else:
+            # Deep copy: callers keep mutating the lists they were handed (e.g. net_history).
+            _mongo_baselines[username] = (revision, sanitize(payload))
+
+
+def save_payload_to_mongo(coll: Any, username: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Write ``payload`` for ``username`` as a field-level diff; returns the update sent (None if no-op).
+
+    The diff is applied only if the document is still at the revision this
+    process last saw; otherwise (another session wrote in between, or the
+    document predates revisions) the whole payload is ``$set``.
+    """
+    payload = plain_payload(payload)
+    now = dt.datetime.utcnow()
+    with _mongo_baselines_lock:
+        baseline = _mongo_baselines.get(username)
+    if baseline is not None:
+        revision, old = baseline
+        update = build_payload_update(old, payload)
+        if update is None:
+            return None
+        update.setdefault("$set", {})["updated_at"] = now
+        update["$inc"] = {"revision": 1}
+        result = coll.update_one({"username": username, "revision": revision}, update)
+        if result.matched_count == 1:
+            _remember_mongo_baseline(username, revision + 1, payload)
+            return update
+
+    from pymongo import ReturnDocument
+
+    update = {"$set": {"username": username, "payload": payload, "updated_at": now}, "$inc": {"revision": 1}}
+    doc = coll.find_one_and_update(
+        {"username": username},
+        update,
+        projection={"revision": 1, "_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    _remember_mongo_baseline(username, (doc or {}).get("revision"), payload)
+    return update
+
+
+def load_state_for_user(username: str, path: Optional[str] = None, strict: bool = False) -> Optional[Dict[str, Any]]:
+    """The user's stored state, or ``None`` if there is none.
+
+    With ``strict``, a state that exists but cannot be read raises
+    ``StateLoadError`` instead of also returning ``None``.
+    """
     if mongo_enabled():
         db = get_db()
-        doc = db["user_state"].find_one({"username": username}, {"_id": 0})
+        doc = db["user_state"].find_one({"username": username}, projection("payload", "revision"))
         if not doc:
             return None
-        return doc.get("payload")
+        payload = doc.get("payload")
+        if isinstance(payload, dict):
+            _remember_mongo_baseline(username, doc.get("revision"), payload)
+        elif strict:
+            raise StateLoadError(f"user_state/{username}: payload is {type(payload).__name__}")
+        return payload
     if not path:
         return None
-    return load_state_from_json(path)
+    return read_state_file(path) if strict else load_state_from_json(path)
 
 
 def save_state_for_user(username: str, session_state: Dict[str, Any], path: Optional[str] = None) -> None:
@@ -55,34 +411,77 @@ def save_state_for_user(username: str, session_state: Dict[str, Any], path: Opti
     save_payload_for_user(username, payload, path=path)
 
 
+def append_net_snapshot_for_user(username: str, date_str: str, net_value: float, path: Optional[str] = None) -> None:
+    if mongo_enabled() or not path:
+        return
+    try:
+        append_net_snapshot(path, date_str, net_value)
+    except Exception as e:
+        st.error(f"Net snapshot kaydedilemedi: {e}")
+
+
 def save_payload_for_user(username: str, payload: Dict[str, Any], path: Optional[str] = None) -> None:
     if mongo_enabled():
-        db = get_db()
-        db["user_state"].update_one(
-            {"username": username},
-            {"$set": {"username": username, "payload": payload, "updated_at": dt.datetime.utcnow()}},
-            upsert=True,
-        )
+        save_payload_to_mongo(get_db()["user_state"], username, payload)
         return
     if not path:
         return
-    save_state(path, payload)
+    save_state(path, payload, merge_history=True)
 
 
 def load_state(path: str) -> dict:
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(path, "rb") as f:
+            data = decode_payload(f.read())
     except FileNotFoundError:
         return {}
     except Exception as e:
         st.warning(f"State dosyasÄ± okunamadÄ±: {e}")
         return {}
+    return _replay_journal(path, data)
+
+
+def write_state(path: str, payload: dict, compact: bool = False) -> None:
+    """Replace the state at ``path`` with ``payload``; errors propagate (see ``save_state``)."""
+    atomic_write_bytes(path, _encode_state(path, payload, compact=compact))
+    _remember_file(path)
+    # The payload carries the full net_history, so the journal is now redundant.
+    _clear_journal(path)
+
+
+def merge_stored_history(path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """``payload`` plus the ``net_history`` days only the stored state (or its journal) has.
+
+    Another writer, such as tools/snapshot_daemon.py, may have recorded days
+    a long-running page session never loaded; a full write from that session
+    would otherwise drop them along with the journal. Usually only the
+    journal is read: the state file itself is decoded again only if it
+    changed since this process last read or wrote it. An unreadable file
+    contributes nothing, as on load.
+    """
+    records: List[dict] = _read_journal(path)
+    if _file_signature(path) != _seen_signature(path):
+        try:
+            stored = read_state_file(path)
+        except StateLoadError:
+            stored = None
+        records = (stored or {}).get("net_history") or []
+    if not records:
+        return payload
+    idx = NetHistoryIndex([dict(r) for r in payload.get("net_history") or []])
+    added = idx.bulk_upsert((r["date"], r.get("net", 0.0)) for r in records if r.get("date"))
+    return {**payload, "net_history": idx.records} if added else payload
+
 
+def save_state(path: str, payload: dict, compact: bool = False, merge_history: bool = False) -> None:
+    """``write_state`` that reports errors on the page instead of raising.
 
-def save_state(path: str, payload: dict) -> None:
+    With ``merge_history`` the payload first picks up stored net_history
+    days it lacks (``merge_stored_history``).
+    """
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        if merge_history:
+            payload = merge_stored_history(path, payload)
+        write_state(path, payload, compact=compact)
     except Exception as e:
         st.error(f"State kaydedilemedi: {e}")
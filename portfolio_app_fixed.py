@@ -1,16 +1,17 @@
 from __future__ import annotations
 
-import time
 import datetime as dt
 import os
-import re
+from functools import partial
 
 import pandas as pd
 import streamlit as st
 
-from app_compute import compute_display_assets, compute_totals, get_auto_unit_price
+from app_assets import frame_fingerprint, normalize_asset_codes, prepare_assets_frame, prepare_debts_frame
+from app_compute import GROUP_COL, compute_totals, value_assets
 from app_constants import APP_TITLE, ASSET_COLS, DEBT_COLS, BASELINE_DATE, BASELINE_NET
 from app_auth import (
+    authenticate,
     create_user,
     delete_user,
     get_user_role,
@@ -18,13 +19,24 @@ from app_auth import (
     load_users,
     save_users,
     update_password,
-    verify_user,
 )
-from app_excel import build_bilanco_xlsx
+from app_excel import build_bilanco_xlsx_cached, build_export_zip
+from app_interest import accrue_since
+from app_memo import get_stage_memo
 from app_net_history import ensure_baseline_net, get_net_for, upsert_net_snapshot
-from app_pricing import PriceSnapshot, fetch_prices
-from app_storage import load_state_for_user, save_payload_for_user, save_state_for_user
-from app_mongo import mongo_enabled
+from app_net_series import get_net_series
+from app_price_history import attach_price_history
+from app_pricing import PriceSnapshot, get_shared_price_cache
+from app_autosave import AUTOSAVE_DEBOUNCE_S, AUTOSAVE_KEY, get_autosaver
+from app_storage import (
+    append_net_snapshot_for_user,
+    build_payload_from_session,
+    StateLoadError,
+    load_state_for_user,
+    resolve_state_path,
+    save_payload_for_user,
+)
+from app_mongo import mongo_enabled, mongo_metrics
 
 
 # ----------------------------
@@ -32,107 +44,20 @@ from app_mongo import mongo_enabled
 # ----------------------------
 
 
-def _parse_rate_percent(value: str) -> float:
-    if value is None:
-        return 0.0
-    text = str(value).strip().replace(",", ".")
-    if not text:
-        return 0.0
-    match = re.search(r"[-+]?\d*\.?\d+", text)
-    if not match:
-        return 0.0
-    try:
-        return float(match.group(0))
-    except Exception:
-        return 0.0
-
-
-def _normalize_asset_codes(assets_df: pd.DataFrame) -> pd.DataFrame:
-    type_to_code = {
-        "mevduat hesabı": "TRY",
-        "banka (tl)": "TRY",
-        "tl": "TRY",
-        "euro": "EUR",
-        "dolar": "USD",
-        "usd": "USD",
-        "eur": "EUR",
-        "gram altın": "GRAM",
-        "gram altin": "GRAM",
-        "çeyrek": "CEYREK",
-        "ceyrek": "CEYREK",
-        "yarım": "YARIM",
-        "yarim": "YARIM",
-        "ata altın": "ATA",
-        "ata altin": "ATA",
-        "22-ayar-bilezik": "BILEZIK",
-        "bilezik": "BILEZIK",
-    }
-    df = assets_df.copy()
-    for idx, row in df.iterrows():
-        asset_type = str(row.get("Varlık Türü", "")).strip().lower()
-        if asset_type == "banka (tl)":
-            df.at[idx, "Varlık Türü"] = "Mevduat Hesabı"
-            asset_type = "mevduat hesabı"
-        code = type_to_code.get(asset_type)
-        if code:
-            df.at[idx, "Kod"] = code
-    return df
-
-
-def _asset_group_from_code(code: str) -> str:
-    code = str(code or "").strip().upper()
-    if code in {"TRY"}:
-        return "TL HESABI"
-    if code in {"USD", "EUR"}:
-        return "DÖVİZ HESABI"
-    if code in {"GRAM", "CEYREK", "YARIM", "ATA", "BILEZIK"}:
-        return "ALTIN HESABI"
-    return "TL HESABI"
-
-
-
-
 def apply_daily_deposit_interest(assets_df: pd.DataFrame) -> pd.DataFrame:
-    now = dt.datetime.now()
-    effective_date = now.date()
-    if now.hour < 6:
-        effective_date = effective_date - dt.timedelta(days=1)
+    # Not memoized: after the first run of a day this is a date comparison,
+    # cheaper than fingerprinting the frame to look it up.
+    df, last_date = accrue_since(assets_df, st.session_state.get("interest_last_date"), dt.datetime.now())
+    st.session_state["interest_last_date"] = last_date
+    return df
 
-    last_date_str = st.session_state.get("interest_last_date")
-    if not last_date_str:
-        st.session_state["interest_last_date"] = effective_date.isoformat()
-        return assets_df
 
+def _client_ip() -> str | None:
+    # st.context.ip_address is missing on older Streamlit and None on localhost.
     try:
-        last_date = dt.date.fromisoformat(last_date_str)
+        return st.context.ip_address
     except Exception:
-        last_date = effective_date
-
-    if effective_date <= last_date:
-        return assets_df
-
-    days = (effective_date - last_date).days
-    if days <= 0:
-        return assets_df
-
-    df = assets_df.copy()
-    for idx, row in df.iterrows():
-        if str(row.get("Varlık Türü", "")).strip().lower() != "mevduat hesabı":
-            continue
-        annual_rate = _parse_rate_percent(row.get("Yıllık Faiz (%)", ""))
-        if annual_rate <= 0:
-            continue
-        net_daily_rate = (annual_rate / 100.0) / 365.0 * (1.0 - 0.175)
-        try:
-            principal = float(row.get("Adet", 0.0) or 0.0)
-        except Exception:
-            principal = 0.0
-        if principal <= 0:
-            continue
-        df.at[idx, "Adet"] = principal * ((1.0 + net_daily_rate) ** days)
-
-    st.session_state["interest_last_date"] = effective_date.isoformat()
-    return df
+        return None
 
 
 def _load_remembered_credentials() -> tuple[str, str]:
@@ -252,7 +177,10 @@ if not st.session_state["auth"]["logged_in"]:
         if submitted:
             username_clean = username.strip()
             users_data = load_users(USERS_PATH)
-            if verify_user(users_data, username_clean, password):
+            login = authenticate(users_data, username_clean, password, ip=_client_ip())
+            if login.upgraded:
+                save_users(users_data, USERS_PATH)
+            if login.ok:
                 st.session_state["auth"] = {
                     "logged_in": True,
                     "username": username_clean,
@@ -265,10 +193,10 @@ if not st.session_state["auth"]["logged_in"]:
                 else:
                     _save_remembered_credentials("", "")
                     _clear_remember_in_browser()
-                st.success("Giriş başarılı.")
+                st.success(login.message)
                 st.rerun()
             else:
-                st.error("Kullanıcı adı veya şifre hatalı.")
+                st.error(login.message)
 
     with signup_tab:
         st.subheader("Kayıt Ol")
@@ -301,23 +229,37 @@ if last_user is None or last_user != username:
         "debts_df",
         "net_history",
         "prices_snap",
+        "prices_generation",
         "cashflow_base_date",
         "baseline_date",
         "baseline_net",
         "interest_last_date",
         "initialized",
         "force_reload_state",
-        "force_save_state",
+        "state_load_error",
+        AUTOSAVE_KEY,
     ]:
         if key in st.session_state:
             del st.session_state[key]
     st.session_state["active_user"] = username
+# File mode journals net snapshots on their own (see record_net_snapshot), so a
+# net_history-only change does not need a full state rewrite.
+autosaver = get_autosaver(
+    st.session_state,
+    exclude=("saved_at",) if mongo_enabled() else ("saved_at", "net_history"),
+)
+
+
+def save_current_state(payload: dict) -> None:
+    save_payload_for_user(username, payload, path=state_path)
+
+
 if mongo_enabled():
     state_path = None
 else:
     user_dir = os.path.join(USER_DATA_ROOT, username)
     os.makedirs(user_dir, exist_ok=True)
-    state_path = os.path.join(user_dir, "state.json")
+    state_path = resolve_state_path(user_dir)
 
 # If user has no personal state yet, start with empty defaults.
 
@@ -329,9 +271,6 @@ refresh_sec = st.sidebar.number_input("Oto yenileme (sn) — 0 kapalı", min_val
 use_side = "BUY"
 timeout_s = st.sidebar.slider("Fiyat çekme timeout (sn)", min_value=3, max_value=30, value=10)
 
-# --- Nonce for cache busting (important)
-st.session_state.setdefault("prices_nonce", 0)
-
 st.sidebar.divider()
 st.sidebar.caption(f"Kullanıcı: {username} ({role})")
 
@@ -379,27 +318,19 @@ if role == "admin":
 # Force Load / Save handlers
 # =========================
 if st.session_state.get("force_reload_state"):
-    data = load_state_for_user(username, path=state_path)
+    try:
+        data = load_state_for_user(username, path=state_path, strict=True)
+    except StateLoadError as e:
+        data = None
+        st.session_state["state_load_error"] = str(e)
     if data:
+        st.session_state.pop("state_load_error", None)
         assets = pd.DataFrame(data.get("assets", []))
         debts  = pd.DataFrame(data.get("debts", []))
 
         # kolon fix
-        for c in ASSET_COLS:
-            if c not in assets.columns:
-                if c == "Kod":
-                    assets[c] = "TRY"
-                elif c in ("Varlık Türü", "Not"):
-                    assets[c] = ""
-                else:
-                    assets[c] = 0.0
-        assets = assets[ASSET_COLS]
-        assets = _normalize_asset_codes(assets)
-
-        for c in DEBT_COLS:
-            if c not in debts.columns:
-                debts[c] = "" if c in ("Borç Adı", "Not") else 0.0
-        debts = debts[DEBT_COLS]
+        assets = prepare_assets_frame(assets)
+        debts = prepare_debts_frame(debts)
 
         st.session_state["assets_df"] = assets
         st.session_state["debts_df"] = debts
@@ -407,6 +338,8 @@ if st.session_state.get("force_reload_state"):
             "cashflow_base_date",
             st.session_state.get("cashflow_base_date", dt.date.today().isoformat())
         )
+        # Unsaved edits are discarded along with the frames they belonged to.
+        autosaver.mark_saved(build_payload_from_session(st.session_state))
 
         st.sidebar.success("Bilanço Durumun JSON'dan yüklendi.")
     else:
@@ -415,11 +348,6 @@ if st.session_state.get("force_reload_state"):
     st.session_state["force_reload_state"] = False
     st.rerun()
 
-if st.session_state.get("force_save_state"):
-    save_state_for_user(username, st.session_state, path=state_path)
-    st.sidebar.success("Bilanço Durumu JSON'a kaydedildi.")
-    st.session_state["force_save_state"] = False
-
 
 st.sidebar.divider()
 
@@ -427,7 +355,12 @@ st.sidebar.divider()
 # Init session (FROM JSON)
 # =========================
 if "initialized" not in st.session_state:
-    data = load_state_for_user(username, path=state_path)
+    try:
+        data = load_state_for_user(username, path=state_path, strict=True)
+    except StateLoadError as e:
+        # The defaults below are shown, but never saved over the stored state.
+        data = None
+        st.session_state["state_load_error"] = str(e)
 
     if data:
         assets = pd.DataFrame(data.get("assets", []))
@@ -436,6 +369,7 @@ if "initialized" not in st.session_state:
         st.session_state["baseline_date"] = data.get("baseline_date", BASELINE_DATE)
         st.session_state["baseline_net"] = data.get("baseline_net", BASELINE_NET)
         st.session_state["interest_last_date"] = data.get("interest_last_date")
+        st.session_state["net_history"] = list(data.get("net_history") or [])
     else:
         assets = pd.DataFrame([{
             "Varlık Türü": "Mevduat Hesabı",
@@ -457,21 +391,8 @@ if "initialized" not in st.session_state:
         st.session_state["interest_last_date"] = today_iso
 
     # kolonları garanti altına al
-    for c in ASSET_COLS:
-        if c not in assets.columns:
-            if c == "Kod":
-                assets[c] = "TRY"
-            elif c in ("Varlık Türü", "Not"):
-                assets[c] = ""
-            else:
-                assets[c] = 0.0
-    assets = assets[ASSET_COLS]
-    assets = _normalize_asset_codes(assets)
-
-    for c in DEBT_COLS:
-        if c not in debts.columns:
-            debts[c] = "" if c in ("Borç Adı", "Not") else 0.0
-    debts = debts[DEBT_COLS]
+    assets = prepare_assets_frame(assets)
+    debts = prepare_debts_frame(debts)
 
     st.session_state["assets_df"] = assets
     st.session_state["debts_df"]  = debts
@@ -479,76 +400,44 @@ if "initialized" not in st.session_state:
     st.session_state.setdefault("prices_snap", PriceSnapshot(prices_try={}, fetched_at=dt.datetime.now(), source="N/A"))
     st.session_state.setdefault("net_history", [])
     st.session_state.setdefault("force_reload_state", False)
-    st.session_state.setdefault("force_save_state", False)
 
     st.session_state["initialized"] = True
 
-    # İlk girişte kullanıcı dosyasını oluştur
-    if not mongo_enabled() and state_path and (not os.path.exists(state_path)):
-        save_state_for_user(username, st.session_state, path=state_path)
+    # The stored state is the autosave baseline; a new user has none, so the
+    # first autosave below writes their file right away. A state that exists
+    # but failed to load blocks saving instead (see state_load_error).
+    if data:
+        autosaver.mark_saved(build_payload_from_session(st.session_state))
+
+state_load_error = st.session_state.get("state_load_error")
+if state_load_error:
+    st.error(f"Kayıtlı bilanço okunamadı; düzeltilene kadar kayıt yapılmayacak. ({state_load_error})")
 
 
 st.session_state.setdefault("prices_snap", PriceSnapshot(prices_try={}, fetched_at=dt.datetime.now(), source="N/A"))
 st.session_state.setdefault("net_history", [])
 st.session_state.setdefault("cashflow_base_date", st.session_state.get("baseline_date", BASELINE_DATE))
 st.session_state.setdefault("interest_last_date", dt.date.today().isoformat())
-st.session_state.setdefault("post_cache_refresh_done", False)
-st.session_state.setdefault("prices_bootstrap_done", False)
 st.session_state.setdefault("editor_refresh_token", 0)
 st.session_state.setdefault("prices_sig", None)
 
 
-@st.cache_data(ttl=60)
-def cached_prices(timeout_s_: int, nonce: int) -> PriceSnapshot:
-    # nonce intentionally unused except to change the cache key
-    _ = nonce
-    return fetch_prices(timeout_s=timeout_s_)
+# One price cache per process, shared by all sessions (stale-while-revalidate).
+price_cache = get_shared_price_cache()
+# Every distinct snapshot is kept for later revaluation at past dates.
+attach_price_history(price_cache)
 
 # Sidebar action: manual refresh must run before fetch & editor render
 if st.sidebar.button("Kurları Güncelle", key="refresh_rates"):
-    # Force bypass cache: bump nonce + clear cache + set flag
-    st.session_state["prices_nonce"] += 1
-    st.session_state["force_refresh_prices"] = True
+    price_cache.refresh(timeout_s=timeout_s)
     # Reset editor state so Kur (TL) shows new auto values after refresh.
     st.session_state["editor_refresh_token"] += 1
-    try:
-        cached_prices.clear()
-    except Exception:
-        pass
-
-# Sidebar action: manual refresh must run before fetch & editor render
-
-# Sidebar action: manual refresh must run before fetch & editor render
-
 
-# Auto refresh tick
-do_refresh = st.session_state.get("force_refresh_prices", False)
-if refresh_sec and refresh_sec > 0:
-    st.session_state["_last_tick"] = st.session_state.get("_last_tick", time.time())
-    if time.time() - st.session_state["_last_tick"] >= refresh_sec:
-        do_refresh = True
-        st.session_state["_last_tick"] = time.time()
-        st.session_state["prices_nonce"] += 1  # bump nonce so cached_prices can't stick
-
-if not st.session_state.get("prices_bootstrap_done", False):
-    # First run in this session: always pull live to avoid stale cache.
-    st.session_state["prices_nonce"] += 1
-    try:
-        cached_prices.clear()
-    except Exception:
-        pass
-    snap = fetch_prices(timeout_s=timeout_s)
-    st.session_state["prices_snap"] = snap
-    st.session_state["prices_bootstrap_done"] = True
-    st.session_state["post_cache_refresh_done"] = True
-elif do_refresh:
-    # Always pull live
-    snap = fetch_prices(timeout_s=timeout_s)
-    st.session_state["prices_snap"] = snap
-    st.session_state["force_refresh_prices"] = False
-else:
-    # Cached pull
-    snap = cached_prices(timeout_s_=timeout_s, nonce=st.session_state["prices_nonce"])
+# Auto refresh: snapshots older than refresh_sec are revalidated in the background.
+max_price_age_s = refresh_sec if refresh_sec and refresh_sec > 0 else float("inf")
+snap = price_cache.get(max_age_s=max_price_age_s, timeout_s=timeout_s)
+if st.session_state.get("prices_generation") != price_cache.generation:
+    st.session_state["prices_generation"] = price_cache.generation
     st.session_state["prices_snap"] = snap
 
 snap: PriceSnapshot = st.session_state["prices_snap"]
@@ -583,24 +472,24 @@ st.caption("Son güncelleme: 2026-02-05 00:25:01")
 st.subheader("Varlıklar")
 st.caption("Tutar otomatik = Kur * Adet.")
 
+# The valuation is skipped when the assets (by content) and prices_sig are unchanged.
+# Cheaper stages run every time: fingerprinting a frame costs more than they do.
+stage_memo = get_stage_memo(st.session_state)
+
 # Günlük faiz işletimi (Mevduat hesabı)
 st.session_state["assets_df"] = apply_daily_deposit_interest(st.session_state["assets_df"])
-st.session_state["assets_df"] = _normalize_asset_codes(st.session_state["assets_df"])
+st.session_state["assets_df"] = normalize_asset_codes(st.session_state["assets_df"])
+
+# Single valuation pass: group labels, auto Kur (TL), Tutar (TL) and totals for all editors.
+assets_key = frame_fingerprint(st.session_state["assets_df"])
+valuation = stage_memo.run(
+    "valuation",
+    (assets_key, prices_sig, use_side),
+    value_assets, st.session_state["assets_df"], snap.prices_try, use_side,
+)
 
 # Sync auto prices into session data so editor shows latest Kur (TL)
-def _apply_auto_prices(df: pd.DataFrame, prices: dict, use_side_: str) -> pd.DataFrame:
-    out = df.copy()
-    for idx, row in out.iterrows():
-        code = row.get("Kod", "")
-        auto_kur = get_auto_unit_price(code, prices, use_side_)
-        if auto_kur is not None:
-            out.at[idx, "Kur (TL)"] = auto_kur
-    return out
-
-st.session_state["assets_df"] = _apply_auto_prices(st.session_state["assets_df"], snap.prices_try, use_side)
-
-assets_df_base = st.session_state["assets_df"].copy()
-assets_df_base["__group__"] = assets_df_base["Kod"].apply(_asset_group_from_code)
+st.session_state["assets_df"] = valuation.display[list(st.session_state["assets_df"].columns)].copy()
 
 groups = [
     ("TL HESABI", "TL HESABI", "info"),
@@ -613,6 +502,7 @@ display_cols_assets_other = ["Varlık Türü", "Adet", "Kur (TL)", "Tutar (TL)",
 keep_cols_assets = ["Varlık Türü", "Kod", "Adet", "Kur (TL)", "Yıllık Faiz (%)", "Not"]
 
 edited_groups = []
+assets_unchanged = True
 for group_key, group_label, group_style in groups:
     if group_style == "info":
         st.info(group_label)
@@ -620,13 +510,10 @@ for group_key, group_label, group_style in groups:
         st.success(group_label)
     else:
         st.warning(group_label)
-    group_df = assets_df_base[assets_df_base["__group__"] == group_key].copy()
-    display_df = compute_display_assets(group_df, snap.prices_try, use_side=use_side)
-
     display_cols = display_cols_assets_tl if group_key == "TL HESABI" else display_cols_assets_other
-    display_df = display_df.reindex(columns=display_cols, fill_value=None)
+    display_df = valuation.group(group_key).reindex(columns=display_cols, fill_value=None)
     edited = st.data_editor(
-        display_df[display_cols],
+        display_df,
         use_container_width=True,
         num_rows="dynamic",
         column_config={
@@ -651,12 +538,14 @@ for group_key, group_label, group_style in groups:
         key=f"assets_editor_{group_key}_{st.session_state['editor_refresh_token']}",
     )
 
+    assets_unchanged = assets_unchanged and edited.equals(display_df)
+
     for c in keep_cols_assets:
         if c not in edited.columns:
             edited[c] = None
     edited_groups.append(edited[keep_cols_assets].copy())
 
-st.session_state["assets_df"] = _normalize_asset_codes(pd.concat(edited_groups, ignore_index=True))
+st.session_state["assets_df"] = normalize_asset_codes(pd.concat(edited_groups, ignore_index=True))
 
 # ----------------------------
 # Debts table
@@ -674,8 +563,14 @@ with debts_col:
     )
 st.session_state["debts_df"] = debts_df
 
-# Totals
-display_df2 = compute_display_assets(st.session_state["assets_df"], snap.prices_try, use_side=use_side)
+# Totals: reuse the valuation unless an editor changed something this rerun.
+if not assets_unchanged:
+    valuation = stage_memo.run(
+        "valuation",
+        (frame_fingerprint(st.session_state["assets_df"]), prices_sig, use_side),
+        value_assets, st.session_state["assets_df"], snap.prices_try, use_side,
+    )
+display_df2 = valuation.display.drop(columns=[GROUP_COL])
 total_assets, total_debts, net_total = compute_totals(display_df2, debts_df)
 
 # ----------------------------
@@ -683,8 +578,20 @@ total_assets, total_debts, net_total = compute_totals(display_df2, debts_df)
 # ----------------------------
 ensure_baseline_net(st.session_state)  # 2026-01-28 = 2.000.000 garanti
 
+def record_net_snapshot(date_str: str, net_value: float) -> None:
+    # Every changed value is journaled: file-mode autosave leaves net_history
+    # out of its fingerprint, so the journal is what keeps today's latest net.
+    # An append is one line; the journal is folded in every JOURNAL_COMPACT_LINES.
+    if upsert_net_snapshot(st.session_state, date_str, net_value) and not state_load_error:
+        append_net_snapshot_for_user(username, date_str, net_value, path=state_path)
+
+
 today_str = dt.date.today().isoformat()
-upsert_net_snapshot(st.session_state, today_str, net_total)
+stage_memo.run(
+    "net_snapshot",
+    (today_str, net_total, id(st.session_state["net_history"]), len(st.session_state["net_history"])),
+    record_net_snapshot, today_str, net_total,
+)
 
 st.divider()
 
@@ -697,11 +604,8 @@ st.metric("Toplam Varlık (TL)", f"{total_assets:,.2f}")
 st.metric("Toplam Borç (TL)", f"{total_debts:,.2f}")
 st.metric("Net (TL)", f"{net_total:,.2f}")
 
-# Auto snapshot at >= 23:59 (requires page rerun around that time)
-now = dt.datetime.now()
-today_str = now.date().isoformat()
-if (now.hour > 23) or (now.hour == 23 and now.minute >= 59):
-    upsert_net_snapshot(st.session_state, today_str, net_total)
+# The end-of-day snapshot (and interest for users who did not visit) is taken
+# by tools/snapshot_daemon.py, not by a rerun that happens to land at 23:59.
 
 # ----------------------------
 # Cash Flow (baseline-relative)
@@ -750,16 +654,13 @@ with cf_col:
         st.metric("Seçili Gün Net (TL)", f"{sel_net:,.2f}", delta=f"{pnl:+,.2f} (referansa göre)")
         st.write(f"**Referans Net ({base_str} 23:59):** {base_net:,.2f} TL")
 
-    nh = st.session_state.get("net_history", [])
-    if nh and base_net is not None:
-        df_nh = pd.DataFrame(nh).copy()
-        df_nh = df_nh.sort_values("date")
-        df_nh = df_nh[df_nh["date"] >= start_day.isoformat()]
-
-        df_nh["Referansa Göre Kâr/Zarar (TL)"] = df_nh["net"].astype(float) - float(base_net)
-        df_show = df_nh.rename(columns={"date": "Gün", "net": "23:59 Net (TL)"})[
-            ["Gün", "23:59 Net (TL)", "Referansa Göre Kâr/Zarar (TL)"]
-        ]
+    nh_window = get_net_series(st.session_state).slice(start_day)
+    if len(nh_window) and base_net is not None:
+        df_show = pd.DataFrame({
+            "Gün": nh_window.date_strings(),
+            "23:59 Net (TL)": nh_window.nets,
+            "Referansa Göre Kâr/Zarar (TL)": nh_window.pnl(base_net),
+        })
         st.dataframe(df_show, use_container_width=True, height=260)
     else:
         st.info("Net snapshot listesi boş veya referans net bulunamadı. En az bir gün için snapshot gerekli.")
@@ -854,39 +755,64 @@ if snap.raw_data:
 # Download (Excel) + Save now
 # ----------------------------
 
-xlsx_bytes = build_bilanco_xlsx(display_df2, debts_df)
-
-if st.session_state.get("force_save_state"):
-    payload = {
-        "assets": st.session_state["assets_df"].to_dict(orient="records"),
-        "debts": st.session_state["debts_df"].to_dict(orient="records"),
-        "saved_at": dt.datetime.now().isoformat(timespec="seconds"),
-        "net_history": st.session_state.get("net_history", []),
-        "cashflow_base_date": st.session_state.get("cashflow_base_date", "2026-01-28"),
-        "baseline_date": st.session_state.get("baseline_date", BASELINE_DATE),
-        "baseline_net": st.session_state.get("baseline_net", BASELINE_NET),
-        "interest_last_date": st.session_state.get("interest_last_date"),
-    }
-    save_payload_for_user(username, payload, path=state_path)
-    st.sidebar.success("Kaydedildi.")
-    st.session_state["force_save_state"] = False
+# The workbook is built only when the download is clicked, and cached by content.
+bilanco_xlsx = partial(build_bilanco_xlsx_cached, display_df2, debts_df)
 
 # Sidebar action buttons (bottom)
 
-if st.sidebar.button("Bilançoyu Kaydet"):
-    st.session_state["force_save_state"] = True
+save_clicked = st.sidebar.button("Bilançoyu Kaydet")
 if st.sidebar.button("Bilançoyu Yükle"):
     st.session_state["force_reload_state"] = True
 st.sidebar.download_button(
     "Bilançoyu İndir (Excel)",
-    data=xlsx_bytes,
+    data=bilanco_xlsx,
     file_name="bilanco.xlsx",
     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
 )
+# Raw tables (assets, debts, net history) for other tools; built on click like the workbook.
+export_fmt = st.sidebar.selectbox("Tablo formatı", ("csv", "parquet", "arrow"), key="export_fmt")
+st.sidebar.download_button(
+    "Tabloları İndir (zip)",
+    data=partial(build_export_zip, display_df2, debts_df, st.session_state["net_history"], export_fmt),
+    file_name=f"bilanco-{export_fmt}.zip",
+    mime="application/zip",
+)
 if st.sidebar.button("Çıkış Yap"):
     st.session_state["auth"] = {"logged_in": False, "username": None, "role": "user"}
     st.rerun()
 
+# ----------------------------
+# Autosave (single save path)
+# ----------------------------
+# Every rerun registers the current state; it is written only if it changed,
+# once edits have settled. The button (or a user without a stored state yet)
+# writes immediately. Nothing is written while a stored state failed to load.
+autosaver.update(build_payload_from_session(st.session_state))
+if state_load_error:
+    if save_clicked:
+        st.sidebar.error("Kayıtlı bilanço okunamadı; üzerine yazılmadı.")
+elif autosaver.flush(save_current_state, force=save_clicked or autosaver.saved_fingerprint is None):
+    st.sidebar.success("Kaydedildi.")
+elif save_clicked:
+    st.sidebar.info("Değişiklik yok, kayıt güncel.")
+
+
+@st.fragment(run_every=AUTOSAVE_DEBOUNCE_S)
+def _flush_pending_autosave() -> None:
+    # Reruns only happen on interaction; this timer writes the last edit of a burst.
+    autosaver.flush(save_current_state)
+
+
+if autosaver.pending and not state_load_error:
+    _flush_pending_autosave()
+
+if role == "admin":
+    with st.sidebar.expander("Önbellek (debug)", expanded=False):
+        st.dataframe(pd.DataFrame(stage_memo.stats()), use_container_width=True, hide_index=True)
+        st.caption("Otomatik kayıt: " + ", ".join(f"{k}={v}" for k, v in autosaver.stats().items()))
+        if mongo_enabled():
+            st.dataframe(pd.DataFrame(mongo_metrics()), use_container_width=True, hide_index=True)
+
 
 
 def sum_two_integers(a: int, b: int) -> int:
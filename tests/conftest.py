@@ -5,3 +5,113 @@ from pathlib import Path
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+
+import copy  # noqa: E402
+from types import SimpleNamespace  # noqa: E402
+
+import pytest  # noqa: E402
+
+
+def _get_path(doc, path):
+    for part in path.split("."):
+        if isinstance(doc, list):
+            doc = doc[int(part)]
+        elif isinstance(doc, dict) and part in doc:
+            doc = doc[part]
+        else:
+            return None
+    return doc
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc[int(part)] if isinstance(doc, list) else doc.setdefault(part, {})
+    if isinstance(doc, list):
+        doc[int(parts[-1])] = value
+    else:
+        doc[parts[-1]] = value
+
+
+class FakeCollection:
+    """In-memory stand-in for the few pymongo Collection methods the app uses."""
+
+    def __init__(self):
+        self.docs = []
+        self.updates = []
+
+    def _match(self, doc, flt):
+        return all(
+            _get_path(doc, k) in v["$in"] if isinstance(v, dict) and "$in" in v else _get_path(doc, k) == v
+            for k, v in flt.items()
+        )
+
+    def _apply(self, doc, update):
+        for path, value in update.get("$set", {}).items():
+            _set_path(doc, path, copy.deepcopy(value))
+        for path in update.get("$unset", {}):
+            parts = path.rsplit(".", 1)
+            parent = _get_path(doc, parts[0]) if len(parts) == 2 else doc
+            if isinstance(parent, dict):
+                parent.pop(parts[-1], None)
+        for path, value in update.get("$push", {}).items():
+            items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+            _get_path(doc, path).extend(copy.deepcopy(items))
+        for path, value in update.get("$inc", {}).items():
+            _set_path(doc, path, (_get_path(doc, path) or 0) + value)
+
+    def find(self, flt, projection=None, sort=None, batch_size=None):
+        docs = [copy.deepcopy(doc) for doc in self.docs if self._match(doc, flt)]
+        for key, direction in reversed(sort or []):
+            docs.sort(key=lambda d: _get_path(d, key), reverse=direction < 0)
+        fields = [k for k, v in (projection or {}).items() if v and k != "_id"]
+        if fields:
+            projected = []
+            for doc in docs:
+                out = {}
+                for path in fields:
+                    value = _get_path(doc, path)
+                    if value is not None:
+                        _set_path(out, path, value)
+                projected.append(out)
+            docs = projected
+        return docs
+
+    def find_one(self, flt, projection=None):
+        for doc in self.docs:
+            if self._match(doc, flt):
+                return copy.deepcopy(doc)
+        return None
+
+    def update_one(self, flt, update, upsert=False):
+        self.updates.append(update)
+        for doc in self.docs:
+            if self._match(doc, flt):
+                self._apply(doc, update)
+                return SimpleNamespace(matched_count=1)
+        if upsert:
+            doc = {k: v for k, v in flt.items() if not isinstance(v, dict)}
+            self._apply(doc, update)
+            self.docs.append(doc)
+        return SimpleNamespace(matched_count=0)
+
+    def bulk_write(self, ops, ordered=True):
+        matched = sum(self.update_one(op._filter, op._doc, upsert=bool(op._upsert)).matched_count for op in ops)
+        return SimpleNamespace(matched_count=matched, modified_count=matched, upserted_count=0)
+
+    def delete_one(self, flt):
+        for i, doc in enumerate(self.docs):
+            if self._match(doc, flt):
+                del self.docs[i]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    def find_one_and_update(self, flt, update, projection=None, upsert=False, return_document=None):
+        self.update_one(flt, update, upsert=upsert)
+        return self.find_one(flt)
+
+
+@pytest.fixture
+def fake_collection():
+    return FakeCollection()
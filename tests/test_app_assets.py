@@ -0,0 +1,54 @@
+import pandas as pd
+
+from app_assets import (
+    frame_fingerprint,
+    normalize_asset_codes,
+    prepare_assets_frame,
+    prepare_debts_frame,
+)
+from app_constants import ASSET_COLS, DEBT_COLS
+
+
+def test_normalize_asset_codes_maps_types_and_renames_bank():
+    assets = pd.DataFrame(
+        [
+            {"Varlık Türü": " Banka (TL) ", "Kod": "XXX"},
+            {"Varlık Türü": "Gram Altin", "Kod": ""},
+            {"Varlık Türü": "Hisse", "Kod": "THYAO"},
+            {"Varlık Türü": None, "Kod": "USD"},
+        ]
+    )
+    out = normalize_asset_codes(assets)
+
+    assert out["Varlık Türü"].tolist()[:3] == ["Mevduat Hesabı", "Gram Altin", "Hisse"]
+    assert out["Kod"].tolist() == ["TRY", "GRAM", "THYAO", "USD"]
+    assert assets.loc[0, "Kod"] == "XXX"
+
+
+def test_normalize_asset_codes_skips_already_normalized_frames():
+    assets = pd.DataFrame([{"Varlık Türü": "Euro", "Kod": ""}])
+    once = normalize_asset_codes(assets)
+    assert once is not assets
+    assert normalize_asset_codes(once) is once
+
+
+def test_frame_fingerprint_tracks_content():
+    a = pd.DataFrame([{"Kod": "TRY", "Adet": 1.0}])
+    b = a.copy()
+    assert frame_fingerprint(a) == frame_fingerprint(b)
+
+    b.loc[0, "Adet"] = 2.0
+    assert frame_fingerprint(a) != frame_fingerprint(b)
+    assert frame_fingerprint(a) != frame_fingerprint(a.rename(columns={"Adet": "Miktar"}))
+
+
+def test_prepare_frames_fill_missing_columns_in_order():
+    assets = prepare_assets_frame(pd.DataFrame([{"Adet": 3.0, "Varlık Türü": "Dolar"}]))
+    assert list(assets.columns) == ASSET_COLS
+    assert assets.loc[0, "Kod"] == "USD"
+    assert assets.loc[0, "Not"] == ""
+    assert assets.loc[0, "Kur (TL)"] == 0.0
+
+    debts = prepare_debts_frame(pd.DataFrame([{"Tutar (TL)": 5.0}]))
+    assert list(debts.columns) == DEBT_COLS
+    assert debts.loc[0, "Borç Adı"] == ""
@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+
+import app_auth
+import app_mongo
+import app_passwords
+from app_auth import (
+    UserDirectory,
+    authenticate,
+    create_user,
+    delete_user,
+    get_user_role,
+    hash_password,
+    load_users,
+    update_password,
+    verify_user,
+)
+
+
+@pytest.fixture(autouse=True)
+def _fast_kdf(monkeypatch):
+    monkeypatch.setattr(app_passwords, "KDF_ROUNDS", 1000)
+    monkeypatch.setattr(app_passwords, "_throttle", app_passwords.LoginThrottle())
+
+
+class _CountingUsers:
+    """Wraps the fake collection and counts full scans vs per-user lookups."""
+
+    def __init__(self, coll):
+        self.coll = coll
+        self.find_one_calls = 0
+        self.scans = 0
+
+    def find_one(self, flt, projection=None):
+        self.find_one_calls += 1
+        return self.coll.find_one(flt, projection)
+
+    def find(self, flt, projection=None):
+        self.scans += 1
+        return [dict(d) for d in self.coll.docs]
+
+    def update_one(self, *args, **kwargs):
+        return self.coll.update_one(*args, **kwargs)
+
+    def delete_one(self, flt):
+        return self.coll.delete_one(flt)
+
+
+@pytest.fixture
+def mongo_users(fake_collection, monkeypatch):
+    users = _CountingUsers(fake_collection)
+    app_mongo.use_db({"users": users, "user_state": type(fake_collection)()})
+    monkeypatch.setattr(app_auth, "mongo_enabled", lambda: True)
+    monkeypatch.setattr(app_auth, "_directory", None)
+    yield users
+    app_mongo.use_db(None)
+
+
+def test_mongo_login_fetches_only_the_requested_user(mongo_users):
+    users_data = load_users()
+    assert mongo_users.find_one_calls == 0
+
+    ok, _ = create_user(users_data, "ayse", "secret1", role="admin")
+    assert ok
+    users_data = load_users()
+
+    assert verify_user(users_data, "ayse", "secret1")
+    assert get_user_role(users_data, "ayse") == "admin"
+    assert not verify_user(users_data, "ayse", "wrong!!")
+    assert mongo_users.scans == 0
+    # create_user: one miss lookup; then one fetch shared by verify/role.
+    assert mongo_users.find_one_calls == 2
+
+
+def test_writes_invalidate_cached_records(mongo_users):
+    users_data = load_users()
+    create_user(users_data, "ayse", "secret1")
+    assert verify_user(users_data, "ayse", "secret1")
+
+    ok, _ = update_password(users_data, "ayse", "secret2")
+    assert ok
+    assert not verify_user(users_data, "ayse", "secret1")
+    assert verify_user(users_data, "ayse", "secret2")
+
+    ok, _ = delete_user(users_data, "ayse")
+    assert ok
+    assert "ayse" not in users_data["users"]
+    assert not verify_user(users_data, "ayse", "secret2")
+
+
+def test_user_directory_ttl_and_miss_ttl():
+    now = [0.0]
+    store = {}
+    calls = []
+
+    def fetch(name):
+        calls.append(name)
+        return store.get(name)
+
+    directory = UserDirectory(fetch=fetch, scan=lambda: iter(store), ttl_s=60, miss_ttl_s=5, clock=lambda: now[0])
+
+    assert "bob" not in directory
+    store["bob"] = {"salt": "s", "hash": "h", "role": "user"}
+    assert "bob" not in directory  # cached miss
+    now[0] = 6.0
+    assert directory["bob"]["role"] == "user"
+    store["bob"] = {"salt": "s", "hash": "h", "role": "admin"}
+    now[0] = 30.0
+    assert directory["bob"]["role"] == "user"  # cached hit
+    now[0] = 70.0
+    assert directory["bob"]["role"] == "admin"
+    assert calls == ["bob", "bob", "bob"]
+    assert list(directory) == ["bob"]
+    assert len(directory) == 1
+
+
+def test_authenticate_upgrades_legacy_hash(mongo_users, monkeypatch):
+    monkeypatch.setattr(app_passwords, "KDF_ROUNDS", 150_000)
+    salt, digest = hash_password("secret1")
+    mongo_users.coll.docs.append({"username": "eski", "salt": salt, "hash": digest, "role": "user"})
+    users_data = load_users()
+
+    result = authenticate(users_data, "eski", "secret1", ip="10.0.0.1")
+
+    assert result.ok and result.upgraded
+    stored = mongo_users.coll.docs[0]
+    assert stored["rounds"] == 150_000 and stored["algo"] == "pbkdf2_sha256"
+    assert stored["hash"] != digest
+    again = authenticate(load_users(), "eski", "secret1")
+    assert again.ok and not again.upgraded
+
+
+def test_authenticate_throttles_repeated_failures(tmp_path):
+    users_data = {"users": {}}
+    create_user(users_data, "ayse", "secret1")
+    for _ in range(app_passwords.THROTTLE_MAX_FAILURES):
+        assert not authenticate(users_data, "ayse", "wrong", ip="10.0.0.2").ok
+
+    locked = authenticate(users_data, "ayse", "secret1", ip="10.0.0.2")
+    assert not locked.ok
+    assert "sn sonra" in locked.message
+    # Unknown users fail the same way and count towards the address.
+    assert authenticate(users_data, "nobody", "x", ip="10.0.0.3").message == "Kullanıcı adı veya şifre hatalı."
+
+
+def test_account_writes_report_a_busy_hashing_pool(monkeypatch):
+    service = app_passwords.HashingService(workers=1, max_pending=1)
+    monkeypatch.setattr(app_passwords, "_service", service)
+    release = threading.Event()
+    started = threading.Event()
+    blocker = threading.Thread(target=service.run, args=(lambda: (started.set(), release.wait(5)),))
+    blocker.start()
+    started.wait(5)
+    users_data = {"users": {"ayse": {"role": "user"}}}
+    try:
+        assert create_user(users_data, "mehmet", "secret1") == (False, app_auth.BUSY_MESSAGE)
+        assert "mehmet" not in users_data["users"]
+        assert update_password(users_data, "ayse", "secret2") == (False, app_auth.BUSY_MESSAGE)
+        assert users_data["users"]["ayse"] == {"role": "user"}
+    finally:
+        release.set()
+        blocker.join(5)
+        service.shutdown()
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from app_autosave import AutoSaver, get_autosaver, payload_fingerprint
+
+
+def _payload(adet=1.0, saved_at="2026-01-01T00:00:00", net=None):
+    return {
+        "assets": pd.DataFrame({"Kod": ["TRY"], "Adet": [adet]}),
+        "net_history": net or [],
+        "saved_at": saved_at,
+    }
+
+
+def test_fingerprint_ignores_saved_at_and_frame_identity():
+    a = payload_fingerprint(_payload(saved_at="a"))
+    b = payload_fingerprint(_payload(saved_at="b"))
+    assert a == b
+    assert payload_fingerprint(_payload(adet=2.0)) != a
+    exclude = ("saved_at", "net_history")
+    assert payload_fingerprint(_payload(net=[{"date": "d", "net": 1}]), exclude) == payload_fingerprint(_payload(), exclude)
+
+
+def test_unchanged_payload_is_never_written():
+    saves = []
+    saver = AutoSaver(debounce_s=0)
+    saver.mark_saved(_payload())
+
+    assert not saver.update(_payload(saved_at="later"), now=10.0)
+    assert not saver.flush(saves.append, force=True, now=10.0)
+    assert saves == []
+    assert saver.stats()["skipped"] == 1
+
+
+def test_bursts_are_debounced_to_the_last_payload():
+    saves = []
+    saver = AutoSaver(debounce_s=2.0, max_delay_s=30.0)
+    saver.mark_saved(_payload())
+
+    for i, t in enumerate([0.0, 0.5, 1.0, 1.5]):
+        saver.update(_payload(adet=float(i + 2)), now=t)
+        assert not saver.flush(saves.append, now=t)
+
+    assert saver.flush(saves.append, now=3.6)
+    assert [p["assets"]["Adet"].iloc[0] for p in saves] == [5.0]
+    assert saver.stats() == {"writes": 1, "skipped": 0, "coalesced": 3, "pending": False}
+
+    # The same content again is a no-op.
+    saver.update(_payload(adet=5.0), now=10.0)
+    assert not saver.pending
+
+
+def test_max_delay_bounds_continuous_editing():
+    saves = []
+    saver = AutoSaver(debounce_s=2.0, max_delay_s=5.0)
+    saver.mark_saved(_payload())
+    t = 0.0
+    while not saves:
+        saver.update(_payload(adet=t + 10), now=t)
+        saver.flush(saves.append, now=t)
+        t += 1.0
+    assert t == 6.0
+
+
+def test_revert_before_write_cancels_pending_save():
+    saver = AutoSaver(debounce_s=2.0)
+    saver.mark_saved(_payload())
+    saver.update(_payload(adet=9.0), now=0.0)
+    assert saver.pending
+    saver.update(_payload(), now=1.0)
+    assert not saver.pending
+
+
+def test_never_saved_state_is_pending_and_get_autosaver_is_per_session():
+    state = {}
+    saver = get_autosaver(state, debounce_s=0)
+    assert get_autosaver(state) is saver
+    assert saver.saved_fingerprint is None
+    assert saver.update(_payload(), now=0.0)
+    assert saver.flush(lambda p: None, force=True)
+    assert saver.saved_fingerprint == payload_fingerprint(_payload())
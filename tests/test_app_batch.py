@@ -0,0 +1,245 @@
+import datetime as dt
+import importlib.util
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app_assets import prepare_assets_frame, prepare_debts_frame
+from app_batch import (
+    FileStateStore,
+    MongoStateStore,
+    run_backfill,
+    run_snapshots,
+    snapshot_payload,
+    summarize,
+    value_chunk,
+    value_states,
+)
+from app_compute import compute_totals, value_assets
+from app_price_history import PriceHistory
+from app_pricing import PriceSnapshot
+from app_storage import journal_path, load_state_from_json, write_state
+
+NOW = dt.datetime(2026, 2, 10, 23, 59)
+PRICES = {"USD_BUY": 40.0}
+
+
+def _state(interest_last_date="2026-02-10", net_history=None):
+    return {
+        "assets": [
+            {"Varlık Türü": "Mevduat Hesabı", "Kod": "TRY", "Adet": 1000.0, "Kur (TL)": 1.0, "Yıllık Faiz (%)": 36.5, "Not": ""},
+            {"Varlık Türü": "Dolar", "Kod": "", "Adet": 10.0, "Kur (TL)": 30.0, "Yıllık Faiz (%)": 0.0, "Not": ""},
+        ],
+        "debts": [{"Borç Adı": "kart", "Tutar (TL)": 100.0, "Not": ""}],
+        "net_history": list(net_history or []),
+        "interest_last_date": interest_last_date,
+    }
+
+
+def test_snapshot_payload_values_like_the_page():
+    payload, result = snapshot_payload(_state(), PRICES, NOW)
+    assert not result.interest_applied and result.snapshot_changed
+    assert result.net == pytest.approx(1000.0 + 10 * 40.0 - 100.0)
+    assert payload["net_history"] == [{"date": "2026-02-10", "net": result.net}]
+    assert payload["assets"]["Kod"].tolist() == ["TRY", "USD"]
+
+    again, result = snapshot_payload(payload, PRICES, NOW)
+    assert not result.written
+
+
+def test_snapshot_payload_applies_interest_since_last_date():
+    payload, result = snapshot_payload(_state("2026-02-08"), PRICES, NOW)
+    assert result.interest_applied and payload["interest_last_date"] == "2026-02-10"
+    assert payload["assets"].loc[0, "Adet"] > 1000.0
+    assert payload["assets"].loc[1, "Adet"] == 10.0
+
+
+def test_state_without_interest_date_is_journaled_not_rewritten(tmp_path):
+    path = _write_user(tmp_path, "alice", _state(None))
+    payload, result = snapshot_payload(_state(None), PRICES, NOW)
+    assert not result.interest_applied and result.snapshot_changed
+    assert "saved_at" not in payload
+
+    (result,) = FileStateStore(str(tmp_path)).snapshot_chunk(["alice"], PRICES, NOW)
+    assert not result.interest_applied
+    with open(journal_path(path), encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+
+
+def _write_user(root, username, data):
+    user_dir = root / username
+    user_dir.mkdir()
+    path = str(user_dir / "state.json")
+    write_state(path, data)
+    return path
+
+
+def test_file_store_journals_snapshots_and_rewrites_on_interest(tmp_path):
+    a = _write_user(tmp_path, "alice", _state())
+    b = _write_user(tmp_path, "bob", _state("2026-02-01"))
+    (tmp_path / "empty").mkdir()
+    store = FileStateStore(str(tmp_path))
+    assert list(store.usernames()) == ["alice", "bob"]
+
+    results = run_snapshots(store, PRICES, NOW, workers=2, chunk_size=1)
+    assert summarize(results) == {"users": 2, "written": 2, "interest_applied": 1, "snapshots": 2, "errors": 0}
+
+    # alice: unchanged state, snapshot appended to the journal
+    with open(journal_path(a), encoding="utf-8") as f:
+        assert len(f.readlines()) == 1
+    assert load_state_from_json(a)["net_history"][0]["date"] == "2026-02-10"
+    # bob: interest moved the state forward, written in full
+    bob = load_state_from_json(b)
+    assert bob["interest_last_date"] == "2026-02-10" and bob["assets"][0]["Adet"] > 1000.0
+    assert bob["net_history"][0]["net"] == results[1].net
+
+    assert summarize(run_snapshots(store, PRICES, NOW))["written"] == 0
+
+
+def test_mongo_store_bulk_writes_diffs(fake_collection):
+    fake_collection.docs = [
+        {"username": "alice", "payload": _state(), "revision": 3},
+        {"username": "bob", "payload": _state("2026-02-01")},
+        {"username": "carol", "payload": None},
+    ]
+    store = MongoStateStore(fake_collection)
+    results = run_snapshots(store, PRICES, NOW)
+
+    assert [r.error for r in results] == [None, None, "no state"]
+    alice, bob = fake_collection.docs[0], fake_collection.docs[1]
+    assert alice["revision"] == 4 and bob["revision"] == 1
+    assert alice["payload"]["net_history"] == [{"date": "2026-02-10", "net": results[0].net}]
+    assert bob["payload"]["interest_last_date"] == "2026-02-10"
+    assert "$push" in fake_collection.updates[0]
+
+    assert summarize(run_snapshots(store, PRICES, NOW))["written"] == 0
+    assert alice["revision"] == 4
+
+
+def test_mongo_store_redoes_users_changed_concurrently(fake_collection, monkeypatch):
+    fake_collection.docs = [{"username": "alice", "payload": _state(), "revision": 1}]
+    store = MongoStateStore(fake_collection)
+    real_find = fake_collection.find
+    calls = []
+
+    def racing_find(flt, projection=None):
+        docs = real_find(flt, projection)
+        if not calls:
+            # Another session saves right after the chunk was read.
+            fake_collection.docs[0]["revision"] = 2
+            fake_collection.docs[0]["payload"]["debts"][0]["Tutar (TL)"] = 0.0
+        calls.append(flt)
+        return docs
+
+    monkeypatch.setattr(fake_collection, "find", racing_find)
+    (result,) = store.snapshot_chunk(["alice"], PRICES, NOW)
+
+    assert result.error is None and result.net == pytest.approx(1400.0)
+    assert fake_collection.docs[0]["revision"] == 3
+    assert fake_collection.docs[0]["payload"]["debts"][0]["Tutar (TL)"] == 0.0
+
+
+def test_unreadable_state_file_is_an_error_and_left_alone(tmp_path):
+    _write_user(tmp_path, "alice", _state())
+    broken = tmp_path / "bob" / "state.json"
+    broken.parent.mkdir()
+    broken.write_text('{"assets": [', encoding="utf-8")
+    store = FileStateStore(str(tmp_path))
+
+    results = run_snapshots(store, PRICES, NOW)
+    assert results[0].error is None
+    assert results[1].error.startswith("StateLoadError") and summarize(results)["errors"] == 1
+    assert broken.read_text(encoding="utf-8") == '{"assets": ['
+
+    report = value_states(store.load_states(["alice", "bob", "ghost"]), PRICES)
+    assert report["error"].tolist()[0] is None
+    assert report["error"].tolist()[1].startswith("StateLoadError")
+    assert report["error"].tolist()[2] == "no state"
+
+
+@pytest.fixture
+def price_history(tmp_path):
+    h = PriceHistory(str(tmp_path / "prices.sqlite3"))
+    for day, usd in ((2, 40.0), (4, 41.0)):
+        h.record(PriceSnapshot(prices_try={"USD_BUY": usd}, fetched_at=dt.datetime(2026, 2, day, 12), source="test"))
+    yield h
+    h.close()
+
+
+def _dollar_state(net_history=None):
+    state = _state(net_history=net_history)
+    state["assets"][1]["Kod"] = "USD"
+    return state
+
+
+def test_file_backfill_writes_covered_days_through_the_daemon(tmp_path, price_history, monkeypatch, capsys):
+    root = tmp_path / "user_data"
+    root.mkdir()
+    path = _write_user(root, "alice", _dollar_state([{"date": "2026-02-03", "net": 1.0}]))
+    _write_user(root, "bob", {"assets": [], "debts": []})
+
+    spec = importlib.util.spec_from_file_location("snapshot_daemon", Path(__file__).parents[1] / "tools" / "snapshot_daemon.py")
+    daemon = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(daemon)
+    monkeypatch.setattr(daemon, "mongo_enabled", lambda: False)
+    monkeypatch.setattr(daemon, "get_price_history", lambda: price_history)
+
+    assert daemon.main(["--root", str(root), "--backfill", "2026-02-01", "2026-02-05"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    # bob holds nothing priced, so every day is covered (net 0).
+    assert summary == {**summary, "users": 2, "backfilled": 2, "days": 3 + 5, "errors": 0}
+
+    # Feb 1 has no price yet; Feb 3 was already recorded and is kept.
+    nets = {r["date"]: r["net"] for r in load_state_from_json(path)["net_history"]}
+    assert nets == {"2026-02-02": 1300.0, "2026-02-03": 1.0, "2026-02-04": 1310.0, "2026-02-05": 1310.0}
+    assert daemon.main(["--root", str(root), "--backfill", "2026-02-01", "2026-02-05"]) == 0
+    assert json.loads(capsys.readouterr().out)["days"] == 0
+
+
+def test_mongo_backfill_pushes_a_guarded_history_update(fake_collection, price_history):
+    fake_collection.docs = [{"username": "alice", "payload": _dollar_state(), "revision": 2}]
+
+    (result,) = run_backfill(MongoStateStore(fake_collection), price_history, "2026-02-03", "2026-02-04", overwrite=True)
+
+    assert result.error is None and result.days == 2
+    doc = fake_collection.docs[0]
+    assert doc["revision"] == 3
+    assert doc["payload"]["net_history"] == [{"date": "2026-02-03", "net": 1300.0}, {"date": "2026-02-04", "net": 1310.0}]
+    assert doc["payload"]["assets"] == _dollar_state()["assets"]
+
+
+def test_value_states_matches_per_user_valuation():
+    other = _state()
+    other["assets"][1]["Adet"] = "3"
+    other["assets"].append({"Varlık Türü": "Gram Altın", "Kod": "", "Adet": 2.0, "Kur (TL)": 2500.0})
+    other["debts"] = []
+    columnar = {k: pd.DataFrame(v).to_dict(orient="list") for k, v in _state().items() if k in ("assets", "debts")}
+    states = [("a", _state()), ("b", other), ("c", None), ("d", columnar)]
+
+    report = value_states(states, PRICES)
+
+    assert report["username"].tolist() == ["a", "b", "c", "d"]
+    for username, data in states:
+        row = report.set_index("username").loc[username]
+        if data is None:
+            assert row["error"] == "no state" and pd.isna(row["net"])
+            continue
+        assets = prepare_assets_frame(pd.DataFrame(data["assets"]))
+        debts = prepare_debts_frame(pd.DataFrame(data["debts"]))
+        total_assets, total_debts, net = compute_totals(value_assets(assets, PRICES, "BUY").display, debts)
+        assert (row["assets"], row["debts"], row["net"]) == pytest.approx((total_assets, total_debts, net))
+        assert row["rows"] == len(assets) and row["error"] is None
+
+
+def test_value_chunk_loads_from_store(tmp_path, fake_collection):
+    _write_user(tmp_path, "alice", _state())
+    report, timings = value_chunk("file", str(tmp_path), ["alice", "ghost"], PRICES)
+    assert report["net"].tolist()[0] == pytest.approx(1300.0)
+    assert report["error"].tolist() == [None, "no state"]
+    assert set(timings) == {"load_s", "value_s"}
+
+    fake_collection.docs = [{"username": "alice", "payload": _state()}]
+    states = dict(MongoStateStore(fake_collection).load_states(["alice", "bob"]))
+    assert states["bob"] is None and states["alice"]["debts"][0]["Tutar (TL)"] == 100.0
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_codec import (
+    decode_payload,
+    encode_frame,
+    encode_payload,
+    frame_records,
+    get_codec,
+    plain_payload,
+)
+
+CODECS = [get_codec("json")]
+try:
+    CODECS.append(get_codec("orjson"))
+except ValueError:
+    pass
+
+
+def _frame():
+    return pd.DataFrame(
+        {
+            "Varlık Türü": ["Mevduat Hesabı", "Euro", None],
+            "Kod": ["TRY", "EUR", "EUR"],
+            "Adet": [1.5, np.nan, 1e-7],
+            "Kur (TL)": [1.0, "elle 35,2", np.nan],
+            "Yıllık Faiz (%)": [np.nan, np.nan, 42.0],
+            "Sayı": [1, 2, 3],
+            "Aktif": [True, False, True],
+        }
+    )
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+@pytest.mark.parametrize("compact", [True, False])
+def test_encode_frame_matches_records_with_nan_as_null(codec, compact):
+    df = _frame()
+    text = encode_frame(df, codec, compact=compact)
+
+    assert "NaN" not in text
+    assert json.loads(text) == frame_records(df)
+    assert json.loads(text)[0]["Yıllık Faiz (%)"] is None
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_payload_roundtrip_is_standard_json(codec):
+    payload = {
+        "assets": _frame(),
+        "debts": pd.DataFrame(columns=["Borç Adı", "Tutar (TL)", "Not"]),
+        "net_history": [{"date": "2026-01-28", "net": float("nan")}, {"date": "2026-01-29", "net": np.float64(2.5)}],
+        "baseline_net": 2_000_000.0,
+    }
+    for compact in (True, False):
+        raw = encode_payload(payload, compact=compact, codec=codec)
+        decoded = json.loads(raw.decode("utf-8"))  # strict stdlib parse
+        assert decoded == plain_payload(payload)
+        assert decode_payload(raw, codec) == decoded
+        assert decoded["debts"] == []
+        assert decoded["net_history"][0]["net"] is None
+
+
+def test_codecs_agree_on_output():
+    if len(CODECS) < 2:
+        pytest.skip("orjson not installed")
+    payload = {"assets": _frame(), "x": {"a": [1, 2.5, None]}}
+    a, b = (encode_payload(payload, compact=True, codec=c) for c in CODECS)
+    assert json.loads(a) == json.loads(b)
+
+
+def test_unknown_codec_raises():
+    with pytest.raises(ValueError):
+        get_codec("nope")
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda c: c.name)
+def test_decode_accepts_legacy_nan_tokens(codec, tmp_path):
+    from app_storage import load_state_from_json
+
+    text = '{"assets": [{"Kod": "TRY", "Adet": NaN, "Kur (TL)": 1.0}], "net_history": []}'
+    data = decode_payload(text.encode("utf-8"), codec)
+    assert data["assets"][0]["Kod"] == "TRY" and np.isnan(data["assets"][0]["Adet"])
+
+    path = tmp_path / "state.json"
+    path.write_text(text, encoding="utf-8")
+    assert load_state_from_json(str(path))["assets"][0]["Kur (TL)"] == 1.0
@@ -1,6 +1,14 @@
 import pandas as pd
 
-from app_compute import compute_display_assets, compute_totals, get_auto_unit_price
+from app_compute import (
+    GROUP_COL,
+    asset_group_from_code,
+    auto_unit_price_map,
+    compute_display_assets,
+    compute_totals,
+    get_auto_unit_price,
+    value_assets,
+)
 
 
 def test_get_auto_unit_price_try_is_one():
@@ -67,3 +75,65 @@ def test_compute_display_assets_and_totals():
     assert total_assets == 63.0
     assert total_debts == 10.0
     assert net == 53.0
+
+
+def test_auto_unit_price_map_skips_missing_prices():
+    prices = {"USD_BUY": 30.0, "USD_SELL": 31.0, "EUR_BUY": 35.0}
+    assert auto_unit_price_map(prices, "SELL") == {"TRY": 1.0, "USD": 31.0}
+    assert auto_unit_price_map(prices, "BUY") == {"TRY": 1.0, "USD": 30.0, "EUR": 35.0}
+
+
+def test_compute_display_assets_matches_per_row_lookup():
+    prices = {"USD_BUY": 30.0, "GRAM_BUY": 2500.0}
+    assets = pd.DataFrame(
+        [
+            {"Kod": " usd ", "Adet": 2.0, "Kur (TL)": 1.0},
+            {"Kod": "GRAM", "Adet": "1.5", "Kur (TL)": None},
+            {"Kod": "EUR", "Adet": 4.0, "Kur (TL)": 36.0},
+            {"Kod": None, "Adet": 1.0, "Kur (TL)": 7.0},
+            {"Kod": "TRY", "Adet": None, "Kur (TL)": None},
+        ]
+    )
+    display = compute_display_assets(assets, prices, use_side="BUY")
+
+    expected_kur = []
+    for _, row in assets.iterrows():
+        auto = get_auto_unit_price(row["Kod"], prices, "BUY")
+        expected_kur.append(auto if auto is not None else row["Kur (TL)"])
+    assert display["Kur (TL)"].tolist() == expected_kur
+    assert display["Tutar (TL)"].tolist() == [60.0, 3750.0, 144.0, 7.0, 0.0]
+
+
+def test_asset_group_from_code_defaults_to_tl():
+    assert asset_group_from_code(" usd ") == "DÖVİZ HESABI"
+    assert asset_group_from_code("ATA") == "ALTIN HESABI"
+    assert asset_group_from_code("XYZ") == "TL HESABI"
+    assert asset_group_from_code(None) == "TL HESABI"
+
+
+def test_value_assets_groups_and_totals_in_one_pass():
+    assets = pd.DataFrame(
+        [
+            {"Kod": "GRAM", "Adet": 2.0, "Kur (TL)": None},
+            {"Kod": "TRY", "Adet": 100.0, "Kur (TL)": 1.0},
+            {"Kod": "USD", "Adet": 3.0, "Kur (TL)": None},
+            {"Kod": "TRY", "Adet": 50.0, "Kur (TL)": 1.0},
+        ]
+    )
+    prices = {"USD_BUY": 30.0, "GRAM_BUY": 2500.0}
+
+    valuation = value_assets(assets, prices, use_side="BUY")
+
+    assert valuation.display[GROUP_COL].tolist() == ["TL HESABI", "TL HESABI", "DÖVİZ HESABI", "ALTIN HESABI"]
+    assert valuation.group("TL HESABI")["Adet"].tolist() == [100.0, 50.0]
+    assert valuation.group("ALTIN HESABI")["Tutar (TL)"].tolist() == [5000.0]
+    assert valuation.group_totals == {"TL HESABI": 150.0, "DÖVİZ HESABI": 90.0, "ALTIN HESABI": 5000.0}
+    assert valuation.total_assets == 5240.0
+    assert compute_totals(valuation.display, pd.DataFrame())[0] == valuation.total_assets
+
+
+def test_value_assets_empty_group_view():
+    assets = pd.DataFrame([{"Kod": "TRY", "Adet": 1.0, "Kur (TL)": 1.0}])
+    valuation = value_assets(assets, {}, use_side="BUY")
+    assert valuation.group("ALTIN HESABI").empty
+    assert valuation.group_totals["ALTIN HESABI"] == 0.0
@@ -1,8 +1,12 @@
+import sys
+import zipfile
 from io import BytesIO
 
 import pandas as pd
+import pytest
 
-from app_excel import build_bilanco_xlsx
+import app_excel
+from app_excel import build_bilanco_xlsx, build_bilanco_xlsx_cached, build_export_zip, export_tables, iter_csv_chunks
 
 
 def test_build_bilanco_xlsx_creates_two_sheets():
@@ -53,3 +57,107 @@ def test_build_bilanco_xlsx_handles_empty_frames():
 
     assert "Varlıklar" in xls.sheet_names
     assert "Borçlar" in xls.sheet_names
+
+
+def _read_back(data):
+    xls = pd.ExcelFile(BytesIO(data))
+    return pd.read_excel(xls, sheet_name="Varlıklar"), pd.read_excel(xls, sheet_name="Borçlar")
+
+
+def test_build_bilanco_xlsx_streaming_matches_pandas_writer():
+    assets = pd.DataFrame([{"Kod": "USD", "Adet": 2.0, "Kur (TL)": None}, {"Kod": "TRY", "Adet": 3.0, "Kur (TL)": 1.0}])
+    debts = pd.DataFrame([{"Borç Adı": "Kredi", "Tutar (TL)": 10.5}])
+
+    regular = _read_back(build_bilanco_xlsx(assets, debts, streaming=False))
+    streamed = _read_back(build_bilanco_xlsx(assets, debts, streaming=True))
+
+    pd.testing.assert_frame_equal(regular[0], streamed[0])
+    pd.testing.assert_frame_equal(regular[1], streamed[1])
+
+
+def test_build_bilanco_xlsx_streaming_without_xlsxwriter(monkeypatch):
+    monkeypatch.setitem(sys.modules, "xlsxwriter", None)
+    assets = pd.DataFrame([{"Kod": "USD", "Adet": 2.0}])
+    debts = pd.DataFrame([{"Borç Adı": "Kart", "Tutar (TL)": float("nan")}])
+
+    assets_read, debts_read = _read_back(build_bilanco_xlsx(assets, debts, streaming=True))
+    assert assets_read.iloc[0]["Kod"] == "USD"
+    assert pd.isna(debts_read.iloc[0]["Tutar (TL)"])
+
+
+def test_build_bilanco_xlsx_cached_reuses_bytes_for_equal_content(monkeypatch):
+    calls = []
+    original = app_excel.build_bilanco_xlsx
+
+    def counting(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(app_excel, "build_bilanco_xlsx", counting)
+    assets = pd.DataFrame([{"Kod": "CACHE", "Adet": 1.0}])
+    debts = pd.DataFrame([{"Tutar (TL)": 1.0}])
+
+    first = build_bilanco_xlsx_cached(assets, debts)
+    second = build_bilanco_xlsx_cached(assets.copy(), debts.copy())
+    assert first is second
+    assert len(calls) == 1
+
+    build_bilanco_xlsx_cached(assets.assign(Adet=2.0), debts)
+    assert len(calls) == 2
+
+
+def _sample_frames():
+    assets = pd.DataFrame(
+        [
+            {"Kod": "USD", "Adet": 2.0, "Kur (TL)": 30.0, "Not": "ş"},
+            {"Kod": "XYZ", "Adet": 3.0, "Kur (TL)": "manuel", "Not": None},
+        ]
+    )
+    debts = pd.DataFrame([{"Borç Adı": "Kredi", "Tutar (TL)": float("nan")}])
+    history = [{"date": "2026-02-02", "net": 2.0}, {"date": "2026-02-01", "net": 1.0}]
+    return assets, debts, history
+
+
+def test_iter_csv_chunks_matches_single_csv():
+    df = pd.DataFrame({"a": range(25), "b": ["x"] * 25})
+    chunks = list(iter_csv_chunks(df, chunk_rows=10))
+    assert len(chunks) == 3
+    assert b"".join(chunks) == df.to_csv(index=False).encode("utf-8")
+
+
+def test_export_tables_csv():
+    assets, debts, history = _sample_frames()
+    files = export_tables(assets, debts, history, "csv")
+
+    assert sorted(files) == ["assets.csv", "debts.csv", "net_history.csv"]
+    net = pd.read_csv(BytesIO(files["net_history.csv"]))
+    assert net["date"].tolist() == ["2026-02-01", "2026-02-02"]
+
+
+def test_export_tables_parquet_and_arrow_roundtrip():
+    pa = pytest.importorskip("pyarrow")
+    assets, debts, history = _sample_frames()
+
+    parquet = export_tables(assets, debts, history, "parquet")
+    assets_back = pd.read_parquet(BytesIO(parquet["assets.parquet"]))
+    assert assets_back["Kur (TL)"].tolist() == ["30.0", "manuel"]
+    assert assets_back["Adet"].tolist() == [2.0, 3.0]
+
+    arrow = export_tables(assets, debts, history, "arrow")
+    table = pa.ipc.open_file(pa.BufferReader(arrow["net_history.arrow"])).read_all()
+    assert table.column("net").to_pylist() == [1.0, 2.0]
+    debts_table = pa.ipc.open_file(pa.BufferReader(arrow["debts.arrow"])).read_all()
+    assert debts_table.column("Tutar (TL)").to_pylist() == [None]
+
+
+def test_export_tables_rejects_unknown_format():
+    assets, debts, history = _sample_frames()
+    with pytest.raises(ValueError):
+        export_tables(assets, debts, history, "json")
+
+
+def test_build_export_zip_holds_every_table():
+    assets, debts, history = _sample_frames()
+    with zipfile.ZipFile(BytesIO(build_export_zip(assets, debts, history, "csv"))) as zf:
+        assert sorted(zf.namelist()) == ["assets.csv", "debts.csv", "net_history.csv"]
+        assert zf.read("assets.csv") == export_tables(assets, debts, history, "csv")["assets.csv"]
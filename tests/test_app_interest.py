@@ -0,0 +1,82 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_interest import (
+    accrue_deposit_interest,
+    accrue_since,
+    compound_growth,
+    interest_effective_date,
+    parse_rate_percent,
+    parse_rate_percents,
+)
+
+
+def _assets():
+    return pd.DataFrame(
+        [
+            {"Varlık Türü": "Mevduat Hesabı", "Kod": "TRY", "Adet": 1000.0, "Yıllık Faiz (%)": "%41,5"},
+            {"Varlık Türü": " mevduat hesabı ", "Kod": "TRY", "Adet": 500.0, "Yıllık Faiz (%)": 0.0},
+            {"Varlık Türü": "Euro", "Kod": "EUR", "Adet": 10.0, "Yıllık Faiz (%)": 40.0},
+            {"Varlık Türü": "Mevduat Hesabı", "Kod": "TRY", "Adet": "bad", "Yıllık Faiz (%)": 40.0},
+        ]
+    )
+
+
+def test_parse_rate_percents_matches_scalar_parser():
+    values = pd.Series(["41", "%41,5", None, "", "abc", 12.5, "-3"], dtype=object)
+    assert parse_rate_percents(values).tolist() == [parse_rate_percent(v) for v in values]
+
+
+def test_compound_growth_matches_daily_formula():
+    daily = 0.41 / 365.0 * (1.0 - 0.175)
+    assert compound_growth(41.0, 3) == pytest.approx((1.0 + daily) ** 3)
+    assert compound_growth([-5.0, 0.0], 10).tolist() == [1.0, 1.0]
+
+
+def test_compound_growth_rate_schedule_multiplies_segments():
+    rates = np.array([[40.0, 20.0]])
+    expected = compound_growth(40.0, 2) * compound_growth(20.0, 5)
+    assert compound_growth(rates, [2, 5])[0] == pytest.approx(expected)
+
+
+def test_accrue_deposit_interest_only_touches_positive_deposits():
+    out = accrue_deposit_interest(_assets(), days=2)
+
+    assert out.loc[0, "Adet"] == pytest.approx(1000.0 * compound_growth(41.5, 2))
+    assert out.loc[1, "Adet"] == 500.0
+    assert out.loc[2, "Adet"] == 10.0
+    assert out.loc[3, "Adet"] == "bad"
+
+
+def test_accrue_deposit_interest_per_row_days():
+    assets = pd.DataFrame(
+        [
+            {"Varlık Türü": "Mevduat Hesabı", "Adet": 100.0, "Yıllık Faiz (%)": 40.0},
+            {"Varlık Türü": "Mevduat Hesabı", "Adet": 100.0, "Yıllık Faiz (%)": 40.0},
+        ]
+    )
+    out = accrue_deposit_interest(assets, days=[1, 30])
+    assert out["Adet"].tolist() == pytest.approx([100.0 * compound_growth(40.0, 1), 100.0 * compound_growth(40.0, 30)])
+
+
+def test_interest_effective_date_rolls_over_at_six():
+    assert interest_effective_date(dt.datetime(2026, 2, 2, 5, 59)) == dt.date(2026, 2, 1)
+    assert interest_effective_date(dt.datetime(2026, 2, 2, 6, 0)) == dt.date(2026, 2, 2)
+
+
+def test_accrue_since_tracks_last_date():
+    assets = _assets()
+    now = dt.datetime(2026, 2, 5, 12, 0)
+
+    df, last = accrue_since(assets, None, now)
+    assert df is assets and last == "2026-02-05"
+
+    df, last = accrue_since(assets, "2026-02-05", now)
+    assert df is assets and last == "2026-02-05"
+
+    df, last = accrue_since(assets, "2026-02-02", now)
+    assert last == "2026-02-05"
+    assert df.loc[0, "Adet"] == pytest.approx(1000.0 * compound_growth(41.5, 3))
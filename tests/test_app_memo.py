@@ -0,0 +1,29 @@
+from app_memo import StageMemo, get_stage_memo
+
+
+def test_stage_memo_recomputes_only_when_key_changes():
+    memo = StageMemo()
+    calls = []
+
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert memo.run("square", ("k", 2), square, 2) == 4
+    assert memo.run("square", ("k", 2), square, 2) == 4
+    assert memo.run("square", ("k", 3), square, 3) == 9
+    assert calls == [2, 3]
+    assert memo.stats() == [{"stage": "square", "hits": 1, "misses": 2, "hit_rate": 1 / 3}]
+
+
+def test_stage_memo_keeps_stages_separate():
+    memo = StageMemo()
+    memo.run("a", 1, lambda: "a1")
+    assert memo.run("b", 1, lambda: "b1") == "b1"
+    assert memo.run("a", 1, lambda: "other") == "a1"
+
+
+def test_get_stage_memo_is_per_session():
+    first, second = {}, {}
+    assert get_stage_memo(first) is get_stage_memo(first)
+    assert get_stage_memo(first) is not get_stage_memo(second)
@@ -0,0 +1,141 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app_mongo
+from app_mongo import (
+    CommandMetrics,
+    batched,
+    bulk_delete_by_key,
+    bulk_set_by_key,
+    bulk_update,
+    iter_documents,
+    mongo_client_options,
+    projection,
+)
+
+pytest.importorskip("pymongo")
+
+
+@pytest.fixture(autouse=True)
+def _no_secrets(monkeypatch):
+    monkeypatch.setattr(app_mongo, "_get_secret", lambda name: None)
+    for name in (*app_mongo.POOL_SETTINGS, "MONGO_DB"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_client_options_defaults_and_env_overrides(monkeypatch):
+    opts = mongo_client_options()
+    assert opts["maxPoolSize"] == 20
+    assert opts["serverSelectionTimeoutMS"] == 5000
+    assert "compressors" not in opts
+
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "'50'")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "5")
+    monkeypatch.setenv("MONGO_MAX_IDLE_MS", "not-a-number")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zlib")
+    opts = mongo_client_options()
+    assert opts["maxPoolSize"] == 50
+    assert opts["minPoolSize"] == 5
+    assert opts["maxIdleTimeMS"] == 300_000
+    assert opts["compressors"] == ["zlib"]
+
+    monkeypatch.setenv("MONGO_COMPRESSORS", "none")
+    assert "compressors" not in mongo_client_options()
+
+
+
+def test_db_name_strips_quotes_and_falls_back(monkeypatch):
+    assert app_mongo.get_mongo_db_name() == "portfolio"
+    monkeypatch.setenv("MONGO_DB", "' prod '")
+    assert app_mongo.get_mongo_db_name() == "prod"
+    monkeypatch.setenv("MONGO_DB", '""')
+    assert app_mongo.get_mongo_db_name() == "portfolio"
+
+def test_command_metrics_from_listener_events():
+    metrics = CommandMetrics(window=10)
+    for micros in (1000, 2000, 3000):
+        metrics.succeeded(SimpleNamespace(command_name="find", duration_micros=micros))
+    metrics.failed(SimpleNamespace(command_name="update", duration_micros=500))
+
+    rows = {r["command"]: r for r in metrics.stats()}
+    assert rows["find"]["count"] == 3
+    assert rows["find"]["mean_ms"] == pytest.approx(2.0)
+    assert rows["find"]["max_ms"] == pytest.approx(3.0)
+    assert rows["find"]["p95_ms"] == pytest.approx(3.0)
+    assert rows["update"]["failures"] == 1
+
+    metrics.reset()
+    assert metrics.stats() == []
+
+
+def test_projection_and_batched():
+    assert projection("payload", "revision") == {"payload": 1, "revision": 1, "_id": 0}
+    assert projection("role", include_id=True) == {"role": 1}
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+class _BulkColl:
+    def __init__(self):
+        self.calls = []
+        self.deletes = []
+
+    def bulk_write(self, ops, ordered=True):
+        self.calls.append((ops, ordered))
+        return SimpleNamespace(matched_count=len(ops), modified_count=len(ops) - 1, upserted_count=1)
+
+    def delete_many(self, flt):
+        self.deletes.append(flt)
+        return SimpleNamespace(deleted_count=len(flt["username"]["$in"]))
+
+
+def test_bulk_helpers_batch_unordered_writes():
+    from pymongo import UpdateOne
+
+    coll = _BulkColl()
+    docs = [{"username": f"u{i}", "role": "user"} for i in range(5)]
+
+    totals = bulk_set_by_key(coll, docs, batch_size=2)
+
+    assert totals == {"matched": 5, "modified": 2, "upserted": 3, "batches": 3}
+    assert all(not ordered for _, ordered in coll.calls)
+    first = coll.calls[0][0][0]
+    assert first == UpdateOne({"username": "u0"}, {"$set": docs[0]}, upsert=True)
+
+    bulk_update(coll, [({"username": "x"}, {"$inc": {"revision": 1}})])
+    assert coll.calls[-1][0] == [UpdateOne({"username": "x"}, {"$inc": {"revision": 1}}, upsert=False)]
+
+    assert bulk_delete_by_key(coll, ["a", "b", "c"], batch_size=2) == 3
+    assert coll.deletes == [{"username": {"$in": ["a", "b"]}}, {"username": {"$in": ["c"]}}]
+
+
+def test_use_db_installs_stand_in(fake_collection):
+    stand_in = {"users": fake_collection}
+    app_mongo.use_db(stand_in)
+    try:
+        assert app_mongo.get_db() is stand_in
+    finally:
+        app_mongo.use_db(None)
+
+
+class _Cursor(list):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_iter_documents_streams_a_projected_batched_cursor():
+    calls = []
+    cursor = _Cursor([{"username": "a"}, {"username": "b"}])
+
+    class Coll:
+        def find(self, flt, proj, **kwargs):
+            calls.append((flt, proj, kwargs))
+            return cursor
+
+    docs = iter_documents(Coll(), fields=("username", "payload.assets"), batch_size=50)
+    assert next(docs) == {"username": "a"}
+    docs.close()
+    assert cursor.closed
+    assert calls == [({}, {"username": 1, "payload.assets": 1, "_id": 0}, {"batch_size": 50, "sort": [("username", 1)]})]
@@ -1,4 +1,11 @@
-from app_net_history import ensure_baseline_net, get_net_for, upsert_net_snapshot
+from app_net_history import (
+    NetHistoryIndex,
+    ensure_baseline_net,
+    get_net_for,
+    get_net_history_index,
+    get_net_range,
+    upsert_net_snapshot,
+)
 
 
 def test_net_history_baseline_and_upsert():
@@ -12,3 +19,75 @@ def test_net_history_baseline_and_upsert():
 
     upsert_net_snapshot(session_state, "2026-02-01", 999.0)
     assert get_net_for(session_state, "2026-02-01") == 999.0
+
+
+def test_upsert_keeps_history_sorted_without_duplicates():
+    session_state = {"net_history": [{"date": "2026-02-03", "net": 3.0}, {"date": "2026-02-01", "net": 1.0}]}
+
+    upsert_net_snapshot(session_state, "2026-02-02", 2.0)
+    upsert_net_snapshot(session_state, "2026-02-02", 2.5)
+    upsert_net_snapshot(session_state, "2026-02-04", 4.0)
+
+    assert session_state["net_history"] == [
+        {"date": "2026-02-01", "net": 1.0},
+        {"date": "2026-02-02", "net": 2.5},
+        {"date": "2026-02-03", "net": 3.0},
+        {"date": "2026-02-04", "net": 4.0},
+    ]
+
+
+def test_get_net_range_is_inclusive():
+    session_state = {"net_history": []}
+    for day in range(1, 10):
+        upsert_net_snapshot(session_state, f"2026-02-0{day}", float(day))
+
+    window = get_net_range(session_state, "2026-02-03", "2026-02-05")
+    assert [r["net"] for r in window] == [3.0, 4.0, 5.0]
+    assert [r["date"] for r in get_net_range(session_state, "2026-02-08")] == ["2026-02-08", "2026-02-09"]
+
+
+def test_index_rebuilds_when_history_list_is_replaced():
+    session_state = {"net_history": [{"date": "2026-02-01", "net": 1.0}]}
+    assert get_net_for(session_state, "2026-02-01") == 1.0
+
+    session_state["net_history"] = [{"date": "2026-02-01", "net": 5.0}]
+    assert get_net_for(session_state, "2026-02-01") == 5.0
+
+
+def test_index_version_only_changes_on_real_updates():
+    session_state = {"net_history": []}
+    idx = get_net_history_index(session_state)
+    upsert_net_snapshot(session_state, "2026-02-01", 1.0)
+    version = idx.version
+
+    upsert_net_snapshot(session_state, "2026-02-01", 1.0)
+    assert idx.version == version
+    upsert_net_snapshot(session_state, "2026-02-01", 2.0)
+    assert idx.version == version + 1
+
+
+def test_bulk_upsert_merges_with_one_sort():
+    records = [{"date": "2026-02-03", "net": 3.0}]
+    idx = NetHistoryIndex(records)
+    assert idx.bulk_upsert([("2026-02-05", 5), ("2026-02-01", 1), ("2026-02-03", 9)]) == 2
+    assert [r["date"] for r in records] == ["2026-02-01", "2026-02-03", "2026-02-05"]
+    assert idx.get("2026-02-03") == 3.0 and idx.version == 1
+    assert idx.bulk_upsert([("2026-02-03", 9)], overwrite=True) == 1
+    assert idx.get("2026-02-03") == 9.0 and idx.dates == ["2026-02-01", "2026-02-03", "2026-02-05"]
+    assert idx.bulk_upsert([("2026-02-03", 9)], overwrite=True) == 0 and idx.version == 2
+
+
+def test_in_order_snapshots_append_without_shifting():
+    class NoInsert(list):
+        def insert(self, *args):
+            raise AssertionError("in-order add shifted the list")
+
+    records = NoInsert([{"date": "2026-02-01", "net": 1.0}])
+    idx = NetHistoryIndex(records)
+    idx.dates = NoInsert(idx.dates)
+    for day in range(2, 6):
+        assert idx.upsert(f"2026-02-0{day}", float(day))
+    idx.upsert("2026-02-05", 5.0)
+
+    assert [r["net"] for r in idx.range("2026-02-03")] == [3.0, 4.0, 5.0]
+    assert records is idx.records and len(records) == 5
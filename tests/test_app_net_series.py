@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app_net_history import upsert_net_snapshot
+from app_net_series import NetSeries, get_net_series
+
+
+def _series(pairs):
+    return NetSeries.from_records([{"date": d, "net": n} for d, n in pairs])
+
+
+def test_from_records_sorts_and_drops_bad_dates():
+    series = _series([("2026-02-03", 3.0), ("bad", 9.0), ("2026-02-01", 1.0)])
+    assert series.date_strings().tolist() == ["2026-02-01", "2026-02-03"]
+    assert series.nets.tolist() == [1.0, 3.0]
+
+
+def test_slice_is_inclusive_and_value_at():
+    series = _series([(f"2026-02-0{d}", float(d)) for d in range(1, 10)])
+    window = series.slice("2026-02-03", "2026-02-05")
+    assert window.nets.tolist() == [3.0, 4.0, 5.0]
+    assert series.value_at("2026-02-07") == 7.0
+    assert series.value_at("2026-03-01") is None
+
+
+def test_returns_and_drawdown():
+    series = _series([("2026-02-01", 100.0), ("2026-02-02", 110.0), ("2026-02-03", 99.0), ("2026-02-04", 121.0)])
+
+    r = series.returns()
+    assert np.isnan(r[0])
+    assert r[1:].tolist() == pytest.approx([0.10, -0.10, 121.0 / 99.0 - 1.0])
+    assert series.returns(periods=3)[3] == pytest.approx(0.21)
+
+    assert series.drawdown().tolist() == pytest.approx([0.0, 0.0, -0.10, 0.0])
+    assert series.max_drawdown() == pytest.approx(-0.10)
+    assert series.pnl(100.0).tolist() == [0.0, 10.0, -1.0, 21.0]
+
+
+def test_resample_takes_last_value_per_period():
+    # 2026-02-01 is a Sunday, 2026-02-02 a Monday.
+    series = _series([("2026-01-30", 1.0), ("2026-02-01", 2.0), ("2026-02-02", 3.0), ("2026-02-08", 4.0), ("2026-02-09", 5.0)])
+
+    assert series.resample("W").nets.tolist() == [2.0, 4.0, 5.0]
+    monthly = series.resample("M")
+    assert monthly.date_strings().tolist() == ["2026-01-30", "2026-02-09"]
+    assert monthly.nets.tolist() == [1.0, 5.0]
+    with pytest.raises(ValueError):
+        series.resample("Y")
+
+
+def test_get_net_series_is_cached_until_history_changes():
+    session_state = {"net_history": []}
+    upsert_net_snapshot(session_state, "2026-02-01", 1.0)
+
+    first = get_net_series(session_state)
+    assert get_net_series(session_state) is first
+
+    upsert_net_snapshot(session_state, "2026-02-01", 1.0)
+    assert get_net_series(session_state) is first
+
+    upsert_net_snapshot(session_state, "2026-02-02", 2.0)
+    second = get_net_series(session_state)
+    assert second is not first
+    assert second.nets.tolist() == [1.0, 2.0]
+
+
+def test_get_net_series_is_rebuilt_for_a_new_history():
+    session_state = {"net_history": [{"date": "2026-02-01", "net": 1.0}]}
+    first = get_net_series(session_state)
+
+    # A reload swaps in a new history list of the same length and version.
+    session_state["net_history"] = [{"date": "2026-02-01", "net": 5.0}]
+    assert get_net_series(session_state).nets.tolist() == [5.0]
+    assert get_net_series(session_state) is not first
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+import app_passwords
+from app_passwords import (
+    HashingBusy,
+    HashingService,
+    LoginThrottle,
+    check_password,
+    make_password_record,
+    needs_rehash,
+    throttle_keys,
+)
+from app_auth import hash_password
+
+
+def test_record_stores_parameters_and_verifies():
+    service = HashingService(workers=2)
+    record = make_password_record("secret1", rounds=1000, service=service)
+    assert record["algo"] == "pbkdf2_sha256"
+    assert record["rounds"] == 1000
+    assert check_password(record, "secret1", service=service)
+    assert not check_password(record, "secret2", service=service)
+    assert not needs_rehash(record, rounds=1000)
+    assert needs_rehash(record, rounds=2000)
+    service.shutdown()
+
+
+def test_legacy_records_use_legacy_rounds():
+    salt, digest = hash_password("secret1")
+    legacy = {"salt": salt, "hash": digest}
+    assert check_password(legacy, "secret1")
+    assert needs_rehash(legacy)
+
+
+def test_service_rejects_work_beyond_max_pending():
+    service = HashingService(workers=1, max_pending=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    t = threading.Thread(target=lambda: service.run(slow))
+    t.start()
+    started.wait(5)
+    with pytest.raises(HashingBusy):
+        service.run(lambda: None)
+    release.set()
+    t.join(5)
+    # The slot is released once the first job finishes.
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        try:
+            assert service.run(lambda: 42) == 42
+            break
+        except HashingBusy:
+            time.sleep(0.01)
+    service.shutdown()
+
+
+def test_timed_out_check_is_reported_as_busy():
+    service = HashingService(workers=1, max_pending=2)
+    release = threading.Event()
+    with pytest.raises(HashingBusy):
+        service.run(release.wait, 5, timeout_s=0.05)
+    release.set()
+    service.shutdown()
+
+
+def test_default_queue_drains_within_the_timeout():
+    waits = app_passwords.KDF_MAX_PENDING / app_passwords.KDF_WORKERS
+    assert waits * app_passwords.KDF_HASH_ESTIMATE_S <= app_passwords.KDF_TIMEOUT_S
+
+
+def test_throttle_locks_after_failures_and_backs_off():
+    now = [0.0]
+    throttle = LoginThrottle(max_failures=3, window_s=60, base_delay_s=10, max_delay_s=25, clock=lambda: now[0])
+    keys = throttle_keys("Ayse", "1.2.3.4")
+    assert keys == ["user:ayse", "ip:1.2.3.4"]
+
+    for _ in range(2):
+        throttle.record_failure(keys)
+    assert throttle.retry_after(keys) == 0
+    throttle.record_failure(keys)
+    assert throttle.retry_after(keys) == 10
+    throttle.record_failure(keys)
+    assert throttle.retry_after(keys) == 20
+    throttle.record_failure(keys)
+    assert throttle.retry_after(keys) == 25
+    # Another user from the same address is locked too.
+    assert throttle.retry_after(throttle_keys("mehmet", "1.2.3.4")) == 25
+
+    throttle.record_success(keys)
+    assert throttle.retry_after(keys) == 0
+
+
+def test_throttle_forgets_expired_keys_and_caps_its_size():
+    now = [0.0]
+    throttle = LoginThrottle(max_failures=2, window_s=60, base_delay_s=10, max_delay_s=10, clock=lambda: now[0], max_keys=50)
+    for i in range(200):
+        throttle.record_failure([f"user:u{i}"])
+    assert len(throttle) == 50
+    throttle.record_failure(["user:u199"])
+    assert throttle.retry_after(["user:u199"]) == 10
+
+    now[0] = 120.0
+    throttle.record_failure(["user:late"])
+    assert len(throttle) == 1
+
+
+def test_default_service_is_shared():
+    assert app_passwords.get_hashing_service() is app_passwords.get_hashing_service()
@@ -0,0 +1,116 @@
+import datetime as dt
+import time
+
+import numpy as np
+import pytest
+
+from app_price_history import PriceHistory, attach_price_history
+from app_pricing import PriceSnapshot, SharedPriceCache
+
+
+def _snap(hour, prices, day=1):
+    return PriceSnapshot(prices_try=prices, fetched_at=dt.datetime(2026, 2, day, hour), source="test")
+
+
+@pytest.fixture
+def history(tmp_path):
+    h = PriceHistory(str(tmp_path / "prices.sqlite3"))
+    yield h
+    h.close()
+
+
+def test_record_dedups_snapshots_and_unchanged_codes(history):
+    assert history.record(_snap(9, {"USD_BUY": 40.0, "EUR_BUY": 45.0}))
+    assert not history.record(_snap(10, {"USD_BUY": 40.0, "EUR_BUY": 45.0}))
+    assert history.record(_snap(11, {"USD_BUY": 41.0, "EUR_BUY": 45.0}))
+    assert not history.record(_snap(12, {}))
+
+    assert history.snapshot_count() == 2
+    ts, prices = history.range("EUR_BUY")
+    assert len(ts) == 1 and prices.tolist() == [45.0]
+    assert history.codes() == ["EUR_BUY", "USD_BUY"]
+
+
+def test_as_of_lookups(history):
+    history.record(_snap(9, {"USD_BUY": 40.0}))
+    history.record(_snap(15, {"USD_BUY": 41.0}))
+    history.record(_snap(9, {"USD_BUY": 42.0}, day=3))
+
+    assert history.price_as_of("USD_BUY", dt.datetime(2026, 2, 1, 8)) is None
+    assert history.price_as_of("USD_BUY", dt.datetime(2026, 2, 1, 9)) == 40.0
+    assert history.price_as_of("USD_BUY", dt.datetime(2026, 2, 1, 14, 59)) == 40.0
+    assert history.price_as_of("USD_BUY", "2026-02-01") == 41.0  # a date is the end of that day
+    assert history.price_as_of("USD_BUY", dt.date(2026, 2, 2)) == 41.0
+    assert history.prices_as_of("2026-02-05") == {"USD_BUY": 42.0}
+
+
+def test_range_includes_value_in_force_at_start(history):
+    for day, price in [(1, 40.0), (3, 41.0), (5, 42.0)]:
+        history.record(_snap(12, {"USD_BUY": price}, day=day))
+
+    ts, prices = history.range("USD_BUY", "2026-02-02", "2026-02-04")
+    assert prices.tolist() == [40.0, 41.0]
+    ts, prices = history.range("USD_BUY", "2026-02-02", "2026-02-04", include_prior=False)
+    assert prices.tolist() == [41.0]
+
+
+def test_asof_matrix(history):
+    history.record(_snap(12, {"USD_BUY": 40.0}, day=2))
+    history.record(_snap(12, {"USD_BUY": 41.0, "EUR_BUY": 45.0}, day=4))
+
+    days = [dt.date(2026, 2, d) for d in range(1, 6)]
+    m = history.asof_matrix(["USD_BUY", "EUR_BUY", "GBP_BUY"], days)
+
+    assert m.shape == (5, 3)
+    np.testing.assert_array_equal(m[:, 0], [np.nan, 40.0, 40.0, 41.0, 41.0])
+    np.testing.assert_array_equal(m[:, 1], [np.nan, np.nan, np.nan, 45.0, 45.0])
+    assert np.isnan(m[:, 2]).all()
+
+
+@pytest.fixture
+def istanbul(monkeypatch):
+    monkeypatch.setenv("TZ", "Europe/Istanbul")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_aware_and_naive_times_are_compared_in_utc(history, istanbul):
+    history.record(_snap(12, {"USD_BUY": 40.0}))  # 12:00 local is 09:00 UTC
+    utc = dt.timezone.utc
+
+    assert history.price_as_of("USD_BUY", dt.datetime(2026, 2, 1, 9, tzinfo=utc)) == 40.0
+    assert history.price_as_of("USD_BUY", dt.datetime(2026, 2, 1, 8, 59, tzinfo=utc)) is None
+    assert history.price_as_of("USD_BUY", "2026-02-01T09:00:00+00:00") == 40.0
+    assert history.price_as_of("USD_BUY", dt.datetime(2026, 2, 1, 12)) == 40.0
+    assert history.range("USD_BUY")[0] == ["2026-02-01T09:00:00.000000"]
+
+
+def test_state_survives_reopen(tmp_path):
+    path = str(tmp_path / "prices.sqlite3")
+    h = PriceHistory(path)
+    h.record(_snap(9, {"USD_BUY": 40.0}))
+    h.close()
+
+    h = PriceHistory(path)
+    assert not h.record(_snap(10, {"USD_BUY": 40.0}))
+    assert h.record(_snap(11, {"USD_BUY": 40.0, "EUR_BUY": 45.0}))
+    ts, _ = h.range("USD_BUY")
+    assert len(ts) == 1
+    h.close()
+
+
+def test_shared_cache_listener_records_new_snapshots(history):
+    prices = iter([{"USD_BUY": 40.0}, {}, {"USD_BUY": 41.0}])
+    hours = iter([9, 10, 11])
+    cache = SharedPriceCache(ttl_s=60, fetch=lambda timeout_s: _snap(next(hours), next(prices)))
+
+    cache.refresh()
+    attach_price_history(cache, history)
+    attach_price_history(cache, history)  # idempotent
+    cache.refresh()  # empty result is not stored by the cache
+    cache.refresh()
+
+    ts, values = history.range("USD_BUY")
+    assert values.tolist() == [40.0, 41.0]
@@ -1,10 +1,23 @@
 import datetime as dt
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
 
 from app_pricing import (
     PriceSnapshot,
+    PriceSource,
+    SharedPriceCache,
+    _fetch_truncgil,
     _parse_update_date,
     _to_float_tr,
     fetch_prices,
+    clear_validator_cache,
+    http_stats,
+    reset_http_stats,
 )
 
 
@@ -60,3 +73,247 @@ def test_fetch_prices_returns_empty_when_all_fail(monkeypatch):
 
     result = fetch_prices(timeout_s=1)
     assert result.prices_try == {}
+
+
+def _source(name, prices, delay=0.0, priority=100, deadline_s=None):
+    def fetch(timeout_s):
+        time.sleep(delay)
+        if prices is None:
+            return None
+        return PriceSnapshot(prices_try=dict(prices), fetched_at=dt.datetime(2026, 2, 1), source=name, notes=name)
+
+    return PriceSource(name=name, fetch=fetch, priority=priority, deadline_s=deadline_s)
+
+
+def test_fetch_prices_queries_sources_concurrently():
+    sources = [
+        _source("slow-fail", None, delay=0.3, priority=0),
+        _source("slow-ok", {"USD_BUY": 30.0}, delay=0.3, priority=1),
+    ]
+    t0 = time.monotonic()
+    result = fetch_prices(timeout_s=2, sources=sources)
+    assert time.monotonic() - t0 < 0.55
+    assert result.prices_try == {"USD_BUY": 30.0}
+    assert result.source == "slow-ok"
+
+
+def test_fetch_prices_priority_merges_by_key():
+    sources = [
+        _source("primary", {"USD_BUY": 30.0}, priority=0),
+        _source("secondary", {"USD_BUY": 31.0, "EUR_BUY": 35.0}, priority=1),
+    ]
+    result = fetch_prices(timeout_s=2, policy="priority", sources=sources)
+    assert result.prices_try == {"USD_BUY": 30.0, "EUR_BUY": 35.0}
+    assert result.source == "primary + secondary"
+
+
+def test_fetch_prices_falls_back_only_when_the_primary_is_empty():
+    sources = [
+        _source("primary", {"USD_BUY": 30.0}, priority=0),
+        _source("secondary", {"USD_BUY": 31.0, "EUR_BUY": 35.0}, delay=0.5, priority=1),
+    ]
+    t0 = time.monotonic()
+    result = fetch_prices(timeout_s=2, sources=sources)
+    # A primary missing some keys is used as is, without waiting for the secondary.
+    assert time.monotonic() - t0 < 0.3
+    assert result.prices_try == {"USD_BUY": 30.0}
+    assert result.source == "primary"
+
+
+def test_fetch_prices_first_policy_returns_fastest():
+    sources = [
+        _source("slow", {"USD_BUY": 30.0}, delay=0.5, priority=0),
+        _source("fast", {"USD_BUY": 31.0}, priority=1),
+    ]
+    result = fetch_prices(timeout_s=2, policy="first", sources=sources)
+    assert result.source == "fast"
+
+
+def test_fetch_prices_median_policy():
+    sources = [
+        _source("a", {"USD_BUY": 30.0}, priority=0),
+        _source("b", {"USD_BUY": 32.0}, priority=1),
+        _source("c", {"USD_BUY": 40.0, "EUR_BUY": 35.0}, priority=2),
+    ]
+    result = fetch_prices(timeout_s=2, policy="median", sources=sources)
+    assert result.prices_try == {"USD_BUY": 32.0, "EUR_BUY": 35.0}
+
+
+def test_fetch_prices_respects_per_source_deadline():
+    sources = [
+        _source("hung", {"USD_BUY": 1.0}, delay=1.0, priority=0, deadline_s=0.1),
+        _source("ok", {"USD_BUY": 30.0}, delay=0.05, priority=1),
+    ]
+    t0 = time.monotonic()
+    result = fetch_prices(timeout_s=2, sources=sources)
+    assert time.monotonic() - t0 < 0.5
+    assert result.prices_try == {"USD_BUY": 30.0}
+
+
+def test_fetch_prices_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        fetch_prices(timeout_s=1, policy="fastest", sources=[])
+
+
+class _CountingFetch:
+    def __init__(self, prices=None, delay=0.0):
+        self.calls = 0
+        self.prices = {"USD_BUY": 30.0} if prices is None else prices
+        self.delay = delay
+
+    def __call__(self, timeout_s):
+        self.calls += 1
+        time.sleep(self.delay)
+        return PriceSnapshot(prices_try=dict(self.prices), fetched_at=dt.datetime.now(), source="mock")
+
+
+def test_shared_cache_serves_fresh_snapshot_without_fetching():
+    fetch = _CountingFetch()
+    cache = SharedPriceCache(ttl_s=60, fetch=fetch)
+
+    first = cache.get()
+    second = cache.get()
+
+    assert first is second
+    assert fetch.calls == 1
+    assert cache.generation == 1
+
+
+def test_shared_cache_serves_stale_while_revalidating():
+    fetch = _CountingFetch(delay=0.1)
+    cache = SharedPriceCache(ttl_s=60, fetch=fetch)
+    old = cache.get()
+
+    t0 = time.monotonic()
+    stale = cache.get(max_age_s=0)
+    assert time.monotonic() - t0 < 0.05
+    assert stale is old
+
+    deadline = time.monotonic() + 2
+    while cache.generation < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.generation == 2
+    assert cache.snapshot is not old
+
+
+def test_shared_cache_concurrent_refresh_is_single_flight():
+    fetch = _CountingFetch(delay=0.1)
+    cache = SharedPriceCache(ttl_s=60, fetch=fetch)
+
+    threads = [threading.Thread(target=cache.refresh) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert fetch.calls == 1
+    assert cache.generation == 1
+
+
+def test_shared_cache_keeps_last_good_snapshot_on_empty_fetch():
+    fetch = _CountingFetch()
+    cache = SharedPriceCache(ttl_s=60, fetch=fetch)
+    good = cache.get()
+
+    fetch.prices = {}
+    assert cache.refresh() is good
+    assert cache.generation == 1
+
+
+def test_shared_cache_backs_off_after_failed_fetches(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    fetch = _CountingFetch()
+    cache = SharedPriceCache(ttl_s=60, fetch=fetch)
+    revalidations = []
+    monkeypatch.setattr(cache, "revalidate_async", lambda timeout_s=None: revalidations.append(clock[0]))
+    cache.get()
+
+    fetch.prices = {}
+    clock[0] += 60
+    cache.get()
+    assert len(revalidations) == 1
+    for failures, backoff_s in enumerate((2, 4, 8), 1):
+        cache.refresh()  # the outage: nothing came back
+        assert cache.retry_wait_s() == backoff_s
+        cache.get()
+        assert len(revalidations) == failures
+        clock[0] += backoff_s
+        cache.get()
+        assert len(revalidations) == failures + 1
+
+    fetch.prices = {"USD_BUY": 31.0}
+    clock[0] += 16
+    cache.refresh()
+    assert cache.retry_wait_s() == 0 and cache.snapshot.prices_try == {"USD_BUY": 31.0}
+
+
+class _TodayJsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    body = json.dumps({"Update_Date": "2026-02-01 12:00:00", "USD": {"Buying": "30,50", "Selling": "30,60"}}).encode("utf-8")
+    etag = '"v1"'
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def today_json_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TodayJsonHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    reset_http_stats()
+    clear_validator_cache()
+    yield f"http://127.0.0.1:{server.server_port}/v4/today.json"
+    server.shutdown()
+    server.server_close()
+    reset_http_stats()
+    clear_validator_cache()
+
+
+def test_truncgil_conditional_get_reuses_parsed_snapshot(today_json_url):
+    first = _fetch_truncgil(today_json_url, timeout_s=5)
+    second = _fetch_truncgil(today_json_url, timeout_s=5)
+
+    assert first is not None
+    assert first.prices_try == {"USD_BUY": 30.5, "USD_SELL": 30.6}
+    assert second is first
+
+    stats = http_stats()
+    assert stats["requests"] == 2
+    assert stats["not_modified"] == 1
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 1
+
+
+def test_resetting_stats_keeps_validators(today_json_url):
+    first = _fetch_truncgil(today_json_url, timeout_s=5)
+    reset_http_stats()
+    assert _fetch_truncgil(today_json_url, timeout_s=5) is first
+    assert http_stats()["not_modified"] == 1
+
+    clear_validator_cache()
+    assert _fetch_truncgil(today_json_url, timeout_s=5) is not first
+
+
+def test_concurrent_fetches_count_every_request(today_json_url):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: _fetch_truncgil(today_json_url, timeout_s=5), range(16)))
+    stats = http_stats()
+    assert stats["requests"] == 16
+    assert 1 <= stats["new_connections"] <= 4
+    assert stats["new_connections"] + stats["reused_connections"] == 16
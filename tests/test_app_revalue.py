@@ -0,0 +1,89 @@
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_compute import compute_display_assets, compute_totals
+from app_price_history import PriceHistory
+from app_pricing import PriceSnapshot
+from app_revalue import Holdings, backfill_from_history, backfill_net_history, revalue, revalue_many, revalue_range
+
+
+def _assets():
+    return pd.DataFrame(
+        {
+            "Kod": ["TRY", " usd", "USD", "GRAM", "", "EUR"],
+            "Adet": [1000.0, 10.0, "5", 2.0, 3.0, None],
+            "Kur (TL)": [None, 30.0, 30.0, 2500.0, 100.0, 50.0],
+        }
+    )
+
+
+def _debts():
+    return pd.DataFrame({"Tutar (TL)": [200.0, None, 50.0]})
+
+
+@pytest.fixture
+def history(tmp_path):
+    h = PriceHistory(str(tmp_path / "prices.sqlite3"))
+    yield h
+    h.close()
+
+
+def test_holdings_group_quantities_by_price_key():
+    h = Holdings.from_state(_assets(), _debts())
+    assert h.price_keys == ["EUR_BUY", "GRAM_BUY", "USD_BUY"]
+    assert h.quantities.tolist() == [0.0, 2.0, 15.0]
+    assert h.fixed_value == 1300.0
+    assert h.total_debts == 250.0
+    assert Holdings.from_state(_assets(), _debts(), "SELL").price_keys == ["EUR_SELL", "GRAM_SELL", "USD_SELL"]
+
+
+@pytest.mark.parametrize("prices", [{"USD_BUY": 40.0, "GRAM_BUY": 3000.0, "EUR_BUY": 45.0}, {"USD_BUY": 40.0}, {}])
+def test_revalue_matches_page_valuation(prices):
+    h = Holdings.from_state(_assets(), _debts())
+    row = np.array([[prices.get(k, np.nan) for k in h.price_keys]])
+    nets, covered = revalue(h, row)
+
+    _, _, expected = compute_totals(compute_display_assets(_assets(), prices, "BUY"), _debts())
+    assert nets[0, 0] == pytest.approx(expected)
+    assert covered[0, 0] == ("GRAM_BUY" in prices and "USD_BUY" in prices)
+
+
+def test_revalue_many_is_one_product_over_users():
+    a = Holdings.from_state(pd.DataFrame({"Kod": ["USD"], "Adet": [2.0]}), pd.DataFrame())
+    b = Holdings.from_state(pd.DataFrame({"Kod": ["EUR", "TRY"], "Adet": [1.0, 5.0]}), pd.DataFrame({"Tutar (TL)": [1.0]}))
+    prices = np.array([[45.0, 40.0], [46.0, np.nan]])
+    nets, covered = revalue_many([a, b], prices, ["EUR_BUY", "USD_BUY"])
+    assert nets.tolist() == [[80.0, 49.0], [0.0, 50.0]]
+    assert covered.tolist() == [[True, True], [False, True]]
+
+
+def test_revalue_range_and_backfill(history):
+    history.record(PriceSnapshot({"USD_BUY": 40.0}, dt.datetime(2026, 2, 2, 12), "test"))
+    history.record(PriceSnapshot({"USD_BUY": 42.0}, dt.datetime(2026, 2, 4, 9), "test"))
+    h = Holdings.from_state(pd.DataFrame({"Kod": ["USD", "TRY"], "Adet": [10.0, 100.0]}), pd.DataFrame())
+
+    days, nets, covered = revalue_range(h, history, "2026-02-01", dt.date(2026, 2, 5))
+    assert days.astype(str).tolist() == ["2026-02-01", "2026-02-02", "2026-02-03", "2026-02-04", "2026-02-05"]
+    assert nets[1:].tolist() == [500.0, 500.0, 520.0, 520.0]
+    assert covered.tolist() == [False, True, True, True, True]
+
+    records = [{"date": "2026-02-05", "net": 1.0}, {"date": "2026-02-03", "net": 2.0}]
+    assert backfill_net_history(records, days, nets, covered) == 2
+    assert records == [
+        {"date": "2026-02-02", "net": 500.0},
+        {"date": "2026-02-03", "net": 2.0},
+        {"date": "2026-02-04", "net": 520.0},
+        {"date": "2026-02-05", "net": 1.0},
+    ]
+    assert backfill_net_history(records, days, nets, covered, overwrite=True) == 2
+    assert [r["net"] for r in records] == [500.0, 500.0, 520.0, 520.0]
+
+
+def test_backfill_from_stored_state(history):
+    history.record(PriceSnapshot({"USD_BUY": 40.0}, dt.datetime(2026, 2, 1, 12), "test"))
+    state = {"assets": [{"Kod": "USD", "Adet": 1.0}], "debts": [], "net_history": []}
+    assert backfill_from_history(state, history, "2026-02-01", "2026-02-03") == 3
+    assert [r["net"] for r in state["net_history"]] == [40.0, 40.0, 40.0]
@@ -1,8 +1,22 @@
 import json
 
 import pandas as pd
+import pytest
 
-from app_storage import load_state, load_state_from_json, save_state, save_state_to_json
+import app_storage
+from app_storage import (
+    StateLoadError,
+    append_net_snapshot,
+    compact_state,
+    journal_path,
+    load_state,
+    load_state_for_user,
+    load_state_from_json,
+    resolve_state_path,
+    save_payload_for_user,
+    save_state,
+    save_state_to_json,
+)
 
 
 def test_save_and_load_state_json_roundtrip(tmp_path):
@@ -36,3 +50,253 @@ def test_save_state_writes_file(tmp_path):
 
     content = json.loads(path.read_text(encoding="utf-8"))
     assert content == payload
+
+
+def test_save_state_is_atomic_and_leaves_no_temp_files(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    save_state(str(path), {"v": 1})
+
+    def boom(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(app_storage.os, "replace", boom)
+    monkeypatch.setattr(app_storage.st, "error", lambda *a, **k: None)
+    save_state(str(path), {"v": 2})
+
+    assert json.loads(path.read_text(encoding="utf-8")) == {"v": 1}
+    assert [p.name for p in tmp_path.iterdir()] == ["state.json"]
+
+
+def test_save_state_compact_has_no_whitespace(tmp_path):
+    path = tmp_path / "state.json"
+    save_state(str(path), {"a": [1, 2], "b": "ş"}, compact=True)
+    assert path.read_text(encoding="utf-8") == '{"a":[1,2],"b":"ş"}'
+
+
+def test_net_snapshot_journal_is_replayed_on_load(tmp_path):
+    path = tmp_path / "state.json"
+    save_state(str(path), {"net_history": [{"date": "2026-01-28", "net": 100.0}]})
+
+    append_net_snapshot(str(path), "2026-02-01", 120.0)
+    append_net_snapshot(str(path), "2026-01-28", 105.0)
+    append_net_snapshot(str(path), "2026-02-01", 130.0)
+
+    on_disk = json.loads(path.read_text(encoding="utf-8"))
+    assert on_disk["net_history"] == [{"date": "2026-01-28", "net": 100.0}]
+    expected = [{"date": "2026-01-28", "net": 105.0}, {"date": "2026-02-01", "net": 130.0}]
+    assert load_state(str(path))["net_history"] == expected
+    assert load_state_from_json(str(path))["net_history"] == expected
+
+    compact_state(str(path))
+    assert not (tmp_path / "state.json.journal").exists()
+    assert json.loads(path.read_text(encoding="utf-8"))["net_history"] == expected
+
+
+def test_journal_compacts_after_threshold_and_full_save_clears_it(tmp_path, monkeypatch):
+    path = tmp_path / "state.json"
+    save_state(str(path), {"net_history": []})
+    monkeypatch.setattr(app_storage, "JOURNAL_COMPACT_LINES", 3)
+
+    for day in range(1, 4):
+        append_net_snapshot(str(path), f"2026-02-0{day}", float(day))
+    assert not (tmp_path / "state.json.journal").exists()
+    assert len(json.loads(path.read_text(encoding="utf-8"))["net_history"]) == 3
+
+    append_net_snapshot(str(path), "2026-02-04", 4.0)
+    assert (tmp_path / "state.json.journal").exists()
+    save_state(str(path), {"net_history": []})
+    assert not (tmp_path / "state.json.journal").exists()
+
+
+def test_torn_journal_line_is_ignored(tmp_path):
+    path = tmp_path / "state.json"
+    save_state(str(path), {"net_history": []})
+    append_net_snapshot(str(path), "2026-02-01", 1.0)
+    with open(journal_path(str(path)), "a", encoding="utf-8") as f:
+        f.write('{"date": "2026-02-0')
+
+    assert load_state(str(path))["net_history"] == [{"date": "2026-02-01", "net": 1.0}]
+
+
+def _session():
+    return {
+        "assets_df": pd.DataFrame(
+            {"Kod": ["TRY", "EUR"], "Adet": [10.0, 2.5], "Yıllık Faiz (%)": [float("nan"), 40.0], "Not": ["", "x"]}
+        ),
+        "debts_df": pd.DataFrame(columns=["Borç Adı", "Tutar (TL)", "Not"]),
+        "net_history": [{"date": "2026-01-28", "net": 1.0}],
+    }
+
+
+def test_columnar_layout_roundtrip_loads_typed_columns(tmp_path, monkeypatch):
+    monkeypatch.setenv("PORTFOLIO_STATE_LAYOUT", "columnar")
+    path = resolve_state_path(str(tmp_path))
+    assert path.endswith("state.columnar.json")
+
+    save_state_to_json(path, _session())
+    raw = json.loads((tmp_path / "state.columnar.json").read_text(encoding="utf-8"))
+    assert raw["assets"]["Adet"] == [10.0, 2.5]
+    assert raw["assets"]["Yıllık Faiz (%)"] == [None, 40.0]
+    assert raw["debts"] == {"Borç Adı": [], "Tutar (TL)": [], "Not": []}
+
+    assets = pd.DataFrame(load_state_from_json(path)["assets"])
+    assert assets["Adet"].dtype == "float64"
+    assert assets["Yıllık Faiz (%)"].isna().tolist() == [True, False]
+
+
+def test_state_is_migrated_between_layouts(tmp_path, monkeypatch):
+    legacy = tmp_path / "state.json"
+    save_state_to_json(str(legacy), _session())
+    append_net_snapshot(str(legacy), "2026-02-01", 2.0)
+
+    monkeypatch.setenv("PORTFOLIO_STATE_LAYOUT", "columnar")
+    path = resolve_state_path(str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["state.columnar.json"]
+    data = load_state_from_json(path)
+    assert data["assets"]["Kod"] == ["TRY", "EUR"]
+    assert [r["date"] for r in data["net_history"]] == ["2026-01-28", "2026-02-01"]
+
+    monkeypatch.setenv("PORTFOLIO_STATE_LAYOUT", "records")
+    path = resolve_state_path(str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["state.json"]
+    data = load_state_from_json(path)
+    assert data["assets"][1] == {"Kod": "EUR", "Adet": 2.5, "Yıllık Faiz (%)": 40.0, "Not": "x"}
+    assert data["debts"] == []
+
+
+def test_unreadable_state_is_not_migrated_to_an_empty_target(tmp_path, monkeypatch):
+    legacy = tmp_path / "state.json"
+    legacy.write_text('{"assets": [', encoding="utf-8")
+
+    monkeypatch.setenv("PORTFOLIO_STATE_LAYOUT", "columnar")
+    assert resolve_state_path(str(tmp_path)) == str(legacy)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["state.json"]
+
+
+def test_strict_load_tells_a_missing_state_from_an_unreadable_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_storage, "mongo_enabled", lambda: False)
+    path = tmp_path / "state.json"
+    assert load_state_for_user("u", path=str(path), strict=True) is None
+
+    path.write_text('{"assets": [', encoding="utf-8")
+    assert load_state_for_user("u", path=str(path)) is None
+    with pytest.raises(StateLoadError):
+        load_state_for_user("u", path=str(path), strict=True)
+
+
+def test_page_save_keeps_days_written_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_storage, "mongo_enabled", lambda: False)
+    path = str(tmp_path / "state.json")
+    session = {"assets": [], "debts": [], "net_history": [{"date": "2026-02-09", "net": 1.0}]}
+    save_state(path, session)
+    # The daemon records the evening snapshot while the page session is open.
+    append_net_snapshot(path, "2026-02-10", 2.0)
+
+    save_payload_for_user("u", dict(session, assets=[{"Kod": "TRY"}]), path=path)
+
+    data = load_state_from_json(path)
+    assert data["assets"] == [{"Kod": "TRY"}]
+    assert data["net_history"] == [{"date": "2026-02-09", "net": 1.0}, {"date": "2026-02-10", "net": 2.0}]
+    assert session["net_history"] == [{"date": "2026-02-09", "net": 1.0}]
+
+
+def test_page_save_replays_only_the_journal_unless_the_file_changed(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_storage, "mongo_enabled", lambda: False)
+    errors = []
+    monkeypatch.setattr(app_storage.st, "error", errors.append)
+    path = str(tmp_path / "state.json")
+    session = {"assets": [], "debts": [], "net_history": [{"date": "2026-02-09", "net": 1.0}]}
+    save_state(path, session)
+    append_net_snapshot(path, "2026-02-10", 2.0)
+
+    def unread(p):
+        raise AssertionError("state file re-read although this process wrote it")
+
+    with monkeypatch.context() as m:
+        m.setattr(app_storage, "read_state_file", unread)
+        save_payload_for_user("u", dict(session), path=path)
+    assert [r["date"] for r in load_state_from_json(path)["net_history"]] == ["2026-02-09", "2026-02-10"]
+
+    # Another writer leaves a file this process cannot decode: the save still goes through.
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"assets": [')
+    save_payload_for_user("u", dict(session, assets=[{"Kod": "TRY"}]), path=path)
+    assert errors == []
+    assert load_state_from_json(path)["assets"] == [{"Kod": "TRY"}]
+
+
+def test_atomic_write_keeps_existing_permissions(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("{}", encoding="utf-8")
+    path.chmod(0o640)
+    save_state(str(path), {"v": 1})
+    assert path.stat().st_mode & 0o777 == 0o640
+
+
+def _plain(assets, net_history, saved_at="t0"):
+    return {"assets": assets, "debts": [], "net_history": net_history, "saved_at": saved_at}
+
+
+def test_build_payload_update_sets_changed_rows_and_pushes_history():
+    old = _plain([{"Kod": "TRY", "Adet": 1.0}, {"Kod": "EUR", "Adet": 2.0}], [{"date": "2026-01-28", "net": 1.0}])
+    new = _plain(
+        [{"Kod": "TRY", "Adet": 1.0}, {"Kod": "EUR", "Adet": 3.0}],
+        [{"date": "2026-01-28", "net": 1.0}, {"date": "2026-01-29", "net": 2.0}],
+        saved_at="t1",
+    )
+
+    update = app_storage.build_payload_update(old, new)
+
+    assert update == {
+        "$set": {"payload.assets.1": {"Kod": "EUR", "Adet": 3.0}, "payload.saved_at": "t1"},
+        "$push": {"payload.net_history": {"$each": [{"date": "2026-01-29", "net": 2.0}]}},
+    }
+    assert app_storage.build_payload_update(new, new) is None
+
+
+def test_build_payload_update_falls_back_to_full_set_on_conflicts():
+    old = _plain([{"Kod": "TRY"}], [{"date": "2026-01-28", "net": 1.0}])
+    # Edited old snapshot plus an append cannot be expressed as $set + $push on one array.
+    new = _plain([{"Kod": "TRY"}, {"Kod": "EUR"}], [{"date": "2026-01-28", "net": 5.0}, {"date": "2026-01-29", "net": 2.0}])
+    new.pop("debts")
+
+    update = app_storage.build_payload_update(old, new)
+
+    assert update["$set"]["payload.net_history"] == new["net_history"]
+    assert update["$set"]["payload.assets"] == new["assets"]
+    assert "$push" not in update
+    assert update["$unset"] == {"payload.debts": ""}
+
+
+def test_save_payload_to_mongo_writes_diffs_on_top_of_known_revision(fake_collection, monkeypatch):
+    monkeypatch.setattr(app_storage, "_mongo_baselines", {})
+    history = [{"date": "2026-01-28", "net": 1.0}]
+    first = _plain([{"Kod": "TRY", "Adet": 1.0}], history)
+
+    app_storage.save_payload_to_mongo(fake_collection, "ayse", first)
+    assert fake_collection.docs[0]["revision"] == 1
+
+    second = _plain([{"Kod": "TRY", "Adet": 1.0}], history + [{"date": "2026-01-29", "net": 2.0}], saved_at="t1")
+    update = app_storage.save_payload_to_mongo(fake_collection, "ayse", second)
+    assert set(update) == {"$set", "$push", "$inc"}
+    assert "payload.assets" not in update["$set"]
+    assert app_storage.save_payload_to_mongo(fake_collection, "ayse", second) is None
+
+    doc = fake_collection.docs[0]
+    assert doc["revision"] == 2
+    assert doc["payload"]["net_history"] == second["net_history"]
+    assert doc["payload"]["saved_at"] == "t1"
+
+
+def test_save_payload_to_mongo_resets_after_concurrent_write(fake_collection, monkeypatch):
+    monkeypatch.setattr(app_storage, "_mongo_baselines", {})
+    app_storage.save_payload_to_mongo(fake_collection, "ayse", _plain([{"Adet": 1.0}], []))
+    # Another session bumps the revision behind our back.
+    fake_collection.docs[0]["revision"] = 7
+    fake_collection.docs[0]["payload"]["assets"] = [{"Adet": 99.0}, {"Adet": 100.0}]
+
+    update = app_storage.save_payload_to_mongo(fake_collection, "ayse", _plain([{"Adet": 2.0}], []))
+
+    assert update["$set"]["payload"]["assets"] == [{"Adet": 2.0}]
+    assert fake_collection.docs[0]["payload"]["assets"] == [{"Adet": 2.0}]
+    assert fake_collection.docs[0]["revision"] == 8
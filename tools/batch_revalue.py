@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import pandas as pd  # noqa: E402
+
+from app_batch import REPORT_COLUMNS, VALUE_CHUNK_SIZE, open_store, value_chunk  # noqa: E402
+from app_mongo import batched, close_db, mongo_enabled  # noqa: E402
+from app_pricing import fetch_prices  # noqa: E402
+
+
+def _load_prices(args: argparse.Namespace) -> tuple[dict, str]:
+    if args.prices:
+        with open(args.prices, "r", encoding="utf-8") as f:
+            return {k: float(v) for k, v in json.load(f).items()}, args.prices
+    snap = fetch_prices(timeout_s=args.timeout)
+    return snap.prices_try, snap.source
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Value every user's stored portfolio against one price snapshot.")
+    parser.add_argument("--root", default=os.path.join(APP_DIR, "user_data"), help="File-mode user_data directory.")
+    parser.add_argument("--prices", help="JSON file of prices_try to use instead of fetching.")
+    parser.add_argument("--side", choices=("BUY", "SELL"), default="BUY")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=VALUE_CHUNK_SIZE)
+    parser.add_argument("--limit", type=int, help="Only the first N users.")
+    parser.add_argument("--out", help="Report CSV (default: <root>/_reports/revalue-<timestamp>.csv).")
+    parser.add_argument("--timeout", type=int, default=10, help="Price fetch timeout (s).")
+    args = parser.parse_args()
+
+    prices, source = _load_prices(args)
+    if not prices:
+        print("No prices available; values would fall back to manual Kur only.", file=sys.stderr)
+        return 1
+
+    kind = "mongo" if mongo_enabled() else "file"
+    t0 = time.perf_counter()
+    usernames = itertools.islice(open_store(kind, args.root).usernames(), args.limit)
+    chunks = list(batched(usernames, args.chunk_size))
+    # Workers open their own Mongo connection; a client must not cross a fork.
+    context = None
+    if kind == "mongo":
+        close_db()
+        context = multiprocessing.get_context("spawn")
+    t_list = time.perf_counter()
+
+    reports = []
+    phases = {"load_s": 0.0, "value_s": 0.0}
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=context) as pool:
+        futures = [pool.submit(value_chunk, kind, args.root, chunk, prices, args.side) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            report, timings = future.result()
+            reports.append(report)
+            for key, value in timings.items():
+                phases[key] += value
+            print(f"\r{done}/{len(chunks)} chunks", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    elapsed = time.perf_counter() - t0
+
+    report = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=REPORT_COLUMNS)
+    report = report.sort_values("username", kind="stable").reset_index(drop=True)
+    out = args.out or os.path.join(args.root, "_reports", f"revalue-{dt.datetime.now():%Y%m%d-%H%M%S}.csv")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    report.to_csv(out, index=False)
+
+    valued = report[report["error"].isna()]
+    summary = {
+        "store": kind,
+        "price_source": source,
+        "users": len(report),
+        "valued": len(valued),
+        "missing": int((report["error"] == "no state").sum()),
+        "errors": int((report["error"].notna() & (report["error"] != "no state")).sum()),
+        "asset_rows": int(valued["rows"].sum()),
+        "total_net": round(float(valued["net"].sum()), 2),
+        "median_net": round(float(valued["net"].median()), 2) if len(valued) else None,
+        "negative_net": int((valued["net"] < 0).sum()),
+        "workers": args.workers,
+        "chunks": len(chunks),
+        "list_s": round(t_list - t0, 3),
+        "worker_load_s": round(phases["load_s"], 3),
+        "worker_value_s": round(phases["value_s"], 3),
+        "elapsed_s": round(elapsed, 3),
+        "users_per_s": round(len(report) / elapsed, 1) if elapsed > 0 else None,
+        "report": out,
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import app_excel  # noqa: E402
+from app_excel import build_bilanco_xlsx, build_bilanco_xlsx_cached  # noqa: E402
+
+
+def _make_frames(rows: int, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    assets = pd.DataFrame(
+        {
+            "Varlık Türü": rng.choice(["Mevduat Hesabı", "Euro", "Gram Altın"], size=rows),
+            "Kod": rng.choice(["TRY", "EUR", "GRAM"], size=rows),
+            "Adet": rng.uniform(0, 1000, size=rows).round(2),
+            "Kur (TL)": rng.uniform(1, 5000, size=rows).round(4),
+            "Yıllık Faiz (%)": 0.0,
+            "Not": "",
+        }
+    )
+    assets["Tutar (TL)"] = assets["Adet"] * assets["Kur (TL)"]
+    debts = pd.DataFrame([{"Borç Adı": f"Borç {i}", "Tutar (TL)": float(i), "Not": ""} for i in range(max(1, rows // 100))])
+    return assets, debts
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark per-rerun cost of the Excel export and the streaming writer.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 1_000, 20_000])
+    parser.add_argument("--reruns", type=int, default=20, help="Simulated reruns with unchanged data and no download click.")
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'eager/rerun (ms)':>17} {'lazy/rerun (ms)':>16} {'cached hit (ms)':>16} {'pandas (ms)':>12} {'streaming (ms)':>15}")
+    for rows in args.rows:
+        assets, debts = _make_frames(rows)
+
+        # Before: the workbook was built on every rerun.
+        eager = sum(_timed(lambda: build_bilanco_xlsx(assets, debts, streaming=False)) for _ in range(args.reruns)) / args.reruns
+        # After: reruns only bind a callable; the build runs on click.
+        lazy = sum(_timed(lambda: (lambda: build_bilanco_xlsx_cached(assets, debts))) for _ in range(args.reruns)) / args.reruns
+
+        app_excel._xlsx_cache.clear()
+        build_bilanco_xlsx_cached(assets, debts)
+        cached_hit = _timed(lambda: build_bilanco_xlsx_cached(assets, debts))
+
+        t_pandas = _timed(lambda: build_bilanco_xlsx(assets, debts, streaming=False))
+        t_stream = _timed(lambda: build_bilanco_xlsx(assets, debts, streaming=True))
+        print(
+            f"{rows:>7} {eager * 1000:>17.2f} {lazy * 1000:>16.4f} {cached_hit * 1000:>16.2f} "
+            f"{t_pandas * 1000:>12.2f} {t_stream * 1000:>15.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
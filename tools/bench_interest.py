@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app_interest import WITHHOLDING_RATE, accrue_deposit_interest, parse_rate_percent  # noqa: E402
+
+
+def _loop_accrue(assets_df: pd.DataFrame, days: int) -> pd.DataFrame:
+    """The former iterrows implementation from portfolio_app_fixed.py, kept as the baseline."""
+    df = assets_df.copy()
+    for idx, row in df.iterrows():
+        if str(row.get("Varlık Türü", "")).strip().lower() != "mevduat hesabı":
+            continue
+        annual_rate = parse_rate_percent(row.get("Yıllık Faiz (%)", ""))
+        if annual_rate <= 0:
+            continue
+        net_daily_rate = (annual_rate / 100.0) / 365.0 * (1.0 - WITHHOLDING_RATE)
+        try:
+            principal = float(row.get("Adet", 0.0) or 0.0)
+        except Exception:
+            principal = 0.0
+        if principal <= 0:
+            continue
+        df.at[idx, "Adet"] = principal * ((1.0 + net_daily_rate) ** days)
+    return df
+
+
+def _make_assets(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    types = np.array(["Mevduat Hesabı", "Euro", "Gram Altın"])
+    return pd.DataFrame(
+        {
+            "Varlık Türü": rng.choice(types, size=rows, p=[0.8, 0.1, 0.1]),
+            "Kod": "TRY",
+            "Adet": rng.uniform(0, 1_000_000, size=rows).round(2),
+            "Kur (TL)": 1.0,
+            "Yıllık Faiz (%)": rng.choice(["41", "%38,5", "0", ""], size=rows),
+            "Not": "",
+        }
+    )
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vectorized deposit interest accrual against the iterrows loop.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-loop-above", type=int, default=20_000, help="Only time the loop up to this many rows.")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'loop (ms)':>12} {'vector (ms)':>12} {'speedup':>9}")
+    for rows in args.rows:
+        assets = _make_assets(rows)
+        t_vec = _best_of(lambda: accrue_deposit_interest(assets, args.days), args.repeat)
+        if rows > args.skip_loop_above:
+            print(f"{rows:>8} {'-':>12} {t_vec * 1000:>12.2f} {'-':>9}")
+            continue
+        expected = _loop_accrue(assets, args.days)["Adet"].to_numpy(dtype=float)
+        actual = accrue_deposit_interest(assets, args.days)["Adet"].to_numpy(dtype=float)
+        if not np.allclose(expected, actual):
+            print(f"Mismatch at {rows} rows.", file=sys.stderr)
+            return 1
+        t_loop = _best_of(lambda: _loop_accrue(assets, args.days), args.repeat)
+        print(f"{rows:>8} {t_loop * 1000:>12.2f} {t_vec * 1000:>12.2f} {t_loop / t_vec:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from app_auth import hash_password  # noqa: E402
+from app_passwords import HashingBusy, HashingService, check_password, make_password_record  # noqa: E402
+
+
+def _inline_check(record: dict, password: str) -> bool:
+    # Before: PBKDF2 on the calling thread plus a pure-Python comparison loop.
+    _, computed = hash_password(password, salt_b64=record["salt"], rounds=record["rounds"])
+    expected = record["hash"]
+    result = len(computed) == len(expected)
+    for x, y in zip(computed.encode(), expected.encode()):
+        result &= x == y
+    return result
+
+
+def _burst(fn, logins: int, clients: int) -> tuple[float, list, int]:
+    latencies = []
+    busy = 0
+
+    def one(_):
+        nonlocal busy
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except HashingBusy:
+            busy += 1
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(logins)))
+    return time.perf_counter() - t0, latencies, busy
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark login throughput: inline PBKDF2 vs the bounded hashing service.")
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent login attempts (simulated script threads).")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[120_000, 600_000])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    print(f"{'rounds':>8} {'mode':>8} {'logins/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'busy':>5}")
+    for rounds in args.rounds:
+        record = make_password_record("secret1", rounds=rounds)
+        service = HashingService(workers=args.workers, max_pending=args.clients)
+        modes = {
+            "inline": lambda: _inline_check(record, "secret1"),
+            "service": lambda: check_password(record, "secret1", service=service),
+        }
+        for mode, fn in modes.items():
+            elapsed, lat, busy = _burst(fn, args.logins, args.clients)
+            lat_ms = sorted(x * 1000 for x in lat)
+            p95 = lat_ms[min(len(lat_ms) - 1, int(0.95 * len(lat_ms)))]
+            print(f"{rounds:>8} {mode:>8} {args.logins / elapsed:>9.1f} {statistics.median(lat_ms):>9.1f} {p95:>9.1f} {busy:>5}")
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app_codec import codec_names, encode_payload, get_codec  # noqa: E402
+
+
+def _make_payload(rows: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    assets = pd.DataFrame(
+        {
+            "Varlık Türü": rng.choice(["Mevduat Hesabı", "Euro", "Gram Altın"], size=rows),
+            "Kod": rng.choice(["TRY", "EUR", "GRAM"], size=rows),
+            "Adet": rng.uniform(0, 1000, size=rows),
+            "Kur (TL)": rng.uniform(1, 5000, size=rows),
+            "Yıllık Faiz (%)": np.where(rng.random(rows) < 0.5, np.nan, 42.0),
+            "Not": "",
+            "Tutar (TL)": rng.uniform(0, 1e6, size=rows),
+        }
+    )
+    debts = pd.DataFrame({"Borç Adı": [f"Borç {i}" for i in range(rows // 10)], "Tutar (TL)": np.nan, "Not": ""})
+    days = pd.date_range("2020-01-01", periods=min(rows, 3650)).strftime("%Y-%m-%d")
+    return {
+        "assets": assets,
+        "debts": debts,
+        "net_history": [{"date": d, "net": float(i)} for i, d in enumerate(days)],
+        "baseline_net": 2_000_000.0,
+    }
+
+
+def _timed(fn, repeat: int) -> tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark state payload encoding and loading per codec and state layout.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 50_000, 200_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'size (MB)':>10} {'codec':>12} {'encode (ms)':>12} {'decode (ms)':>12}")
+    for rows in args.rows:
+        payload = _make_payload(rows)
+
+        # Before: per-row dicts through stdlib json, which also writes NaN tokens.
+        def legacy():
+            records = dict(payload, assets=payload["assets"].to_dict(orient="records"), debts=payload["debts"].to_dict(orient="records"))
+            return json.dumps(records, ensure_ascii=False, indent=2).encode("utf-8")
+
+        t_enc, raw = _timed(legacy, args.repeat)
+        t_dec, _ = _timed(lambda: json.loads(raw), args.repeat)
+        print(f"{rows:>7} {len(raw) / 1e6:>10.2f} {'legacy':>12} {t_enc * 1000:>12.1f} {t_dec * 1000:>12.1f}")
+
+        for name in codec_names():
+            codec = get_codec(name)
+            for compact in (False, True):
+                label = f"{name}{'/compact' if compact else ''}"
+                t_enc, raw = _timed(lambda: encode_payload(payload, compact=compact, codec=codec), args.repeat)
+                t_dec, _ = _timed(lambda: codec.loads(raw), args.repeat)
+                print(f"{rows:>7} {len(raw) / 1e6:>10.2f} {label:>12} {t_enc * 1000:>12.1f} {t_dec * 1000:>12.1f}")
+
+    # Load path: decode the file and rebuild the assets frame, per state layout.
+    print()
+    print(f"{'rows':>7} {'layout':>9} {'size (MB)':>10} {'load (ms)':>10}")
+    codec = get_codec()
+    for rows in args.rows:
+        payload = _make_payload(rows)
+        for columnar in (False, True):
+            raw = encode_payload(payload, compact=True, codec=codec, columnar=columnar)
+            t_load, _ = _timed(lambda: pd.DataFrame(codec.loads(raw)["assets"]), args.repeat)
+            layout = "columnar" if columnar else "records"
+            print(f"{rows:>7} {layout:>9} {len(raw) / 1e6:>10.2f} {t_load * 1000:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
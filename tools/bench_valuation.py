@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from app_compute import compute_display_assets, get_auto_unit_price  # noqa: E402
+
+
+PRICES = {
+    "USD_BUY": 43.47, "USD_SELL": 43.52,
+    "EUR_BUY": 51.31, "EUR_SELL": 51.40,
+    "GRAM_BUY": 6877.61, "GRAM_SELL": 6890.00,
+    "CEYREK_BUY": 11786.68, "CEYREK_SELL": 11900.00,
+    "YARIM_BUY": 23499.69, "YARIM_SELL": 23700.00,
+    "ATA_BUY": 48620.04, "ATA_SELL": 48900.00,
+}
+
+
+def _loop_display_assets(assets_df: pd.DataFrame, prices: dict, use_side: str) -> pd.DataFrame:
+    """The pre-vectorization iterrows implementation, kept here as the baseline."""
+    df = assets_df.copy()
+    kur_list = []
+    tutar_list = []
+    for _, row in df.iterrows():
+        auto_kur = get_auto_unit_price(row.get("Kod", ""), prices, use_side)
+        kur = auto_kur if auto_kur is not None else row.get("Kur (TL)", None)
+        kur_list.append(kur)
+        try:
+            q = float(row.get("Adet", 0.0)) if row.get("Adet", 0.0) is not None else 0.0
+            k = float(kur) if kur is not None else 0.0
+            tutar_list.append(q * k)
+        except Exception:
+            tutar_list.append(0.0)
+    df["Kur (TL)"] = kur_list
+    df["Tutar (TL)"] = tutar_list
+    return df
+
+
+def _make_assets(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    codes = np.array(["TRY", "USD", "EUR", "GRAM", "CEYREK", "YARIM", "ATA", "BILEZIK", "XAU"])
+    return pd.DataFrame(
+        {
+            "Varlık Türü": "",
+            "Kod": rng.choice(codes, size=rows),
+            "Adet": rng.uniform(0, 1000, size=rows).round(2),
+            "Kur (TL)": rng.uniform(1, 100, size=rows).round(4),
+            "Yıllık Faiz (%)": 0.0,
+            "Not": "",
+        }
+    )
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark vectorized asset valuation against the iterrows loop.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'loop (ms)':>12} {'vector (ms)':>12} {'speedup':>9}")
+    for rows in args.rows:
+        assets = _make_assets(rows)
+        loop_out = _loop_display_assets(assets, PRICES, "BUY")
+        vec_out = compute_display_assets(assets, PRICES, "BUY")
+        if not np.allclose(loop_out["Tutar (TL)"].to_numpy(), vec_out["Tutar (TL)"].to_numpy()):
+            print(f"Mismatch at {rows} rows.", file=sys.stderr)
+            return 1
+
+        t_loop = _best_of(lambda: _loop_display_assets(assets, PRICES, "BUY"), args.repeat)
+        t_vec = _best_of(lambda: compute_display_assets(assets, PRICES, "BUY"), args.repeat)
+        print(f"{rows:>8} {t_loop * 1000:>12.2f} {t_vec * 1000:>12.2f} {t_loop / t_vec:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,7 +9,7 @@ APP_DIR = os.path.dirname(SCRIPT_DIR)
 if APP_DIR not in sys.path:
     sys.path.insert(0, APP_DIR)
 
-from app_auth import hash_password  # noqa: E402
+from app_passwords import make_password_record  # noqa: E402
 from app_mongo import get_db, get_mongo_uri  # noqa: E402
 
 
@@ -24,10 +24,9 @@ def main() -> int:
         return 2
 
     db = get_db()
-    salt_b64, hash_b64 = hash_password(args.password)
     result = db["users"].update_one(
         {"username": args.username},
-        {"$set": {"salt": salt_b64, "hash": hash_b64}},
+        {"$set": make_password_record(args.password)},
         upsert=False,
     )
 
@@ -9,7 +9,7 @@ APP_DIR = os.path.dirname(SCRIPT_DIR)
 if APP_DIR not in sys.path:
     sys.path.insert(0, APP_DIR)
 
-from app_auth import hash_password  # noqa: E402
+from app_passwords import make_password_record  # noqa: E402
 from app_mongo import get_db, get_mongo_db_name, get_mongo_uri  # noqa: E402
 
 
@@ -29,12 +29,10 @@ def main() -> int:
     db["users"].delete_many({})
     db["user_state"].delete_many({})
 
-    salt_b64, hash_b64 = hash_password(args.password)
     db["users"].insert_one(
         {
             "username": args.username,
-            "salt": salt_b64,
-            "hash": hash_b64,
+            **make_password_record(args.password),
             "role": "admin",
         }
     )
@@ -109,7 +109,8 @@ def main() -> int:
     db = get_db()
     db["user_state"].update_one(
         {"username": USERNAME},
-        {"$set": {"username": USERNAME, "payload": payload, "updated_at": dt.datetime.utcnow()}},
+        # Bump the revision so app sessions holding the old payload do not diff against it.
+        {"$set": {"username": USERNAME, "payload": payload, "updated_at": dt.datetime.utcnow()}, "$inc": {"revision": 1}},
         upsert=True,
     )
 
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import time
+from typing import Optional, Sequence
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(SCRIPT_DIR)
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from app_batch import (  # noqa: E402
+    SNAPSHOT_CHUNK_SIZE,
+    SNAPSHOT_WORKERS,
+    FileStateStore,
+    MongoStateStore,
+    run_backfill,
+    run_snapshots,
+    summarize,
+)
+from app_mongo import get_db, mongo_enabled  # noqa: E402
+from app_price_history import get_price_history  # noqa: E402
+from app_pricing import fetch_prices  # noqa: E402
+
+
+def next_run(at: dt.time, now: dt.datetime) -> dt.datetime:
+    run = dt.datetime.combine(now.date(), at)
+    return run if run > now else run + dt.timedelta(days=1)
+
+
+def open_state_store(args: argparse.Namespace):
+    # Mongo writes are revision-guarded; file writes are not (see FileStateStore
+    # for how they interleave with open page sessions).
+    return MongoStateStore(get_db()["user_state"]) if mongo_enabled() else FileStateStore(args.root)
+
+
+def backfill(args: argparse.Namespace) -> int:
+    start, end = (dt.date.fromisoformat(d) for d in args.backfill)
+    t0 = time.perf_counter()
+    results = run_backfill(
+        open_state_store(args), get_price_history(), start, end,
+        use_side=args.side, overwrite=args.overwrite, workers=args.workers, chunk_size=args.chunk_size,
+    )
+    elapsed = time.perf_counter() - t0
+    errors = [r for r in results if r.error and r.error != "no state"]
+    summary = {
+        "users": len(results),
+        "backfilled": sum(r.days > 0 for r in results),
+        "days": sum(r.days for r in results),
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+    }
+    print(json.dumps(summary, ensure_ascii=False))
+    for r in errors:
+        print(f"{r.username}: {r.error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def run_once(args: argparse.Namespace) -> int:
+    snap = fetch_prices(timeout_s=args.timeout)
+    if not snap.prices_try:
+        print(f"No prices fetched ({snap.notes}); nothing written.", file=sys.stderr)
+        return 1
+    try:
+        get_price_history().record(snap)
+    except Exception as e:
+        print(f"Price history not updated: {e}", file=sys.stderr)
+
+    store = open_state_store(args)
+    t0 = time.perf_counter()
+    results = run_snapshots(store, snap.prices_try, use_side=args.side, workers=args.workers, chunk_size=args.chunk_size)
+    summary = summarize(results, time.perf_counter() - t0)
+    summary["source"] = snap.source
+    print(json.dumps(summary, ensure_ascii=False))
+    for r in results:
+        if r.error and r.error != "no state":
+            print(f"{r.username}: {r.error}", file=sys.stderr)
+    return 1 if summary["errors"] > sum(r.error == "no state" for r in results) else 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Apply deposit interest and record today's net snapshot for every user, with one price fetch."
+    )
+    parser.add_argument("--root", default=os.path.join(APP_DIR, "user_data"), help="File-mode user_data directory.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running, once a day at --at.")
+    parser.add_argument("--at", default="23:59", help="Local time of the daily run in daemon mode (HH:MM).")
+    parser.add_argument("--side", choices=("BUY", "SELL"), default="BUY")
+    parser.add_argument("--workers", type=int, default=SNAPSHOT_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=SNAPSHOT_CHUNK_SIZE)
+    parser.add_argument("--timeout", type=int, default=10, help="Price fetch timeout (s).")
+    parser.add_argument(
+        "--backfill", nargs=2, metavar=("START", "END"),
+        help="Instead of a snapshot, fill every user's net history for these days (YYYY-MM-DD) from the price history.",
+    )
+    parser.add_argument("--overwrite", action="store_true", help="With --backfill, replace days already recorded.")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        return backfill(args)
+    if not args.daemon:
+        return run_once(args)
+
+    at = dt.time.fromisoformat(args.at)
+    wake = dt.datetime.min
+    while True:
+        # From the last wake-up at the earliest, so an early wake-up does not run twice.
+        wake = next_run(at, max(dt.datetime.now(), wake))
+        print(f"Next run at {wake.isoformat(timespec='minutes')}", flush=True)
+        time.sleep(max(0.0, (wake - dt.datetime.now()).total_seconds()))
+        try:
+            run_once(args)
+        except Exception as e:
+            print(f"Run failed: {type(e).__name__}: {e}", file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())